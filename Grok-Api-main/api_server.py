@@ -1,36 +1,63 @@
-from fastapi      import FastAPI, HTTPException, Request, Response
+from fastapi      import FastAPI, HTTPException, Request, Response, Header
 from fastapi.responses import StreamingResponse
 from urllib.parse import urlparse, ParseResult
 from pydantic     import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-from core         import Grok
+from core         import ProxyPool, ImageCache, Tracer
 from uvicorn      import run
 from typing       import Optional
 from contextlib  import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading   import Lock
+from collections import OrderedDict
+import hashlib
+import asyncio
+import core
 import json
 import os
+import sys
 import time
-import requests
 
-try:
-    from curl_cffi.requests.session import Session, Headers
-except ImportError:
-    pass
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Modern FastAPI lifecycle manager (replaces on_event)"""
-    # Attempt to harvest cookies on startup
+def startup_harvest() -> None:
     try:
         from grok_harvester import harvest
         harvest()
     except Exception as e:
         print(f"[Bridge] Startup harvest skipped: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Modern FastAPI lifecycle manager (replaces on_event)"""
+    PROXY_POOL.start()
+    # Harvest cookies in the background so the server listens immediately;
+    # /ask falls back to grok_session.json or its own harvest meanwhile
+    harvest_task = asyncio.create_task(asyncio.to_thread(startup_harvest))
     yield
-    # Shutdown logic goes here if needed
+    harvest_task.cancel()
+    PROXY_POOL.stop()
 
 app = FastAPI(lifespan=lifespan)
 
+# /ask/batch tuning (overridable via env)
+BATCH_CONCURRENCY = int(os.environ.get("GROK_BATCH_CONCURRENCY", "4"))
+BATCH_MAX_CONCURRENCY = int(os.environ.get("GROK_BATCH_MAX_CONCURRENCY", "16"))
+WARM_SESSION_TTL = 600 # Seconds a loaded grok.com site state stays reusable
+
+# Managed upstream proxies (GROK_PROXIES / GROK_PROXY_FILE); empty pool = direct
+PROXY_POOL = ProxyPool.from_env()
+
+# Local cache for generated images (GROK_IMAGE_CACHE_DIR / GROK_IMAGE_CACHE_MB)
+IMAGE_CACHE = ImageCache.from_env()
+IMAGE_PREFETCH = os.environ.get("GROK_IMAGE_PREFETCH", "1") == "1"
+
+TRACER = Tracer("bridge")
+
+# Playwright driver (grok_driver.py); /ask tries it first once it reports ready
+DRIVER_URL = os.environ.get("GROK_DRIVER_URL", "http://127.0.0.1:8001")
+
+# Opt-in response cache for idempotent prompts (new conversations only)
+RESPONSE_CACHE_DEFAULT = os.environ.get("GROK_RESPONSE_CACHE", "0") == "1"
+
 class ConversationRequest(BaseModel):
     message: str
     proxy: Optional[str] = None
@@ -38,6 +65,19 @@ class ConversationRequest(BaseModel):
     extra_data: Optional[dict] = None
     cookies: Optional[dict] = None
     stream: bool = False
+    cache: Optional[bool] = None # None = server default (GROK_RESPONSE_CACHE)
+
+class BatchItem(BaseModel):
+    message: str
+    proxy: Optional[str] = None
+    model: str = "grok-3-auto"
+    extra_data: Optional[dict] = None
+    cookies: Optional[dict] = None
+
+class BatchRequest(BaseModel):
+    items: list[BatchItem]
+    concurrency: int = BATCH_CONCURRENCY
+    retries: int = 2
 
 def format_proxy(proxy: str) -> str:
     if not proxy.startswith(("http://", "https://")):
@@ -51,6 +91,48 @@ def format_proxy(proxy: str) -> str:
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid proxy format: {str(e)}")
 
+def resolve_cookies(cookies: Optional[dict]) -> Optional[dict]:
+    # Cookie source prioritization:
+    # 1. Direct request.cookies (from UI)
+    # 2. Local grok_session.json fallback (from inject script or harvester)
+    # 3. Last-minute harvest attempt
+    if not cookies:
+        if os.path.exists("grok_session.json"):
+            try:
+                with open("grok_session.json", "r") as f:
+                    cookies = json.load(f)
+            except:
+                pass
+        
+        # If still no cookies, try auto-harvesting once
+        if not cookies:
+            try:
+                from grok_harvester import harvest
+                cookies = harvest()
+            except:
+                pass
+    return cookies
+
+def select_proxy(proxy: Optional[str], extra_data: Optional[dict]) -> Optional[str]:
+    """An explicit proxy wins; otherwise the pool picks (sticky per conversation)."""
+    if proxy:
+        return format_proxy(proxy)
+    return PROXY_POOL.pick((extra_data or {}).get("conversationId"))
+
+def record_proxy_result(proxy: Optional[str], result: dict) -> None:
+    if "error" in result:
+        PROXY_POOL.report_error(proxy, str(result["error"]))
+    else:
+        PROXY_POOL.report(proxy, ok=True)
+        PROXY_POOL.bind((result.get("extra_data") or {}).get("conversationId"), proxy)
+
+def cache_images(images: Optional[list], cookies: Optional[dict]) -> list:
+    """Register upstream images with the cache; returns bridge-local URLs."""
+    if not images:
+        return []
+    register = IMAGE_CACHE.prefetch if IMAGE_PREFETCH else IMAGE_CACHE.register
+    return [f"/images/{register(url, cookies)}" for url in images]
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -59,26 +141,284 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class ResponseCache:
+    """
+    TTL cache of finished answers keyed by normalised message + model, with
+    an in-memory LRU byte cap and an optional on-disk tier
+    (GROK_RESPONSE_CACHE_DIR). Entries hold the non-streaming answer shape;
+    streamed replays are rebuilt from `stream_response`.
+    """
+
+    def __init__(self, ttl: float, max_bytes: int, directory: Optional[str] = None, max_disk_bytes: int = 0) -> None:
+        self.ttl: float = ttl
+        self.max_bytes: int = max_bytes
+        self.directory: Optional[str] = directory
+        self.max_disk_bytes: int = max_disk_bytes
+        self.entries: OrderedDict = OrderedDict() # key -> (expires, answer, size)
+        self.total: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.lock = Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        return cls(
+            ttl=float(os.environ.get("GROK_RESPONSE_CACHE_TTL", "3600")),
+            max_bytes=int(float(os.environ.get("GROK_RESPONSE_CACHE_MB", "64")) * 1024 * 1024),
+            directory=os.environ.get("GROK_RESPONSE_CACHE_DIR") or None,
+            max_disk_bytes=int(float(os.environ.get("GROK_RESPONSE_CACHE_DISK_MB", "512")) * 1024 * 1024),
+        )
+
+    @staticmethod
+    def key_for(message: str, model: str) -> str:
+        normalised: str = " ".join(message.split())
+        return hashlib.sha256(json.dumps([normalised, model]).encode()).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        now: float = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                self._drop(key)
+
+        if self.directory and os.path.exists(self._disk_path(key)):
+            try:
+                with open(self._disk_path(key), "r") as f:
+                    stored: dict = json.load(f)
+                if stored["expires"] > now:
+                    self._remember(key, stored["expires"], stored["answer"])
+                    with self.lock:
+                        self.hits += 1
+                    return stored["answer"]
+                os.remove(self._disk_path(key))
+            except Exception:
+                pass
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, answer: dict) -> None:
+        expires: float = time.time() + self.ttl
+        self._remember(key, expires, answer)
+        if self.directory:
+            tmp: str = self._disk_path(key) + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"expires": expires, "answer": answer}, f)
+            os.replace(tmp, self._disk_path(key))
+            self._trim_disk()
+
+    def _remember(self, key: str, expires: float, answer: dict) -> None:
+        size: int = len(json.dumps(answer))
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (expires, answer, size)
+            self.total += size
+            while self.total > self.max_bytes and len(self.entries) > 1:
+                self._drop(next(iter(self.entries)))
+
+    def _drop(self, key: str) -> None:
+        _, _, size = self.entries.pop(key)
+        self.total -= size
+
+    def _trim_disk(self) -> None:
+        files: list = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(self.directory, name))
+                files.append((stat.st_mtime, stat.st_size, name))
+        used: int = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if used <= self.max_disk_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            used -= size
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            lookups: int = self.hits + self.misses
+            return {
+                "enabled_by_default": RESPONSE_CACHE_DEFAULT,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.total,
+                "max_bytes": self.max_bytes,
+            }
+
+RESPONSE_CACHE = ResponseCache.from_env()
+
+def cacheable(answer: dict) -> dict:
+    """The parts of an answer other callers may be served: never its session (cookies, keys, conversation ids)."""
+    return {k: answer[k] for k in ("response", "stream_response", "images", "local_images") if k in answer}
+
+def replay_answer(answer: dict, stream: bool):
+    """Serve a cached answer in the same shape as a live one."""
+    if not stream:
+        return {"status": "success", "extra_data": None, **answer}
+    
+    def stream_generator():
+        for token in answer.get("stream_response") or []:
+            yield json.dumps({"type": "token", "content": token}) + "\n"
+        final_chunk: dict = {"type": "final", "images": answer.get("images"), "extra_data": answer.get("extra_data")}
+        if answer.get("local_images"):
+            final_chunk["local_images"] = answer["local_images"]
+        yield json.dumps(final_chunk) + "\n"
+    
+    return StreamingResponse(stream_generator(), media_type="application/x-ndjson")
+
+class DriverStatus:
+    """
+    Cached view of the driver's /health, so /ask only routes to it once it
+    is ready and tells "still starting" apart from "not running". Drivers
+    without /health are treated as usable.
+    """
+
+    def __init__(self, url: str, ready_ttl: float = 10, waiting_ttl: float = 1) -> None:
+        self.url: str = url
+        self.ready_ttl: float = ready_ttl
+        self.waiting_ttl: float = waiting_ttl
+        self.status: dict = {"state": "unknown"}
+        self.expires: float = 0
+        self.lock = Lock()
+
+    def check(self) -> dict:
+        with self.lock:
+            if time.time() < self.expires:
+                return self.status
+        try:
+            import requests
+            response = requests.get(f"{self.url}/health", timeout=0.5)
+            status: dict = response.json() if response.status_code in (200, 503) else {"state": "unknown"}
+        except Exception:
+            status = {"state": "down"}
+        self._remember(status)
+        return status
+
+    def usable(self) -> bool:
+        return self.check().get("state") in ("ready", "unknown")
+
+    def mark_down(self) -> None:
+        self._remember({"state": "down"})
+
+    def _remember(self, status: dict) -> None:
+        with self.lock:
+            self.status = status
+            self.expires = time.time() + (self.ready_ttl if status.get("state") == "ready" else self.waiting_ttl)
+
+DRIVER = DriverStatus(DRIVER_URL)
+
 @app.get("/")
 async def health_check():
-    return {"status": "online", "service": "Grok API"}
+    return {"status": "online", "service": "Grok API", "driver": DRIVER.status.get("state")}
+
+@app.get("/proxies")
+async def proxy_status():
+    return {"proxies": PROXY_POOL.snapshot()}
+
+@app.get("/images/{key}")
+def get_image(key: str, range_header: Optional[str] = Header(None, alias="range"), if_none_match: Optional[str] = Header(None)):
+    """Serve a generated image from the local cache, fetching it once upstream."""
+    try:
+        image: Optional[dict] = IMAGE_CACHE.get(key)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Image fetch failed: {str(e)}")
+    if image is None:
+        raise HTTPException(status_code=404, detail="Unknown image")
+
+    headers: dict = {
+        "ETag": f'"{image["sha"]}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if if_none_match and image["sha"] in if_none_match:
+        return Response(status_code=304, headers=headers)
+
+    size: int = image["size"]
+    start, end = 0, size - 1
+    status: int = 200
+    if range_header:
+        try:
+            unit, spec = range_header.split("=", 1)
+            first, last = spec.split(",")[0].strip().split("-")
+            if unit.strip() != "bytes":
+                raise ValueError
+            if first:
+                start, end = int(first), min(int(last), size - 1) if last else size - 1
+            else:
+                start, end = max(size - int(last), 0), size - 1
+            if start > end or start >= size:
+                raise ValueError
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        except ValueError:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+
+    with open(image["path"], "rb") as f:
+        f.seek(start)
+        content: bytes = f.read(end - start + 1)
+    return Response(content=content, status_code=status, media_type=image["type"], headers=headers)
+
+@app.get("/cache")
+async def cache_status():
+    return RESPONSE_CACHE.snapshot()
+
+@app.get("/transport")
+async def transport_status():
+    from core.transport import get_transport
+    return get_transport().snapshot()
 
 @app.post("/ask")
 def create_conversation(request: Request, body: ConversationRequest):
     if not body.message:
         raise HTTPException(status_code=400, detail="Message is required")
     
+    # Streamed bodies record their own `bridge.stream` span under this one
+    with TRACER.span("bridge.ask", traceparent=request.headers.get("traceparent"), model=body.model, stream=body.stream, reply=bool(body.extra_data)) as span:
+        return answer_conversation(body, span)
+
+def answer_conversation(body: ConversationRequest, span):
+    # Only new conversations on the shared session are idempotent enough to replay
+    use_cache: bool = (body.cache if body.cache is not None else RESPONSE_CACHE_DEFAULT) and not (body.extra_data or body.cookies or body.proxy)
+    cache_key: Optional[str] = RESPONSE_CACHE.key_for(body.message, body.model) if use_cache else None
+    if cache_key:
+        cached: Optional[dict] = RESPONSE_CACHE.get(cache_key)
+        span.set(cache="hit" if cached is not None else "miss")
+        if cached is not None:
+            return replay_answer(cached, body.stream)
+    
     # --- BROWSER DRIVER FALLBACK ---
     # First, try to send to the local browser driver (Playwright) if it's running.
     # This bypasses all 403 blocks.
     try:
+        import requests
+        
+        if not DRIVER.usable():
+            raise ConnectionError(f"driver is {DRIVER.status['state']}")
+        
         # Append instruction to avoid emojis
         final_message = body.message + "\n(system: do not use emojis in your response)"
-        driver_resp = requests.post(
-            "http://127.0.0.1:8001/ask", 
-            json={"message": final_message}, 
-            timeout=35
-        )
+        # Follow-ups of a driver conversation go back to the same browser tab
+        driver_convo: Optional[str] = body.extra_data.get("conversationId") if body.extra_data and body.extra_data.get("source") == "browser_driver" else None
+        with TRACER.span("bridge.driver") as driver_span:
+            driver_resp = requests.post(
+                f"{DRIVER_URL}/ask", 
+                json={"message": final_message, "conversation_id": driver_convo}, 
+                headers=TRACER.headers(),
+                timeout=35
+            )
+            driver_span.set(status=driver_resp.status_code)
         if driver_resp.status_code == 200:
              # Success! 
              print(f"[Bridge] Successfully routed to Browser Driver!")
@@ -89,6 +429,15 @@ def create_conversation(request: Request, body: ConversationRequest):
              if text.startswith("CLASS: "): text = text[7:]
              if text.startswith("P: "): text = text[3:]
              if text.startswith("FALLBACK: "): text = text[10:]
+             driver_extra: dict = {"source": "browser_driver", "conversationId": data.get("conversation_id")}
+             
+             if cache_key:
+                 RESPONSE_CACHE.put(cache_key, {
+                     "response": text,
+                     "stream_response": [text],
+                     "images": [],
+                     "extra_data": {"source": "browser_driver"} # replays must not share a tab
+                 })
              
              if body.stream:
                  def stream_generator():
@@ -106,7 +455,7 @@ def create_conversation(request: Request, body: ConversationRequest):
                      # Send final metadata to ensure state is updated
                      final_chunk = {
                          "type": "final",
-                         "extra_data": {"source": "browser_driver"}
+                         "extra_data": driver_extra
                       }
                      yield json.dumps(final_chunk) + "\n"
                      
@@ -116,62 +465,184 @@ def create_conversation(request: Request, body: ConversationRequest):
                  "response": text,
                  "stream_response": [text],
                  "images": [],
-                 "extra_data": {"source": "browser_driver"}
+                 "extra_data": driver_extra
              }
         else:
              print(f"[Bridge] Driver returned status: {driver_resp.status_code}")
     except Exception as e:
         # Driver not running, fall back to internal API
+        if DRIVER.status.get("state") in ("ready", "unknown"):
+            DRIVER.mark_down()
         print(f"[Bridge] Could not connect to driver: {e}")
         pass
         
     last_req_time = time.time()
     stream = body.stream
     
-    # Cookie source prioritization:
-    # 1. Direct request.cookies (from UI)
-    # 2. Local grok_session.json fallback (from inject script or harvester)
-    # 3. Last-minute harvest attempt
-    cookies = body.cookies
-    if not cookies:
-        if os.path.exists("grok_session.json"):
-            try:
-                with open("grok_session.json", "r") as f:
-                    cookies = json.load(f)
-            except:
-                pass
-        
-        # If still no cookies, try auto-harvesting once
-        if not cookies:
-            try:
-                from grok_harvester import harvest
-                cookies = harvest()
-            except:
-                pass
+    cookies = resolve_cookies(body.cookies)
 
-    proxy = format_proxy(body.proxy) if body.proxy else None
+    proxy = select_proxy(body.proxy, body.extra_data)
     
     if body.stream:
+        parent = TRACER.current()
         def stream_generator():
+            # Runs after /ask returned, one worker-thread call per chunk
+            stream_span = TRACER.span("bridge.stream", parent=parent, proxy=bool(proxy))
             try:
                 # Synchronous generator
-                grok = Grok(body.model, proxy, cookies=cookies)
-                iterator = grok.start_convo(body.message, body.extra_data, stream=True)
+                with TRACER.use(stream_span):
+                    grok = core.Grok(body.model, proxy, cookies=cookies)
+                    iterator = grok.start_convo(body.message, body.extra_data, stream=True)
+                tokens: list = []
+                failed: bool = False
                 for chunk in iterator:
+                    if "error" in chunk or chunk.get("type") == "final":
+                        record_proxy_result(proxy, chunk)
+                        failed = failed or "error" in chunk
+                    if chunk.get("images"):
+                        chunk["local_images"] = cache_images(chunk["images"], grok.session.cookies.get_dict())
+                    if chunk.get("type") == "token":
+                        tokens.append(chunk["content"])
+                    elif chunk.get("type") == "final" and cache_key and not failed:
+                        RESPONSE_CACHE.put(cache_key, {
+                            "response": "".join(tokens),
+                            "stream_response": tokens,
+                            "images": chunk.get("images"),
+                            "local_images": chunk.get("local_images", [])
+                        })
                     yield json.dumps(chunk) + "\n"
             except Exception as e:
+                PROXY_POOL.report_error(proxy, str(e))
+                stream_span.end(str(e))
                 yield json.dumps({"error": str(e)}) + "\n"
+            finally:
+                stream_span.end()
                 
         return StreamingResponse(stream_generator(), media_type="application/x-ndjson")
 
     try:
-        answer: dict = Grok(body.model, proxy, cookies=cookies).start_convo(body.message, body.extra_data)
+        answer: dict = core.Grok(body.model, proxy, cookies=cookies).start_convo(body.message, body.extra_data)
+        record_proxy_result(proxy, answer)
+        if answer.get("images"):
+            answer["local_images"] = cache_images(answer["images"], answer["extra_data"]["cookies"])
+        if cache_key and "error" not in answer:
+            RESPONSE_CACHE.put(cache_key, cacheable(answer))
         return {
             "status": "success",
             **answer
         }
     except Exception as e:
+        PROXY_POOL.report_error(proxy, str(e))
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+class WarmSessions:
+    """
+    Pool of grok.com site state (cookies, actions, xsid script, baggage)
+    left behind by finished conversations, keyed by proxy and the cookies
+    the caller brought, so one identity's session is never handed to
+    another. A new conversation started from one skips the page load and
+    script parse.
+    """
+
+    SITE_KEYS: tuple = ("cookies", "actions", "xsid_script", "baggage", "sentry_trace")
+
+    def __init__(self, ttl: float = WARM_SESSION_TTL, size: int = BATCH_MAX_CONCURRENCY) -> None:
+        self.ttl: float = ttl
+        self.size: int = size
+        self.pool: dict = {}
+        self.lock = Lock()
+
+    @staticmethod
+    def key_for(proxy: Optional[str], cookies: Optional[dict]) -> tuple:
+        identity: Optional[str] = hashlib.sha256(json.dumps(cookies, sort_keys=True).encode()).hexdigest() if cookies else None
+        return proxy, identity
+
+    def take(self, proxy: Optional[str], cookies: Optional[dict]) -> Optional[dict]:
+        with self.lock:
+            entries: list = self.pool.get(self.key_for(proxy, cookies), [])
+            while entries:
+                stored_at, site = entries.pop()
+                if time.time() - stored_at < self.ttl:
+                    return site
+        return None
+
+    def put(self, proxy: Optional[str], cookies: Optional[dict], extra_data: Optional[dict]) -> None:
+        if not extra_data or not all(extra_data.get(k) for k in self.SITE_KEYS):
+            return
+        site: dict = {k: extra_data[k] for k in self.SITE_KEYS}
+        with self.lock:
+            entries: list = self.pool.setdefault(self.key_for(proxy, cookies), [])
+            entries.append((time.time(), site))
+            del entries[:-self.size]
+
+WARM_SESSIONS = WarmSessions()
+
+def is_transient(result: dict) -> bool:
+    """Errors worth retrying: upstream overload and 5xx, not anti-bot blocks."""
+    error: str = str(result.get("error", ""))
+    if not error or "403" in error or "anti-bot" in error.lower():
+        return False
+    return "usage" in error.lower() or any(f" {code}" in error for code in ("429", "500", "502", "503", "504"))
+
+def run_batch_item(item: BatchItem, cookies: Optional[dict], retries: int) -> dict:
+    attempts: int = 0
+    cookies = item.cookies or cookies
+    
+    while True:
+        attempts += 1
+        # Re-select each attempt so a retry moves off an ejected proxy
+        proxy = select_proxy(item.proxy, item.extra_data)
+        site = None if item.extra_data else WARM_SESSIONS.take(proxy, cookies)
+        try:
+            result: dict = core.Grok(item.model, proxy, cookies=cookies).start_convo(item.message, item.extra_data, site_data=site)
+            transient: bool = is_transient(result)
+        except Exception as e:
+            # Network errors/timeouts are retried, as is a stale warm session
+            result = {"error": f"Error: {str(e)}"}
+            transient = True
+        record_proxy_result(proxy, result)
+
+        if "error" not in result:
+            WARM_SESSIONS.put(proxy, cookies, result.get("extra_data"))
+            if result.get("images"):
+                result["local_images"] = cache_images(result["images"], result["extra_data"]["cookies"])
+            return {"status": "success", "attempts": attempts, **result}
+        if not transient or attempts > retries:
+            return {"status": "error", "attempts": attempts, **result}
+        time.sleep(min(2 ** attempts, 10))
+
+@app.post("/ask/batch")
+def create_batch(body: BatchRequest):
+    """
+    Run independent prompts concurrently against the direct Grok API and
+    stream one NDJSON line per item, in completion order, tagged by index.
+    """
+    if not body.items:
+        raise HTTPException(status_code=400, detail="At least one item is required")
+    
+    # Resolve shared cookies once instead of per item
+    cookies = resolve_cookies(None) if any(not item.cookies for item in body.items) else None
+    workers: int = max(1, min(body.concurrency, BATCH_MAX_CONCURRENCY, len(body.items)))
+    
+    def batch_generator():
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures: dict = {
+                executor.submit(run_batch_item, item, cookies, body.retries): index
+                for index, item in enumerate(body.items)
+            }
+            for future in as_completed(futures):
+                index: int = futures[future]
+                try:
+                    result: dict = future.result()
+                except Exception as e:
+                    result = {"status": "error", "error": str(e)}
+                yield json.dumps({"index": index, **result}) + "\n"
+    
+    return StreamingResponse(batch_generator(), media_type="application/x-ndjson")
+
 if __name__ == "__main__":
-    run("api_server:app", host="127.0.0.1", port=6969, workers=1)
\ No newline at end of file
+    if "--profile-startup" in sys.argv:
+        from core.startup import profile_startup
+        profile_startup("api_server", "api_server:app")
+    else:
+        run("api_server:app", host="127.0.0.1", port=6969, workers=1)
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""
+Benchmark for the grok.com page extraction in `Grok._load`.
+
+Compares the previous BeautifulSoup + `Utils.between` extraction with
+`PageScanner` on saved pages (e.g. `curl https://grok.com/c > page.html`)
+and checks both return the same scripts and meta values. Without page
+arguments a synthetic page of similar shape is used.
+
+Usage: python benchmarks/page_scan.py [page.html ...] [--rounds N] [--chunk BYTES]
+"""
+import argparse
+import sys
+import time
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from core import Utils
+from core.reverse.page import PageScanner
+
+
+def synthetic_page() -> bytes:
+    scripts = "".join(f'<script src="/_next/static/chunks/{i:04x}-{i * 7919:08x}.js" async=""></script>' for i in range(60))
+    inline = "".join(f'<script>self.__next_f.push([1,"{i}:[\\"$\\",\\"div\\",null,{{\\"children\\":\\"<p>x</p>\\"}}]"])</script>' for i in range(400))
+    return (
+        '<!DOCTYPE html><html lang="en"><head><meta charSet="utf-8"/>'
+        '<meta name="baggage" content="sentry-environment=production,sentry-release=abc123,sentry-public_key=f00"/>'
+        '<meta name="sentry-trace" content="0123456789abcdef0123456789abcdef-0123456789abcdef-0"/>'
+        + scripts + '</head><body><div id="root">' + "<div><span>grok</span></div>" * 2000 + "</div>" + inline + "</body></html>"
+    ).encode()
+
+
+def legacy(content: bytes) -> tuple:
+    text = content.decode("utf-8", "replace")
+    scripts = [s['src'] for s in BeautifulSoup(text, 'html.parser').find_all('script', src=True) if s['src'].startswith('/_next/static/chunks/')]
+    return (
+        scripts,
+        Utils.between(text, '<meta name="baggage" content="', '"'),
+        Utils.between(text, '<meta name="sentry-trace" content="', '-'),
+    )
+
+
+def scanned(content: bytes, chunk: int) -> tuple:
+    page = PageScanner()
+    for i in range(0, len(content), chunk):
+        page.feed(content[i:i + chunk])
+    page.close()
+    return page.scripts, page.meta.get("baggage", ""), page.meta.get("sentry-trace", "").split("-")[0]
+
+
+def timed(func, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pages", nargs="*")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--chunk", type=int, default=16384, help="Download chunk size fed to the scanner")
+    args = parser.parse_args()
+
+    pages = [(p, open(p, "rb").read()) for p in args.pages] or [("synthetic", synthetic_page())]
+
+    for name, content in pages:
+        expected = legacy(content)
+        for chunk in (1, 7, args.chunk, len(content)):
+            if scanned(content, chunk) != expected:
+                raise SystemExit(f"[!] {name}: scanner output differs from BeautifulSoup (chunk={chunk})")
+
+        bs4_s = timed(lambda: legacy(content), args.rounds)
+        scan_s = timed(lambda: scanned(content, args.chunk), args.rounds)
+        print(f"[+] {name} ({len(content) / 1024:.0f} KiB, {len(expected[0])} scripts) | BeautifulSoup: {bs4_s * 1000:.2f}ms | PageScanner: {scan_s * 1000:.2f}ms | {bs4_s / scan_s:.1f}x")
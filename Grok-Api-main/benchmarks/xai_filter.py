@@ -0,0 +1,79 @@
+"""
+Benchmark for the streaming xAI metadata filter.
+
+Replays a synthetic token stream through the legacy per-token
+`_clean_xai_metadata` and through `XaiMetadataFilter`. That the filter
+matches a whole-text clean for any chunking is checked in
+tests/test_xai_filter.py.
+
+Usage: python benchmarks/xai_filter.py [--tokens N] [--rounds N]
+"""
+import argparse
+import random
+import sys
+import time
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from core.grok import XaiMetadataFilter, _clean_xai_metadata
+
+PROSE: list = [
+    "The", " quick", " brown", " fox", " jumps", " over", " the", " lazy",
+    " dog", ".", " Next", ",", " an", " example", ":", "\n", "  ", " result",
+]
+MARKERS: list = [
+    " xai:tool_usage_card_id3f2a-91bc", " xai:tool_name", "web_search",
+    " xai:tool_args", " XAI:TOOL_NAME", "xai:tool_usage_card",
+]
+
+
+def make_text(tokens: int, seed: int, marker_rate: float = 0.02) -> str:
+    rng = random.Random(seed)
+    return "".join(rng.choice(MARKERS if rng.random() < marker_rate else PROSE) for _ in range(tokens))
+
+
+def chunk(text: str, rng: random.Random, max_size: int = 8) -> list:
+    """Split `text` at random points into token-sized pieces."""
+    chunks, i = [], 0
+    while i < len(text):
+        size = rng.randint(1, max_size)
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
+
+
+def run_filter(chunks: list) -> str:
+    xai_filter = XaiMetadataFilter()
+    return "".join(xai_filter.feed(c) for c in chunks) + xai_filter.flush()
+
+
+def timed(func, rounds: int) -> float:
+    """Best of `rounds` runs, in seconds: the least disturbed by other load."""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(tokens: int, rounds: int) -> None:
+    rng = random.Random(1)
+    chunks = chunk(make_text(tokens, 1), rng)
+
+    legacy = [_clean_xai_metadata(c) for c in chunks]
+    legacy_s = timed(lambda: [_clean_xai_metadata(c) for c in chunks], rounds)
+    filter_s = timed(lambda: run_filter(chunks), rounds)
+
+    leaked = sum("xai:" in t.lower() for t in legacy)
+    print(f"[+] {len(chunks)} chunks | per-token regex: {legacy_s * 1000:.2f}ms ({leaked} leaked markers) | streaming filter: {filter_s * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=200_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    bench(args.tokens, args.rounds)
@@ -1,7 +1,33 @@
-from .logger         import Log
-from .runtime        import Run, Utils
-from .headers        import Headers
-from .reverse.parser import Parser
-from .reverse.xctid  import Signature
-from .reverse.anon   import Anon
-from .grok           import Grok
\ No newline at end of file
+from importlib import import_module
+
+# Public names are resolved on first access so importing `core` stays cheap;
+# curl_cffi, coincurve and the mapping loaders load only when used.
+_EXPORTS: dict = {
+    "Log":         ".logger",
+    "Run":         ".runtime",
+    "Utils":       ".runtime",
+    "Headers":     ".headers",
+    "Parser":      ".reverse.parser",
+    "Signature":   ".reverse.xctid",
+    "Anon":        ".reverse.anon",
+    "Flight":      ".reverse.flight",
+    "PageScanner": ".reverse.page",
+    "Grok":        ".grok",
+    "ProxyPool":   ".proxies",
+    "Transport":   ".transport",
+    "ImageCache":  ".images",
+    "Tracer":      ".tracing",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'core' has no attribute '{name}'")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__() -> list:
+    return sorted(list(globals()) + __all__)
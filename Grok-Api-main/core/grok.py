@@ -1,9 +1,13 @@
 from core        import Log, Run, Utils, Parser, Signature, Anon, Headers
+from core.reverse.flight import Flight
+from core.reverse.page   import PageScanner
+from core.transport      import get_transport
+from core.tracing        import Tracer
 from curl_cffi   import requests, CurlMime
 from dataclasses import dataclass, field
-from bs4         import BeautifulSoup
 from json        import dumps, loads
 from secrets     import token_hex
+from time        import perf_counter
 from uuid        import uuid4
 import re
 
@@ -14,14 +18,109 @@ _XAI_TOOL_RE = re.compile(
     r'|xai:tool_args',
     re.IGNORECASE
 )
+_SPACES_RE = re.compile(r' {2,}')
+
+# Token ends that may still grow into a marker
+_XAI_PARTIALS = ('x', 'xa', 'xai')
+
+# Literal stems a partial marker at the end of a chunk may still grow into
+_XAI_MARKER_STEMS = ('xai:tool_usage_card_id', 'xai:tool_name', 'xai:tool_args')
 
 def _clean_xai_metadata(text: str) -> str:
     """Strip xAI tool usage card metadata from token text."""
     cleaned = _XAI_TOOL_RE.sub('', text)
     # Collapse multiple spaces/newlines left by removal
-    cleaned = re.sub(r' {2,}', ' ', cleaned)
+    cleaned = _SPACES_RE.sub(' ', cleaned)
     return cleaned
 
+class XaiMetadataFilter:
+    """
+    Streaming variant of `_clean_xai_metadata`.
+
+    Markers split across token boundaries are held in a small lookahead
+    buffer until they can be resolved, so the concatenated output equals
+    `_clean_xai_metadata` applied to the whole stream for any chunking.
+    """
+
+    def __init__(self) -> None:
+        self._pending: str = ""
+        self._last_space: bool = False
+
+    def feed(self, token: str) -> str:
+        if self._pending:
+            token, self._pending = self._pending + token, ""
+        # Fast path: no complete "xai:" in sight, at most a trailing "x"/"xa"/"xai" to hold back
+        if 'x' in token or 'X' in token:
+            lower: str = token.lower()
+            if 'xai:' in lower:
+                return self._scan(token, lower)
+            if lower.endswith(_XAI_PARTIALS):
+                cut: int = lower.rindex('x')
+                token, self._pending = token[:cut], token[cut:]
+        if '  ' in token:
+            token = _SPACES_RE.sub(' ', token)
+        if token:
+            if token[0] == ' ' and self._last_space:
+                token = token[1:]
+                if not token:
+                    return token
+            self._last_space = token[-1] == ' '
+        return token
+
+    def _scan(self, text: str, lower: str) -> str:
+        """Slow path: strip the markers in `text`, holding back one that may continue."""
+        out: list = []
+        i: int = 0
+
+        while True:
+            idx: int = lower.find('xai:', i)
+            if idx == -1:
+                # Hold back a trailing "x", "xa" or "xai" that may start a marker
+                hold: int = lower.rfind('x', max(i, len(text) - 3))
+                if hold == -1 or not 'xai:'.startswith(lower[hold:]):
+                    hold = len(text)
+                out.append(text[i:hold])
+                self._pending = text[hold:]
+                break
+
+            out.append(text[i:idx])
+            tail: str = lower[idx:]
+            match = _XAI_TOOL_RE.match(text, idx)
+
+            if match is None:
+                if any(stem.startswith(tail) for stem in _XAI_MARKER_STEMS):
+                    self._pending = text[idx:]
+                    break
+                out.append(text[idx])
+                i = idx + 1
+                continue
+
+            # A match touching the end (or a bare usage card followed by a
+            # partial "_id") may still grow with the next token
+            if match.end() == len(text) or (match.group(0).lower().endswith('_card') and '_id'.startswith(lower[match.end():])):
+                self._pending = text[idx:]
+                break
+            i = match.end()
+
+        return self._emit(''.join(out))
+
+    def flush(self) -> str:
+        """Release whatever is still buffered once the stream has ended."""
+        text, self._pending = self._pending, ""
+        return self._emit(_XAI_TOOL_RE.sub('', text))
+
+    def _emit(self, text: str) -> str:
+        if not text:
+            return text
+        if '  ' in text:
+            text = _SPACES_RE.sub(' ', text)
+        if self._last_space and text[0] == ' ':
+            text = text[1:]
+            if not text:
+                return text
+        self._last_space = text[-1] == ' '
+        return text
+
 @dataclass
 class Models:
     models: dict[str, list[str]] = field(default_factory=lambda: {
@@ -36,12 +135,14 @@ class Models:
         return self.models.get(model, ["MODEL_MODE_AUTO", "auto"])[index]
 
 _Models = Models()
+_TRACER = Tracer("grok")
 
 class Grok:
     
     def __init__(self, model: str = "grok-3-auto", proxy: str = None, cookies: dict = None) -> None:
-        # Use a consistent browser impersonation
-        self.session: requests.session.Session = requests.Session(impersonate="chrome131", default_headers=False)
+        # Cookie-isolated session on the shared transport (pooled connections,
+        # impersonation profile configured in core/transport.py)
+        self.session: requests.session.Session = get_transport().session(default_headers=False)
         self.headers: Headers = Headers()
         
         self.model_mode: str = _Models.get_model_mode(model, 0)
@@ -88,7 +189,11 @@ class Grok:
                  self.session.headers["sec-fetch-site"] = "same-site"
                  Log.Success("Using auth_token for X.com fallback authentication")
                  
-            load_site: requests.models.Response = self.session.get('https://grok.com/c')
+            # Scan script srcs and meta tags as the body downloads; a content
+            # callback (unlike stream=True) keeps the pooled connection
+            page: PageScanner = PageScanner()
+            load_site: requests.models.Response = self.session.get('https://grok.com/c', content_callback=lambda chunk: page.feed(chunk) or len(chunk))
+            page.close()
             
             if load_site.status_code != 200:
                 Log.Error(f"Site Load Failed: {load_site.status_code}")
@@ -96,15 +201,15 @@ class Grok:
                 
             self.session.cookies.update(load_site.cookies)
             
-            scripts: list = [s['src'] for s in BeautifulSoup(load_site.text, 'html.parser').find_all('script', src=True) if s['src'].startswith('/_next/static/chunks/')]
+            scripts: list = page.scripts
 
             if not scripts:
                  Log.Error("No scripts found in site load. Check cookies/proxy.")
 
             self.actions, self.xsid_script = Parser.parse_grok(scripts)
             
-            self.baggage: str = Utils.between(load_site.text, '<meta name="baggage" content="', '"')
-            self.sentry_trace: str = Utils.between(load_site.text, '<meta name="sentry-trace" content="', '-')
+            self.baggage: str = page.meta.get("baggage", "")
+            self.sentry_trace: str = page.meta.get("sentry-trace", "").split("-")[0]
             Log.Success(f"Site Loaded. Actions: {len(self.actions)}")
         else:
             self.session.cookies.update(extra_data["cookies"])
@@ -138,7 +243,9 @@ class Grok:
 
             self.session.cookies.update(c_request.cookies)
             
-            self.anon_user: str = Utils.between(c_request.text, '{"anonUserId":"', '"')
+            self.anon_user: str = Flight.parse(c_request.content).anon_user_id()
+            if self.anon_user is None:
+                raise Exception("anonUserId not found in c_request response.")
             self.c_run += 1
             Log.Success(f"Keys Registered. AnonID: {self.anon_user[:8]}...")
             
@@ -156,30 +263,51 @@ class Grok:
 
             self.session.cookies.update(c_request.cookies)
 
+            # Server action responses are RSC flight streams; tokenize once
+            flight: Flight = Flight.parse(c_request.content)
+
             match self.c_run:
                 case 1:
-                    start_idx = c_request.content.hex().find("3a6f38362c")
-                    if start_idx != -1:
-                        start_idx += len("3a6f38362c")
-                        end_idx = c_request.content.hex().find("313a", start_idx)
-                        if end_idx != -1:
-                            challenge_hex = c_request.content.hex()[start_idx:end_idx]
-                            challenge_bytes = bytes.fromhex(challenge_hex)
+                    challenge_bytes: bytes = flight.challenge()
+                    if challenge_bytes is None:
+                        raise Exception("Challenge row missing from handshake response.")
 
                     self.challenge_dict: dict = Anon.sign_challenge(challenge_bytes, self.keys["privateKey"])
                     Log.Success(f"Solved Challenge.")
                 case 2:
-                    self.verification_token, self.anim = Parser.get_anim(c_request.text, "grok-site-verification")
-                    self.svg_data, self.numbers = Parser.parse_values(c_request.text, self.anim, self.xsid_script)
+                    self.verification_token, self.anim = Parser.get_anim(flight, "grok-site-verification")
+                    self.svg_data, self.numbers = Parser.parse_values(flight, self.anim, self.xsid_script)
                     Log.Success("Verification parsed. Ready for convo.")
                     
             self.c_run += 1
     
-    def _stream_response(self, response_stream, extra_data, conversation_id=None, parent_response=None):
+    def _stream_response(self, response_stream, extra_data, conversation_id=None, parent_response=None, trace_parent=None):
+        """Yield stream chunks, recording the consumption as a `grok.stream` span"""
+        span = _TRACER.span("grok.stream", parent=trace_parent, status=response_stream.status_code)
+        started: float = perf_counter()
+        tokens: int = 0
+        error: str = None
+        try:
+            for chunk in self._iter_stream(response_stream, extra_data, conversation_id, parent_response):
+                if chunk.get("type") == "token":
+                    tokens += 1
+                    if tokens == 1:
+                        span.set(first_token_ms=round((perf_counter() - started) * 1000, 3))
+                error = chunk.get("error", error)
+                yield chunk
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            span.set(tokens=tokens)
+            span.end(error)
+
+    def _iter_stream(self, response_stream, extra_data, conversation_id=None, parent_response=None):
         """Helper to yield stream chunks and final metadata"""
         response_text = ""
         stream_tokens = []
         image_urls = None
+        xai_filter = XaiMetadataFilter()
         
         if response_stream.status_code != 200:
             error_msg = f"Grok API Error {response_stream.status_code}: {response_stream.text[:200]}"
@@ -203,8 +331,8 @@ class Grok:
                 )
                 
                 if token:
-                    token = _clean_xai_metadata(token)
-                    if token.strip():  # Only yield non-empty tokens after cleaning
+                    token = xai_filter.feed(token)
+                    if token:  # Markers may be held back until the next token
                         stream_tokens.append(token)
                         response_text += token
                         yield {"type": "token", "content": token}
@@ -216,10 +344,23 @@ class Grok:
                 if not parent_response and data.get('result', {}).get('response', {}).get('modelResponse', {}).get('responseId'):
                     parent_response = data['result']['response']['modelResponse']['responseId']
                 
+                # Surface generated images as soon as they appear so the bridge
+                # can prefetch them while the text is still streaming
+                model_response: dict = data.get('result', {}).get('response', {}).get('modelResponse') or data.get('result', {}).get('modelResponse') or {}
+                if not image_urls and model_response.get('generatedImageUrls'):
+                    image_urls = model_response['generatedImageUrls']
+                    yield {"type": "images", "images": image_urls}
+                
             except Exception as e:
                 # Log parsing errors to terminal for diagnostics
                 print(f"DEBUG: Grok stream parse error on line: {line[:50]}... Error: {e}")
                 pass
+
+        token = xai_filter.flush()
+        if token:
+            stream_tokens.append(token)
+            response_text += token
+            yield {"type": "token", "content": token}
         
         # Final Metadata yield
         final_extra = {
@@ -233,24 +374,30 @@ class Grok:
             "parentResponseId": parent_response,
             "privateKey": self.keys["privateKey"]
         }
-        yield {"type": "final", "extra_data": final_extra}
+        yield {"type": "final", "images": image_urls, "extra_data": final_extra}
 
-    def start_convo(self, message: str, extra_data: dict = None, stream: bool = False):
+    def start_convo(self, message: str, extra_data: dict = None, stream: bool = False, site_data: dict = None):
         
         if not extra_data:
-            self._load()
-            self.c_request(self.actions[0])
-            self.c_request(self.actions[1])
-            self.c_request(self.actions[2])
-            xsid: str = Signature.generate_sign('/rest/app-chat/conversations/new', 'POST', self.verification_token, self.svg_data, self.numbers)
+            # site_data (cookies/actions/xsid_script/baggage/sentry_trace from an
+            # earlier convo) skips the grok.com page load for a new conversation
+            with _TRACER.span("grok.load", warm=bool(site_data)):
+                self._load(site_data)
+            for action in self.actions[:3]:
+                with _TRACER.span("grok.c_request", step=self.c_run):
+                    self.c_request(action)
+            with _TRACER.span("grok.sign"):
+                xsid: str = Signature.generate_sign('/rest/app-chat/conversations/new', 'POST', self.verification_token, self.svg_data, self.numbers)
         else:
             self._load(extra_data)
             self.c_run: int = 1
             self.anon_user: str = extra_data["anon_user"]
             self.keys["privateKey"] = extra_data["privateKey"]
-            self.c_request(self.actions[1])
-            self.c_request(self.actions[2])
-            xsid: str = Signature.generate_sign(f'/rest/app-chat/conversations/{extra_data["conversationId"]}/responses', 'POST', self.verification_token, self.svg_data, self.numbers)
+            for action in self.actions[1:3]:
+                with _TRACER.span("grok.c_request", step=self.c_run):
+                    self.c_request(action)
+            with _TRACER.span("grok.sign"):
+                xsid: str = Signature.generate_sign(f'/rest/app-chat/conversations/{extra_data["conversationId"]}/responses', 'POST', self.verification_token, self.svg_data, self.numbers)
 
         self.session.headers = self.headers.CONVERSATION
         if "auth_token" in self.session.cookies:
@@ -298,10 +445,14 @@ class Grok:
                 'isAsyncChat': False
             }
             
-            convo_request = self.session.post('https://grok.com/rest/app-chat/conversations/new', json=conversation_data, timeout=9999, stream=True)
+            with _TRACER.span("grok.conversation", reply=False):
+                convo_request = self.session.post('https://grok.com/rest/app-chat/conversations/new', json=conversation_data, timeout=9999, stream=True)
             
             if stream:
-                return self._stream_response(convo_request, extra_data)
+                return self._stream_response(convo_request, extra_data, trace_parent=_TRACER.current())
+
+            with _TRACER.span("grok.read", status=convo_request.status_code):
+                convo_request.text
 
             # --- Legacy Non-Streaming Logic ---
             if "modelResponse" in convo_request.text:
@@ -315,14 +466,15 @@ class Grok:
                 # To be safe, I'm duplicating logic.
                 response = conversation_id = parent_response = image_urls = None
                 stream_response = []
+                xai_filter = XaiMetadataFilter()
                 
                 for response_dict in convo_request.text.strip().split('\n'):  
                     try:
                         data = loads(response_dict)
                         token = data.get('result', {}).get('response', {}).get('token')
                         if token:
-                            token = _clean_xai_metadata(token)
-                            if token.strip(): stream_response.append(token)
+                            token = xai_filter.feed(token)
+                            if token: stream_response.append(token)  # as streamed: whitespace tokens included
                             
                         if not response and data.get('result', {}).get('response', {}).get('modelResponse', {}).get('message'):
                             response = _clean_xai_metadata(data['result']['response']['modelResponse']['message'])
@@ -336,6 +488,9 @@ class Grok:
                         if not image_urls and data.get('result', {}).get('response', {}).get('modelResponse', {}).get('generatedImageUrls', {}):
                             image_urls = data['result']['response']['modelResponse']['generatedImageUrls']
                     except Exception: pass
+
+                token = xai_filter.flush()
+                if token: stream_response.append(token)
                 
                 return {
                     "response": response,
@@ -398,23 +553,28 @@ class Grok:
                 'isRegenRequest': False,
             }
 
-            convo_request = self.session.post(f'https://grok.com/rest/app-chat/conversations/{extra_data["conversationId"]}/responses', json=conversation_data, timeout=9999, stream=True)
+            with _TRACER.span("grok.conversation", reply=True):
+                convo_request = self.session.post(f'https://grok.com/rest/app-chat/conversations/{extra_data["conversationId"]}/responses', json=conversation_data, timeout=9999, stream=True)
 
             if stream:
-                return self._stream_response(convo_request, extra_data, conversation_id=extra_data["conversationId"])
+                return self._stream_response(convo_request, extra_data, conversation_id=extra_data["conversationId"], trace_parent=_TRACER.current())
+
+            with _TRACER.span("grok.read", status=convo_request.status_code):
+                convo_request.text
             
             # Non-streaming
             if "modelResponse" in convo_request.text:
                 response = conversation_id = parent_response = image_urls = None
                 stream_response = []
+                xai_filter = XaiMetadataFilter()
                 
                 for response_dict in convo_request.text.strip().split('\n'):
                     try:
                         data = loads(response_dict)
                         token = data.get('result', {}).get('token')
                         if token:
-                            token = _clean_xai_metadata(token)
-                            if token.strip(): stream_response.append(token)
+                            token = xai_filter.feed(token)
+                            if token: stream_response.append(token)  # as streamed: whitespace tokens included
                             
                         if not response and data.get('result', {}).get('modelResponse', {}).get('message'):
                             response = _clean_xai_metadata(data['result']['modelResponse']['message'])
@@ -425,6 +585,9 @@ class Grok:
                         if not image_urls and data.get('result', {}).get('modelResponse', {}).get('generatedImageUrls', {}):
                             image_urls = data['result']['modelResponse']['generatedImageUrls']
                     except Exception: pass
+
+                token = xai_filter.flush()
+                if token: stream_response.append(token)
                 
                 return {
                     "response": response,
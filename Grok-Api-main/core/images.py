@@ -0,0 +1,176 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from hashlib     import sha256
+from threading   import Lock, get_ident
+from typing      import Optional
+from json        import load, dump
+from .logger     import Log
+import os
+
+ASSET_HOST: str = "https://assets.grok.com/"
+
+
+def upstream_url(url: str) -> str:
+    """generatedImageUrls are usually asset paths relative to assets.grok.com."""
+    return url if url.startswith(("http://", "https://")) else ASSET_HOST + url.lstrip("/")
+
+
+class ImageCache:
+    """
+    Size-bounded, content-addressed on-disk cache for Grok generated images.
+
+    Upstream URLs map to short keys (served by the bridge as /images/{key});
+    bodies are stored once per SHA-256 under `blobs/` and evicted least
+    recently used first once the cache grows past `max_bytes`.
+    """
+
+    def __init__(self, directory: str = "image_cache", max_bytes: int = 256 * 1024 * 1024, prefetch_workers: int = 4) -> None:
+        self.directory: str = directory
+        self.blob_dir: str = os.path.join(directory, "blobs")
+        self.index_path: str = os.path.join(directory, "index.json")
+        self.max_bytes: int = max_bytes
+        self.lock = Lock()
+        self.fetch_locks: dict = {}
+        self.cookies: dict = {}        # key -> cookies to fetch it with (memory only)
+        self.index: dict = {}          # key -> {"url", "sha", "type"}
+        self.blobs: OrderedDict = OrderedDict()   # sha -> size, least recent first
+        self.total: int = 0
+        self.prefetcher = ThreadPoolExecutor(max_workers=prefetch_workers, thread_name_prefix="image-prefetch")
+
+        os.makedirs(self.blob_dir, exist_ok=True)
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r") as f:
+                    self.index = load(f)
+            except Exception:
+                self.index = {}
+
+        # Rebuild LRU order from blob mtimes (touched on every hit)
+        blobs: list = []
+        for name in os.listdir(self.blob_dir):
+            stat = os.stat(os.path.join(self.blob_dir, name))
+            blobs.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(blobs):
+            self.blobs[name] = size
+            self.total += size
+
+    @classmethod
+    def from_env(cls) -> "ImageCache":
+        return cls(
+            os.environ.get("GROK_IMAGE_CACHE_DIR", "image_cache"),
+            int(float(os.environ.get("GROK_IMAGE_CACHE_MB", "256")) * 1024 * 1024),
+        )
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        return sha256(upstream_url(url).encode()).hexdigest()[:32]
+
+    def blob_path(self, sha: str) -> str:
+        return os.path.join(self.blob_dir, sha)
+
+    def register(self, url: str, cookies: Optional[dict] = None) -> str:
+        """Remember an upstream image and return its cache key."""
+        key: str = self.key_for(url)
+        with self.lock:
+            if key not in self.index:
+                self.index[key] = {"url": upstream_url(url), "sha": None, "type": None}
+                self._save_index()
+            if cookies:
+                self.cookies[key] = cookies
+        return key
+
+    def prefetch(self, url: str, cookies: Optional[dict] = None) -> str:
+        """Register and download in the background (e.g. while text still streams)."""
+        key: str = self.register(url, cookies)
+        self.prefetcher.submit(self._prefetch, key)
+        return key
+
+    def _prefetch(self, key: str) -> None:
+        try:
+            self.get(key)
+        except Exception as e:
+            Log.Error(f"Image prefetch failed for {key}: {e}")
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Cached image for `key`, fetching it upstream on a miss.
+
+        @return: {"path", "sha", "type", "size"} or None for unknown keys
+        """
+        with self.lock:
+            entry: Optional[dict] = self.index.get(key)
+            if entry is None:
+                return None
+            fetch_lock: Lock = self.fetch_locks.setdefault(key, Lock())
+
+        # One download per key; concurrent requests wait for it
+        try:
+            with fetch_lock:
+                with self.lock:
+                    sha: Optional[str] = entry["sha"]
+                    if sha and sha in self.blobs:
+                        self.blobs.move_to_end(sha)
+                        try:
+                            os.utime(self.blob_path(sha))
+                        except OSError:
+                            pass
+                        return {"path": self.blob_path(sha), "sha": sha, "type": entry["type"], "size": self.blobs[sha]}
+                return self._fetch(key, entry)
+        finally:
+            # Waiters already hold it; a later request finds the blob (or retries) under a fresh lock
+            with self.lock:
+                if self.fetch_locks.get(key) is fetch_lock:
+                    del self.fetch_locks[key]
+
+    def _fetch(self, key: str, entry: dict) -> dict:
+        from .transport import get_transport
+
+        with get_transport().session(cookies=self.cookies.get(key)) as session:
+            response = session.get(entry["url"], timeout=60)
+        if response.status_code != 200:
+            raise Exception(f"Upstream image returned {response.status_code}")
+
+        content: bytes = response.content
+        sha: str = sha256(content).hexdigest()
+        path: str = self.blob_path(sha)
+
+        if not os.path.exists(path):
+            tmp: str = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+
+        with self.lock:
+            if sha not in self.blobs:
+                self.blobs[sha] = len(content)
+                self.total += len(content)
+            self.blobs.move_to_end(sha)
+            entry["sha"] = sha
+            entry["type"] = response.headers.get("content-type", "application/octet-stream")
+            self.cookies.pop(key, None)
+            self._evict()
+            self._save_index()
+        return {"path": path, "sha": sha, "type": entry["type"], "size": len(content)}
+
+    def _evict(self) -> None:
+        # Never evict the most recent blob, even if it alone exceeds the budget
+        while self.total > self.max_bytes and len(self.blobs) > 1:
+            sha, size = self.blobs.popitem(last=False)
+            self.total -= size
+            try:
+                os.remove(self.blob_path(sha))
+            except OSError:
+                pass
+            for entry in self.index.values():
+                if entry["sha"] == sha:
+                    entry["sha"] = None
+
+    def _save_index(self) -> None:
+        tmp: str = f"{self.index_path}.tmp"
+        with open(tmp, "w") as f:
+            dump(self.index, f)
+        os.replace(tmp, self.index_path)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {"images": len(self.index), "blobs": len(self.blobs), "bytes": self.total, "max_bytes": self.max_bytes}
@@ -1,6 +1,5 @@
 from typing      import Optional
 from datetime    import datetime
-from colorama    import Fore
 from threading   import Lock
 from time        import time
 
@@ -10,51 +9,55 @@ class Log:
     Logging class to log text better in console.
     """
     
+    # colorama.Fore attribute names; colorama itself is imported on the first log line
     colours: Optional[dict] = {
-        'SUCCESS': Fore.LIGHTGREEN_EX,
-        'ERROR': Fore.LIGHTRED_EX,
-        'INFO': Fore.LIGHTWHITE_EX
+        'SUCCESS': 'LIGHTGREEN_EX',
+        'ERROR': 'LIGHTRED_EX',
+        'INFO': 'LIGHTWHITE_EX'
     }
     
     lock = Lock()
     
     @staticmethod
-    def _log(level, prefix, message) -> Optional[None]:
+    def _log(level, prefix, message, color=None) -> Optional[None]:
         """
         Private log function to build the payload to print.
         
-        :param level: Just not used, only a filler
+        :param level: Picks the prefix colour when `color` isn't given
         :param prefix: Prefix to indicate if its Success, Error or Info
         :param message: Message to Log
+        :param color: Colour code for the prefix
         """
+        from colorama import Fore
         
         timestamp: Optional[int] = datetime.fromtimestamp(time()).strftime("%H:%M:%S")
+        color = color or getattr(Fore, Log.colours[level])
         
         log_message = (
             f"{Fore.LIGHTBLACK_EX}[{Fore.MAGENTA}{timestamp}{Fore.RESET}{Fore.LIGHTBLACK_EX}]{Fore.RESET} "
-            f"{prefix} {message}"
+            f"{color}{prefix}{Fore.RESET} {message}"
         )
         
         with Log.lock:
             print(log_message)
 
     @staticmethod
-    def Success(message, prefix="[+]", color=colours['SUCCESS']) -> Optional[None]:
+    def Success(message, prefix="[+]", color=None) -> Optional[None]:
         """
         Logging a Success message.
         """
-        Log._log("SUCCESS", f"{color}{prefix}{Fore.RESET}", message)
+        Log._log("SUCCESS", prefix, message, color)
 
     @staticmethod
-    def Error(message, prefix="[!]", color=colours['ERROR']) -> Optional[None]:
+    def Error(message, prefix="[!]", color=None) -> Optional[None]:
         """
         Logging an Error Message.
         """
-        Log._log("ERROR", f"{color}{prefix}{Fore.RESET}", message)
+        Log._log("ERROR", prefix, message, color)
 
     @staticmethod
-    def Info(message, prefix="[!]", color=colours['INFO']) -> Optional[None]:
+    def Info(message, prefix="[!]", color=None) -> Optional[None]:
         """
         Logging an Info Message.
         """
-        Log._log("INFO", f"{color}{prefix}{Fore.RESET}", message)
\ No newline at end of file
+        Log._log("INFO", prefix, message, color)
\ No newline at end of file
@@ -0,0 +1,179 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading   import Lock, Thread, Event
+from typing      import Optional
+from time        import time, perf_counter
+from .logger     import Log
+from os          import environ, path
+
+
+@dataclass
+class ProxyStats:
+    proxy: str
+    latency: Optional[float] = None   # EWMA of probe latency (seconds)
+    requests: int = 0
+    errors: int = 0
+    ejected_until: float = 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+    @property
+    def score(self) -> float:
+        """Lower is better. Unprobed proxies rank after probed healthy ones."""
+        latency: float = self.latency if self.latency is not None else 5.0
+        return latency * (1 + 4 * self.error_rate)
+
+
+class ProxyPool:
+    """
+    Managed pool of upstream proxies for the bridge.
+
+    Proxies are probed in the background (TLS handshake + HEAD to grok.com),
+    new conversations get the best-scoring proxy and replies stick to the
+    proxy their conversation started on. Proxies answering with 403s or
+    timing out are ejected for `eject_for` seconds.
+    """
+
+    PROBE_URL: str = "https://grok.com/favicon.ico"
+
+    def __init__(self, proxies: list = None, probe_interval: float = 60, probe_timeout: float = 10, eject_for: float = 900, max_conversations: int = 5000) -> None:
+        self.stats: dict[str, ProxyStats] = {p: ProxyStats(p) for p in (proxies or [])}
+        self.conversations: OrderedDict = OrderedDict()
+        self.probe_interval: float = probe_interval
+        self.probe_timeout: float = probe_timeout
+        self.eject_for: float = eject_for
+        self.max_conversations: int = max_conversations
+        self.lock = Lock()
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    @classmethod
+    def from_env(cls) -> "ProxyPool":
+        """
+        Load proxies from GROK_PROXIES (comma separated) and/or the file at
+        GROK_PROXY_FILE (default proxies.txt, one proxy per line, # comments).
+        """
+        proxies: list = [p.strip() for p in environ.get("GROK_PROXIES", "").split(",") if p.strip()]
+        proxy_file: str = environ.get("GROK_PROXY_FILE", "proxies.txt")
+
+        if path.exists(proxy_file):
+            with open(proxy_file, "r") as f:
+                proxies += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+        proxies = [p if p.startswith(("http://", "https://", "socks5://")) else "http://" + p for p in proxies]
+        return cls(
+            list(dict.fromkeys(proxies)),
+            probe_interval=float(environ.get("GROK_PROXY_PROBE_INTERVAL", "60")),
+            eject_for=float(environ.get("GROK_PROXY_EJECT_SECONDS", "900")),
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.stats)
+
+    def _available(self) -> list:
+        now: float = time()
+        return [s for s in self.stats.values() if s.ejected_until <= now]
+
+    def pick(self, conversation_id: str = None) -> Optional[str]:
+        """
+        Proxy for a request; replies reuse their conversation's proxy. With
+        every proxy ejected, the one whose cooldown ends first is used
+        rather than going direct from the host's own IP. None only when the
+        pool is empty.
+        """
+        with self.lock:
+            if conversation_id and conversation_id in self.conversations:
+                proxy: str = self.conversations[conversation_id]
+                self.conversations.move_to_end(conversation_id)
+                if self.stats[proxy].ejected_until <= time():
+                    return proxy
+
+            available: list = self._available()
+            if not available:
+                if not self.stats:
+                    return None
+                return min(self.stats.values(), key=lambda s: (s.ejected_until, s.score)).proxy
+            return min(available, key=lambda s: s.score).proxy
+
+    def bind(self, conversation_id: Optional[str], proxy: Optional[str]) -> None:
+        if not conversation_id or proxy not in self.stats:
+            return
+        with self.lock:
+            self.conversations[conversation_id] = proxy
+            self.conversations.move_to_end(conversation_id)
+            while len(self.conversations) > self.max_conversations:
+                self.conversations.popitem(last=False)
+
+    def report(self, proxy: Optional[str], ok: bool, eject: bool = False) -> None:
+        """Record a request outcome; `eject` takes the proxy out of rotation."""
+        if proxy not in self.stats:
+            return
+        with self.lock:
+            stats: ProxyStats = self.stats[proxy]
+            stats.requests += 1
+            if not ok:
+                stats.errors += 1
+            if eject:
+                stats.ejected_until = time() + self.eject_for
+                Log.Error(f"Proxy ejected for {int(self.eject_for)}s: {proxy.rsplit('@', 1)[-1]}")
+
+    def report_error(self, proxy: Optional[str], error: str) -> None:
+        """Classify an error message; 403s and timeouts eject the proxy."""
+        lowered: str = error.lower()
+        self.report(proxy, ok=False, eject="403" in lowered or "anti-bot" in lowered or "timed out" in lowered or "timeout" in lowered)
+
+    def probe(self, proxy: str) -> None:
+        from curl_cffi import requests
+        from .transport import IMPERSONATE
+        
+        start: float = perf_counter()
+        try:
+            # A fresh handle, not the pooled transport: a kept-alive connection would hide the handshake
+            with requests.Session(impersonate=IMPERSONATE, use_thread_local_curl=False) as session:
+                response = session.request("HEAD", self.PROBE_URL, proxies={"all": proxy}, timeout=self.probe_timeout)
+            elapsed: float = perf_counter() - start
+            ok: bool = response.status_code < 400
+            eject: bool = response.status_code == 403
+        except Exception:
+            elapsed, ok, eject = self.probe_timeout, False, True
+
+        with self.lock:
+            stats: ProxyStats = self.stats[proxy]
+            stats.latency = elapsed if stats.latency is None else 0.7 * stats.latency + 0.3 * elapsed
+        self.report(proxy, ok, eject=eject)
+
+    def _probe_loop(self) -> None:
+        while not self._stop.is_set():
+            now: float = time()
+            for proxy, stats in list(self.stats.items()):
+                if self._stop.is_set():
+                    break
+                # Ejected proxies get re-probed only once their cooldown ends
+                if stats.ejected_until <= now:
+                    self.probe(proxy)
+            self._stop.wait(self.probe_interval)
+
+    def start(self) -> None:
+        if self.stats and not self._thread:
+            self._thread = Thread(target=self._probe_loop, name="proxy-probe", daemon=True)
+            self._thread.start()
+            Log.Info(f"Proxy pool probing {len(self.stats)} proxies every {int(self.probe_interval)}s")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def snapshot(self) -> list:
+        now: float = time()
+        with self.lock:
+            return [
+                {
+                    "proxy": s.proxy.rsplit("@", 1)[-1],
+                    "latency_ms": round(s.latency * 1000, 1) if s.latency is not None else None,
+                    "error_rate": round(s.error_rate, 3),
+                    "requests": s.requests,
+                    "ejected": s.ejected_until > now,
+                }
+                for s in sorted(self.stats.values(), key=lambda s: s.score)
+            ]
@@ -0,0 +1,140 @@
+from dataclasses import dataclass, field
+from json        import loads
+from typing      import Any, Callable, Iterator, Optional
+
+# Row tags whose payload is "<hexlen>,<bytes>" instead of newline terminated
+_LENGTH_TAGS: bytes = b"TABOoUSsLlGgMmV"
+_HEX_DIGITS: bytes = b"0123456789abcdefABCDEF"
+_MISSING = object()
+
+
+@dataclass
+class FlightRow:
+    id: str
+    tag: str
+    data: bytes
+    _json: Any = field(default=_MISSING, repr=False)
+
+    def json(self) -> Any:
+        """Decoded JSON payload (cached), or None for binary/non-JSON rows."""
+        if self._json is _MISSING:
+            self._json = None
+            if not self.tag:
+                # Strip a leading type marker such as I, HL or E
+                payload: bytes = self.data.lstrip(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+                try:
+                    self._json = loads(payload)
+                except ValueError:
+                    pass
+        return self._json
+
+
+class Flight:
+    """
+    Incremental tokenizer for React Server Components (Next.js flight)
+    responses, as returned by the grok.com server actions.
+
+    Rows are `<hex id>:<payload>\\n`, except length-prefixed rows
+    (`<hex id>:<tag><hex len>,<bytes>`) used for text and typed arrays.
+    Bytes can be fed in any chunking; rows are tokenized once and their JSON
+    decoded lazily on first lookup.
+    """
+
+    def __init__(self) -> None:
+        self.rows: list[FlightRow] = []
+        self._buffer: bytearray = bytearray()
+
+    @classmethod
+    def parse(cls, content: bytes | str) -> "Flight":
+        flight = cls()
+        flight.feed(content.encode() if isinstance(content, str) else content)
+        flight.close()
+        return flight
+
+    def feed(self, chunk: bytes) -> None:
+        buf: bytearray = self._buffer
+        buf += chunk
+        pos: int = 0
+
+        while pos < len(buf):
+            colon: int = buf.find(b":", pos)
+            if colon == -1:
+                break
+
+            row_id: str = buf[pos:colon].decode("ascii", "replace").strip()
+            tag_pos: int = colon + 1
+            if tag_pos >= len(buf):
+                break
+
+            # Length-prefixed row: tag, hex length, comma, raw bytes
+            if buf[tag_pos] in _LENGTH_TAGS:
+                comma: int = tag_pos + 1
+                while comma < len(buf) and buf[comma] in _HEX_DIGITS:
+                    comma += 1
+                if comma == len(buf):
+                    break
+                if buf[comma] == 44 and comma > tag_pos + 1:  # ","
+                    end: int = comma + 1 + int(buf[tag_pos + 1:comma], 16)
+                    if end > len(buf):
+                        break
+                    self.rows.append(FlightRow(row_id, chr(buf[tag_pos]), bytes(buf[comma + 1:end])))
+                    pos = end
+                    continue
+
+            newline: int = buf.find(b"\n", tag_pos)
+            if newline == -1:
+                break
+            self.rows.append(FlightRow(row_id, "", bytes(buf[tag_pos:newline])))
+            pos = newline + 1
+
+        del buf[:pos]
+
+    def close(self) -> None:
+        """Flush a trailing row that has no terminating newline."""
+        if self._buffer:
+            self.feed(b"\n")
+            self._buffer.clear()
+
+    def binary(self, tag: str = "o") -> Optional[bytes]:
+        """Payload of the first length-prefixed row with `tag` (o = Uint8Array)."""
+        for row in self.rows:
+            if row.tag == tag:
+                return row.data
+        return None
+
+    def walk(self) -> Iterator[Any]:
+        """Every dict and list nested in the JSON rows, depth first."""
+        for row in self.rows:
+            stack: list = [row.json()]
+            while stack:
+                node = stack.pop()
+                if isinstance(node, dict):
+                    yield node
+                    stack.extend(reversed(list(node.values())))
+                elif isinstance(node, list):
+                    yield node
+                    stack.extend(reversed(node))
+
+    def find(self, predicate: Callable[[Any], bool]) -> Any:
+        return next((node for node in self.walk() if predicate(node)), None)
+
+    def find_key(self, key: str) -> Any:
+        node = self.find(lambda n: isinstance(n, dict) and key in n)
+        return node[key] if node else None
+
+    def anon_user_id(self) -> Optional[str]:
+        return self.find_key("anonUserId")
+
+    def challenge(self) -> Optional[bytes]:
+        return self.binary("o")
+
+    def verification(self, name: str = "grok-site-verification") -> Optional[str]:
+        node = self.find(lambda n: isinstance(n, dict) and n.get("name") == name and "content" in n)
+        return node["content"] if node else None
+
+    def animations(self) -> Optional[list]:
+        """The `[[{"color": ...}, ...], ...]` arrays used to build the xsid SVG."""
+        return self.find(
+            lambda n: isinstance(n, list) and n and isinstance(n[0], list) and n[0]
+            and isinstance(n[0][0], dict) and "color" in n[0][0]
+        )
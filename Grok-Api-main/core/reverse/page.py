@@ -0,0 +1,71 @@
+from codecs import getincrementaldecoder
+from typing import Optional
+import re
+
+_TAG_RE = re.compile(r'<(script|meta)\b([^>]*)>', re.IGNORECASE)
+_SCRIPT_END_RE = re.compile(r'</script', re.IGNORECASE)
+_ATTR_RE = re.compile(r'''([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))''')
+
+
+class PageScanner:
+    """
+    Single-pass extractor for the grok.com app page.
+
+    Collects `<script src>` chunk paths and selected `<meta name content>`
+    values without building a document tree. Bytes can be fed while the body
+    is still downloading; inline script bodies are skipped so markup inside
+    JS strings is never mistaken for tags.
+    """
+
+    def __init__(self, script_prefix: str = '/_next/static/chunks/', metas: tuple = ('baggage', 'sentry-trace')) -> None:
+        self.script_prefix: str = script_prefix
+        self.metas: tuple = metas
+        self.scripts: list = []
+        self.meta: dict = {}
+        self._buffer: str = ""
+        self._in_script: bool = False
+        self._decoder = getincrementaldecoder('utf-8')('replace')
+
+    def feed(self, chunk: bytes | str) -> None:
+        text: str = self._buffer + (self._decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        pos: int = 0
+
+        while True:
+            if self._in_script:
+                end = _SCRIPT_END_RE.search(text, pos)
+                if not end:
+                    # Keep enough to catch a "</script" split across chunks
+                    self._buffer = text[max(pos, len(text) - 8):]
+                    return
+                pos = end.end()
+                self._in_script = False
+
+            tag = _TAG_RE.search(text, pos)
+            if not tag:
+                break
+            pos = tag.end()
+
+            attrs: dict = {m.group(1).lower(): next(g for g in m.groups()[1:] if g is not None) for m in _ATTR_RE.finditer(tag.group(2))}
+            if tag.group(1).lower() == 'script':
+                src: Optional[str] = attrs.get('src')
+                if src and src.startswith(self.script_prefix):
+                    self.scripts.append(src)
+                self._in_script = not tag.group(2).rstrip().endswith('/')
+            elif attrs.get('name') in self.metas and 'content' in attrs:
+                self.meta.setdefault(attrs['name'], attrs['content'])
+
+        # Everything up to the last ">" is fully scanned; keep a partial tag
+        tail: str = text[pos:]
+        start: int = tail.find('<', tail.rfind('>') + 1)
+        self._buffer = tail[start:] if start != -1 else ""
+
+    def close(self) -> None:
+        self.feed(self._decoder.decode(b'', final=True))
+        self._buffer = ""
+
+    @classmethod
+    def scan(cls, content: bytes | str, **kwargs) -> "PageScanner":
+        scanner = cls(**kwargs)
+        scanner.feed(content)
+        scanner.close()
+        return scanner
@@ -1,10 +1,10 @@
 from re        import findall, search
-from json      import load, dump, loads
+from json      import load, dump
 from base64    import b64decode
 from typing    import Optional
-from curl_cffi import requests
-from core      import Utils
+from ..transport import get_transport
 from os        import path
+from .flight   import Flight
 import os
 
 # Path normalization for mappings
@@ -35,15 +35,18 @@ class Parser:
             cls._grok_mapping_loaded = True
     
     @staticmethod
-    def parse_values(html: str, loading: int = 0, scriptId: str = "") -> tuple[str, Optional[str]]:
+    def parse_values(flight: Flight | str, loading: int = 0, scriptId: str = "") -> tuple[str, Optional[str]]:
 
         Parser._load__xsid_mapping()
         
-        matches = findall(r'\[\[{"color".*?}\]\]', html)
-        if not matches:
+        if not isinstance(flight, Flight):
+            flight = Flight.parse(flight)
+        
+        animations: Optional[list] = flight.animations()
+        if not animations:
             return "M 0,0 L 0,0" # Fallback SVG
             
-        d_values = loads(matches[0])[loading]
+        d_values = animations[loading]
         svg_data = "M 10,30 C" + " C".join(
             f" {item['color'][0]},{item['color'][1]} {item['color'][2]},{item['color'][3]} {item['color'][4]},{item['color'][5]}"
             f" h {item['deg']}"
@@ -53,14 +56,15 @@ class Parser:
         
         if scriptId:
             if scriptId == "ondemand.s":
-                script_link: str = 'https://abs.twimg.com/responsive-web/client-web/ondemand.s.' + Utils.between(html, f'"{scriptId}":"', '"') + 'a.js'
+                # Missing hash: same link the old HTML scrape built from its empty match
+                script_link: str = 'https://abs.twimg.com/responsive-web/client-web/ondemand.s.' + (flight.find_key(scriptId) or '') + 'a.js'
             else:
                 script_link: str = f'https://grok.com/_next/{scriptId}'
 
             if script_link in Parser.mapping:
                 numbers: list = Parser.mapping[script_link]
             else:
-                script_content: str = requests.get(script_link, impersonate="chrome136").text
+                script_content: str = get_transport().get(script_link).text
                 numbers: list = [int(x) for x in findall(r'x\[(\d+)\]\s*,\s*16', script_content)]
                 Parser.mapping[script_link] = numbers
                 with open(TXID_MAPPING_PATH, 'w') as f:
@@ -71,8 +75,11 @@ class Parser:
             return svg_data
 
     @staticmethod
-    def get_anim(html:  str, verification: str = "grok-site-verification") -> tuple[str, int]:
-        verification_token: str = Utils.between(html, f'"name":"{verification}","content":"', '"')
+    def get_anim(flight: Flight | str, verification: str = "grok-site-verification") -> tuple[str, int]:
+        if not isinstance(flight, Flight):
+            flight = Flight.parse(flight)
+        
+        verification_token: Optional[str] = flight.verification(verification)
         if not verification_token:
              return "", 0
              
@@ -94,7 +101,7 @@ class Parser:
 
         for script in scripts:
             try:
-                content: str = requests.get(f'https://grok.com{script}', impersonate="chrome136").text
+                content: str = get_transport().get(f'https://grok.com{script}').text
                 if "anonPrivateKey" in content:
                     script_content1 = content
                     action_script = script
@@ -0,0 +1,70 @@
+from subprocess import Popen, run, DEVNULL, PIPE
+from time       import perf_counter, sleep
+from os         import path
+import socket
+import sys
+
+# Directory holding api_server.py / grok_driver.py
+ROOT_DIR: str = path.dirname(path.dirname(path.abspath(__file__)))
+
+
+def import_breakdown(module: str, top: int = 12) -> tuple[float, list]:
+    """
+    Import `module` in a fresh interpreter with `-X importtime` and group
+    self time by top-level package.
+
+    @return: (cumulative import seconds, [(package, seconds), ...] slowest first)
+    """
+    result = run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT_DIR, stdout=DEVNULL, stderr=PIPE, text=True)
+    packages: dict = {}
+    total_us: int = 0
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        root: str = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + int(self_us)
+        if name == module:
+            total_us = int(cumulative_us)
+
+    ranked: list = sorted(((k, v / 1e6) for k, v in packages.items()), key=lambda kv: kv[1], reverse=True)
+    return total_us / 1e6, ranked[:top]
+
+
+def time_to_listening(app: str, timeout: float = 120) -> float:
+    """Seconds from spawning uvicorn with `app` until its port accepts connections."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+
+    start: float = perf_counter()
+    process = Popen([sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"], cwd=ROOT_DIR, stdout=DEVNULL, stderr=DEVNULL)
+    try:
+        while perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"{app} exited with code {process.returncode} during startup")
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                    return perf_counter() - start
+            except OSError:
+                sleep(0.02)
+        raise TimeoutError(f"{app} did not listen within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def profile_startup(module: str, app: str) -> None:
+    """Print an import-time and init-time breakdown for a bridge process."""
+    import_s, packages = import_breakdown(module)
+    listening_s: float = time_to_listening(app)
+    baseline_s, _ = import_breakdown("uvicorn")
+
+    print(f"\nStartup profile for {app}")
+    print(f"  {'import ' + module:<32} {import_s * 1000:>9.1f} ms")
+    for package, seconds in packages:
+        print(f"    {package:<30} {seconds * 1000:>9.1f} ms")
+    print(f"  {'uvicorn import (baseline)':<32} {baseline_s * 1000:>9.1f} ms")
+    print(f"  {'init (lifespan + bind)':<32} {max(listening_s - import_s - baseline_s, 0) * 1000:>9.1f} ms")
+    print(f"  {'time to listening':<32} {listening_s * 1000:>9.1f} ms\n")
@@ -0,0 +1,251 @@
+from contextlib  import contextmanager
+from contextvars import ContextVar
+from secrets     import token_hex
+from threading   import Lock
+from typing      import Iterator, Optional
+from json        import dumps, loads
+from time        import time, perf_counter
+import argparse
+import os
+import re
+
+# Shared by the bridge, the driver and the backend servers (stdlib only)
+TRACE_FILE: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "traces.jsonl")
+_TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+_CURRENT: ContextVar = ContextVar("grok_trace_span", default=None)
+
+
+class Span:
+    """One timed operation; ended spans are appended to the tracer's JSONL file."""
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str], attrs: dict) -> None:
+        self.tracer: Tracer = tracer
+        self.name: str = name
+        self.trace_id: str = trace_id
+        self.span_id: str = token_hex(8)
+        self.parent_id: Optional[str] = parent_id
+        self.attrs: dict = attrs
+        self.start: float = time()
+        self._t0: float = perf_counter()
+        self._ended: bool = False
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def end(self, error: Optional[str] = None) -> None:
+        if self._ended:
+            return
+        self._ended = True
+        if error:
+            self.attrs["error"] = error
+        self.tracer.export({
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "service": self.tracer.service,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round((perf_counter() - self._t0) * 1000, 3),
+            "attrs": self.attrs,
+        })
+
+    def __enter__(self) -> "Span":
+        self._token = _CURRENT.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _restore(self._token)
+        self.end(f"{exc_type.__name__}: {exc}" if exc_type else None)
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is disabled."""
+    traceparent: Optional[str] = None
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def end(self, error: Optional[str] = None) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _restore(token) -> None:
+    # Streaming generators can be resumed in a copied context (Starlette
+    # runs each next() in a worker thread); resetting there is not allowed
+    try:
+        _CURRENT.reset(token)
+    except ValueError:
+        _CURRENT.set(None)
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    """(trace_id, parent span_id) from a W3C traceparent header."""
+    match = _TRACEPARENT_RE.match(header.strip().lower()) if header else None
+    return match.groups() if match else None
+
+
+class Tracer:
+    """
+    Minimal span recorder for one process.
+
+    Spans nest through a context variable within a process and cross
+    process boundaries as W3C `traceparent` headers. Disabled unless
+    GROK_TRACE=1; every process appends to the same GROK_TRACE_FILE so one
+    chat turn can be read back across the bridge, driver and backend servers.
+    """
+
+    def __init__(self, service: str, path: Optional[str] = None, enabled: Optional[bool] = None) -> None:
+        self.service: str = service
+        self.path: str = path or os.environ.get("GROK_TRACE_FILE", TRACE_FILE)
+        self.enabled: bool = os.environ.get("GROK_TRACE", "0") == "1" if enabled is None else enabled
+        self.lock = Lock()
+
+    def span(self, name: str, parent=None, traceparent: Optional[str] = None, **attrs):
+        """
+        Start a span (end it with `.end()` or use it as a context manager).
+
+        The parent is `parent` if given, else the remote `traceparent`,
+        else the current span; without any of them a new trace begins.
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = parent if parent is not None else _CURRENT.get()
+        if isinstance(parent, Span):
+            return Span(self, name, parent.trace_id, parent.span_id, attrs)
+        remote: Optional[tuple] = parse_traceparent(traceparent)
+        if remote:
+            return Span(self, name, remote[0], remote[1], attrs)
+        return Span(self, name, token_hex(16), None, attrs)
+
+    @contextmanager
+    def use(self, span) -> Iterator:
+        """Make `span` current for the block without ending it."""
+        if not isinstance(span, Span):
+            yield span
+            return
+        token = _CURRENT.set(span)
+        try:
+            yield span
+        finally:
+            _restore(token)
+
+    def current(self) -> Optional[Span]:
+        return _CURRENT.get()
+
+    def headers(self) -> dict:
+        """Propagation headers for an outgoing request from the current span."""
+        span: Optional[Span] = _CURRENT.get()
+        return {"traceparent": span.traceparent} if span else {}
+
+    def export(self, record: dict) -> None:
+        line: bytes = (dumps(record, default=str) + "\n").encode()
+        with self.lock:
+            # One O_APPEND write per span keeps lines whole across processes
+            fd: int = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+
+
+def load_traces(path: str = TRACE_FILE) -> dict:
+    """trace_id -> list of span records."""
+    traces: dict = {}
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                record: dict = loads(line)
+            except ValueError:
+                continue
+            traces.setdefault(record["trace_id"], []).append(record)
+    return traces
+
+
+def _end(record: dict) -> float:
+    return record["start"] + record["duration_ms"] / 1000
+
+
+def critical_path(spans: list) -> list:
+    """
+    Spans that determine when the trace finishes, as (span, depth) pairs.
+
+    From the root, repeatedly follow the child that ends last, then the
+    sibling that ends last before that child started, and so on.
+    """
+    ids: set = {s["span_id"] for s in spans}
+    children: dict = {}
+    for s in spans:
+        children.setdefault(s["parent_id"] if s["parent_id"] in ids else None, []).append(s)
+
+    path: list = []
+
+    def visit(span: dict, depth: int) -> None:
+        path.append((span, depth))
+        cursor: float = float("inf")
+        chain: list = []
+        for child in sorted(children.get(span["span_id"], []), key=_end, reverse=True):
+            if _end(child) <= cursor:
+                chain.append(child)
+                cursor = child["start"]
+        for child in reversed(chain):
+            visit(child, depth + 1)
+
+    roots: list = sorted(children.get(None, []), key=lambda s: s["start"])
+    for root in roots[:1]:
+        visit(root, 0)
+    return path
+
+
+def print_critical_path(spans: list) -> None:
+    start: float = min(s["start"] for s in spans)
+    total_ms: float = (max(_end(s) for s in spans) - start) * 1000
+    services: set = {s["service"] for s in spans}
+    path: list = critical_path(spans)
+
+    print(f"\nTrace {spans[0]['trace_id']}  {total_ms:.1f} ms  ({len(spans)} spans, {len(services)} services)")
+    print(f"  {'offset':>9} {'duration':>10} {'self':>10}  span")
+    for i, (span, depth) in enumerate(path):
+        child_ms: float = sum(s["duration_ms"] for s, d in path[i + 1:] if d == depth + 1 and s["parent_id"] == span["span_id"])
+        self_ms: float = max(span["duration_ms"] - child_ms, 0)
+        error: str = f"  !! {span['attrs']['error']}" if span["attrs"].get("error") else ""
+        print(f"  {(span['start'] - start) * 1000:>7.1f}ms {span['duration_ms']:>8.1f}ms {self_ms:>8.1f}ms  {'  ' * depth}{span['service']}:{span['name']}{error}")
+    print()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Print the critical path of a recorded trace.")
+    parser.add_argument("trace_id", nargs="?", help="trace to show (default: the slowest one)")
+    parser.add_argument("--file", default=os.environ.get("GROK_TRACE_FILE", TRACE_FILE))
+    parser.add_argument("--last", action="store_true", help="show the most recent trace instead of the slowest")
+    args = parser.parse_args()
+
+    traces: dict = load_traces(args.file)
+    if not traces:
+        raise SystemExit(f"No spans in {args.file}")
+
+    if args.trace_id:
+        matches: list = [t for t in traces if t.startswith(args.trace_id)]
+        if not matches:
+            raise SystemExit(f"Trace {args.trace_id} not found")
+        spans: list = traces[matches[0]]
+    elif args.last:
+        spans = max(traces.values(), key=lambda s: min(r["start"] for r in s))
+    else:
+        spans = max(traces.values(), key=lambda s: max(map(_end, s)) - min(r["start"] for r in s))
+    print_critical_path(spans)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+from curl_cffi   import requests, Curl
+from threading   import Lock
+from weakref     import finalize
+from typing      import Optional
+
+# Browser profile used for every request to grok.com (matches headers.py)
+IMPERSONATE: str = "chrome131"
+
+
+class PooledSession(requests.Session):
+    """
+    curl_cffi Session with its own cookie jar, running on a curl handle
+    borrowed from a `Transport`. The handle (and the TLS sessions and HTTP/2
+    connections it keeps alive) goes back to the pool when the session is
+    closed or garbage collected.
+    """
+
+    def __init__(self, transport: "Transport", **kwargs) -> None:
+        self._transport: Transport = transport
+        curl: Curl = transport.acquire()
+        kwargs.setdefault("impersonate", transport.impersonate)
+        super().__init__(curl=curl, use_thread_local_curl=False, **kwargs)
+        self._release = finalize(self, transport.release, curl)
+
+    def request(self, method, url, *args, **kwargs):
+        response = super().request(method, url, *args, **kwargs)
+        self._transport.record(self._curl, response, streamed=bool(kwargs.get("stream")))
+        return response
+
+    def close(self) -> None:
+        self._closed = True
+        self._release()
+
+
+class Transport:
+    """
+    Process-wide pool of curl handles shared by every Grok session and the
+    script fetches in Parser. curl keeps live connections and TLS session
+    ids across `curl_easy_reset`, so a handle returned to the pool lets the
+    next session skip connection setup to grok.com. Cookies stay per session:
+    curl_cffi reloads the session's jar into the handle on every request.
+
+    Streaming requests run on a duplicated handle (a curl_cffi detail) and
+    always open a fresh connection; they are counted separately.
+    """
+
+    def __init__(self, impersonate: str = IMPERSONATE, max_idle: int = 32) -> None:
+        self.impersonate: str = impersonate
+        self.max_idle: int = max_idle
+        self.idle: list = []
+        self.lock = Lock()
+        self.handles: int = 0
+        self.requests: int = 0
+        self.reused: int = 0
+        self.streamed: int = 0
+        self._seen: dict = {}   # id(curl) -> set of (remote ip, local port) it has connected with
+
+    def acquire(self) -> Curl:
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+            self.handles += 1
+        return Curl()
+
+    def release(self, curl: Curl) -> None:
+        with self.lock:
+            if len(self.idle) < self.max_idle:
+                self.idle.append(curl)
+                return
+            self.handles -= 1
+            self._seen.pop(id(curl), None)
+        curl.close()
+
+    def record(self, curl: Curl, response, streamed: bool = False) -> None:
+        with self.lock:
+            if streamed:
+                self.streamed += 1
+                return
+            self.requests += 1
+            # A reused connection keeps its local port
+            connection: tuple = (getattr(response, "primary_ip", ""), getattr(response, "local_port", 0))
+            seen: set = self._seen.setdefault(id(curl), set())
+            if connection in seen:
+                self.reused += 1
+            else:
+                seen.add(connection)
+
+    def session(self, **kwargs) -> PooledSession:
+        """Cookie-isolated session on a pooled connection."""
+        return PooledSession(self, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs):
+        """One-off request without cookies of its own (script/chunk fetches)."""
+        with self.session() as session:
+            return session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "impersonate": self.impersonate,
+                "handles": self.handles,
+                "idle_handles": len(self.idle),
+                "requests": self.requests,
+                "reused_connections": self.reused,
+                "reuse_ratio": round(self.reused / self.requests, 3) if self.requests else 0.0,
+                "streamed_requests": self.streamed,
+            }
+
+
+_TRANSPORT: Optional[Transport] = None
+_TRANSPORT_LOCK = Lock()
+
+def get_transport() -> Transport:
+    """The shared process-wide transport, created on first use."""
+    global _TRANSPORT
+    with _TRANSPORT_LOCK:
+        if _TRANSPORT is None:
+            _TRANSPORT = Transport()
+        return _TRANSPORT
@@ -4,27 +4,198 @@ import json
 import logging
 import os
 import sys
-from playwright.async_api import async_playwright
+import time
 import uvicorn
+from collections import OrderedDict
+from importlib import import_module
+from uuid import uuid4
 from fastapi import FastAPI, Request
 from starlette.responses import JSONResponse
+from core.tracing import Tracer
 
 # Setup simple logging
 logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(message)s", datefmt="%H:%M:%S")
 logger = logging.getLogger("GrokDriver")
 
 app = FastAPI()
+TRACER = Tracer("driver")
 BROWSER_CTX = None # Context
-PAGE = None
+TABS = None # TabPool, set once the browser is up
+BROWSER_TASK = None
+
+# One tab per conversation; least recently used idle tabs are closed first
+MAX_TABS = int(os.environ.get("GROK_DRIVER_MAX_TABS", "4"))
+TAB_IDLE_SECONDS = float(os.environ.get("GROK_DRIVER_TAB_IDLE", "600"))
+# Keep a pre-navigated spare tab so new conversations skip the page load
+WARM_PAGE = os.environ.get("GROK_DRIVER_WARM_PAGE", "1") == "1"
+# Launch Chrome while uvicorn starts instead of after it (or pass --preload)
+PRELOAD = os.environ.get("GROK_DRIVER_PRELOAD", "0") == "1" or "--preload" in sys.argv
+LOGIN_PROBE_MS = 15000 # how long the first page may take to show the chat input
 
 # Custom User Data Dir to persist session
 USER_DATA_DIR = os.path.join(os.getcwd(), "playwright_profile")
 if not os.path.exists(USER_DATA_DIR):
     os.makedirs(USER_DATA_DIR)
 
+class Lifecycle:
+    """
+    Driver start-up state (stopped -> launching -> navigating ->
+    awaiting-login -> ready, or failed) with the time each state was
+    entered, in ms since the process started. Reported by /health.
+    """
+
+    def __init__(self) -> None:
+        self.state = "stopped"
+        self.started = time.monotonic()
+        self.transitions: dict = {}
+        self.error = None
+
+    def enter(self, state: str, error: str = None) -> None:
+        logger.info(f"Driver state: {self.state} -> {state}" + (f" ({error})" if error else ""))
+        self.state = state
+        self.error = error
+        self.transitions[state] = round((time.monotonic() - self.started) * 1000, 1)
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "uptime_ms": round((time.monotonic() - self.started) * 1000, 1),
+            "transitions_ms": self.transitions,
+            "error": self.error,
+        }
+
+LIFECYCLE = Lifecycle()
+
+class Tab:
+    """A browser tab holding one Grok conversation."""
+
+    def __init__(self, page) -> None:
+        self.page = page
+        self.lock = asyncio.Lock() # one message at a time per conversation
+        self.url = None            # conversation URL once Grok assigned one
+        self.last_used = time.monotonic()
+
+class TabPool:
+    """
+    LRU of tabs keyed by conversation id. Follow-ups go back to the tab that
+    holds their conversation, new conversations get a fresh tab (up to
+    `max_tabs`), and tabs left idle for `idle_seconds` are closed.
+    """
+
+    def __init__(self, context, max_tabs: int = MAX_TABS, idle_seconds: float = TAB_IDLE_SECONDS, spare=None) -> None:
+        self.context = context
+        self.max_tabs = max_tabs
+        self.idle_seconds = idle_seconds
+        self.tabs: OrderedDict = OrderedDict()
+        self.spare = spare # already on grok.com, used by the next new conversation
+        self._warming = False
+
+    async def acquire(self, conversation_id=None):
+        """(conversation_id, Tab) for a follow-up, or a new tab for a new conversation."""
+        tab = self.tabs.get(conversation_id) if conversation_id else None
+        if tab and not tab.page.is_closed():
+            self.tabs.move_to_end(conversation_id)
+            return conversation_id, tab
+
+        if conversation_id:
+            logger.info(f"Conversation {conversation_id[:8]} has no open tab, starting a new one")
+            self.tabs.pop(conversation_id, None)
+        conversation_id = uuid4().hex
+
+        while len(self.tabs) >= self.max_tabs and await self._close_lru():
+            pass
+
+        page, self.spare = self.spare, None
+        if page is None or page.is_closed():
+            page = await self.context.new_page()
+            with TRACER.span("driver.navigate"):
+                await page.goto("https://grok.com")
+        tab = Tab(page)
+        self.tabs[conversation_id] = tab
+        if WARM_PAGE:
+            asyncio.create_task(self.warm())
+        return conversation_id, tab
+
+    async def warm(self) -> None:
+        """Open and pre-navigate the spare tab if there is none."""
+        if self._warming or (self.spare and not self.spare.is_closed()):
+            return
+        self._warming = True
+        try:
+            page = await self.context.new_page()
+            await page.goto("https://grok.com")
+            self.spare = page
+        except Exception as e:
+            logger.error(f"Warming a spare tab failed: {e}")
+        finally:
+            self._warming = False
+
+    async def _close_lru(self) -> bool:
+        for conversation_id, tab in self.tabs.items():
+            if not tab.lock.locked():
+                await self.close(conversation_id)
+                return True
+        logger.info(f"All {len(self.tabs)} tabs busy, opening one over the limit")
+        return False
+
+    async def close(self, conversation_id) -> None:
+        tab = self.tabs.pop(conversation_id, None)
+        if tab and not tab.page.is_closed():
+            await tab.page.close()
+
+    async def reap(self, interval: float = 30) -> None:
+        """Background loop closing tabs idle for longer than `idle_seconds`."""
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for conversation_id, tab in list(self.tabs.items()):
+                if not tab.lock.locked() and now - tab.last_used > self.idle_seconds:
+                    logger.info(f"Closing idle tab for conversation {conversation_id[:8]}")
+                    try:
+                        await self.close(conversation_id)
+                    except Exception as e:
+                        logger.error(f"Closing idle tab failed: {e}")
+
+def start_browser() -> None:
+    """Launch the browser in the background unless already starting."""
+    global BROWSER_TASK
+    if LIFECYCLE.state == "stopped":
+        LIFECYCLE.enter("launching")
+        BROWSER_TASK = asyncio.create_task(init_browser())
+
 async def init_browser():
-    global BROWSER_CTX, PAGE
-    p = await async_playwright().start()
+    try:
+        await launch_browser()
+    except Exception as e:
+        LIFECYCLE.enter("failed", str(e))
+
+async def wait_for_login(page) -> None:
+    """Ready once the chat input shows; until then a manual login is needed."""
+    try:
+        await page.wait_for_selector("textarea", timeout=LOGIN_PROBE_MS)
+    except Exception:
+        LIFECYCLE.enter("awaiting-login")
+        logger.info("Waiting for manual login...")
+        while True:
+            try:
+                await page.wait_for_selector("textarea", timeout=5000)
+                break
+            except Exception:
+                if page.is_closed():
+                    raise RuntimeError("Login page was closed")
+    LIFECYCLE.enter("ready")
+
+async def launch_browser():
+    global BROWSER_CTX, TABS
+    # Imported off the event loop so the server binds (and /health answers)
+    # while Playwright loads
+    playwright_api = await asyncio.to_thread(import_module, "playwright.async_api")
+    p = await playwright_api.async_playwright().start()
     
     logger.info(f"Using Profile: {USER_DATA_DIR}")
     
@@ -64,24 +235,34 @@ async def init_browser():
         except Exception as e:
             logger.error(f"Cookie injection failed: {e}")
 
+    LIFECYCLE.enter("navigating")
     page = context.pages[0] if context.pages else await context.new_page()
     await page.goto("https://grok.com")
     
     logger.info("Browser Launched. Waiting for manual login if needed...")
     
     BROWSER_CTX = context
-    PAGE = page
+    TABS = TabPool(context, spare=page)
+    asyncio.create_task(TABS.reap())
+    await wait_for_login(page)
 
 @app.on_event("startup")
 async def startup_event():
-    # Don't block startup, launch in background task? No, fastAPI supports async startup
-    asyncio.create_task(init_browser())
+    # Launch in the background so the server listens right away (no-op if
+    # --preload already started it)
+    start_browser()
+
+@app.get("/health")
+async def health():
+    status = LIFECYCLE.snapshot()
+    status["tabs"] = len(TABS.tabs) if TABS else 0
+    status["warm_page"] = bool(TABS and TABS.spare and not TABS.spare.is_closed())
+    return JSONResponse(status, status_code=200 if LIFECYCLE.ready else 503)
 
 @app.post("/ask")
 async def ask_grok(request: Request):
-    global PAGE
-    if not PAGE:
-        return JSONResponse({"error": "Browser not ready"}, status_code=503)
+    if not LIFECYCLE.ready:
+        return JSONResponse({"error": "Browser not ready", "state": LIFECYCLE.state}, status_code=503)
 
     body = await request.json()
     msg = body.get("message", "")
@@ -89,16 +270,35 @@ async def ask_grok(request: Request):
     if not msg:
         return JSONResponse({"error": "No message provided"}, status_code=400)
     
+    # Joins the bridge's trace when it forwarded a traceparent
+    with TRACER.span("driver.ask", traceparent=request.headers.get("traceparent"), chars=len(msg)) as span:
+        conversation_id, tab = await TABS.acquire(body.get("conversation_id"))
+        span.set(conversation_id=conversation_id, follow_up=conversation_id == body.get("conversation_id"))
+        async with tab.lock:
+            result = await send_and_scrape(tab, msg)
+            tab.last_used = time.monotonic()
+    
+    if isinstance(result, dict):
+        result["conversation_id"] = conversation_id
+    return result
+
+async def send_and_scrape(tab: Tab, msg: str):
+    page = tab.page
     try:
-        # Ensure we are on grok
-        if "grok.com" not in PAGE.url:
-             await PAGE.goto("https://grok.com")
+        # Ensure the tab still shows its conversation
+        if tab.url and page.url != tab.url:
+             with TRACER.span("driver.navigate"):
+                 await page.goto(tab.url)
+        elif "grok.com" not in page.url:
+             with TRACER.span("driver.navigate"):
+                 await page.goto("https://grok.com")
         
         # Identify textarea
         # Use reliable selector
         selector = "textarea" 
         try:
-            await PAGE.wait_for_selector(selector, timeout=5000)
+            with TRACER.span("driver.wait_input"):
+                await page.wait_for_selector(selector, timeout=5000)
         except:
              return JSONResponse({"error": "Input box not found. Please log in manually in the popup window."}, status_code=401)
              
@@ -108,63 +308,71 @@ async def ask_grok(request: Request):
         # Or wait for a new message bubble to appear.
         
         # 1. Get initial message count
-        # initial_count = await PAGE.evaluate("document.querySelectorAll('.message-bubble').length")
+        # initial_count = await page.evaluate("document.querySelectorAll('.message-bubble').length")
         
-        await PAGE.fill(selector, msg)
-        await PAGE.keyboard.press("Enter")
+        with TRACER.span("driver.send"):
+            await page.fill(selector, msg)
+            await page.keyboard.press("Enter")
         
         # 2. Dynamic Wait: Poll for content stability
         # We check the last bubble every 0.5s. If length is same for 3 checks, we assume done.
         last_len = 0
         stable_count = 0
         max_waits = 40 # 20 seconds max (40 * 0.5s)
+        with TRACER.span("driver.wait_response") as wait_span:
         
-        for _ in range(max_waits):
-            await asyncio.sleep(0.5)
+            for polls in range(1, max_waits + 1):
+                await asyncio.sleep(0.5)
             
-            try:
-                current_text = await PAGE.evaluate("""
-                    () => {
-                        const bubbles = Array.from(document.querySelectorAll('.prose, div[class*="message"], div[class*="bubble"]'));
-                        return bubbles.length > 0 ? bubbles[bubbles.length - 1].innerText : "";
-                    }
-                """)
-                curr_len = len(str(current_text))
+                try:
+                    current_text = await page.evaluate("""
+                        () => {
+                            const bubbles = Array.from(document.querySelectorAll('.prose, div[class*="message"], div[class*="bubble"]'));
+                            return bubbles.length > 0 ? bubbles[bubbles.length - 1].innerText : "";
+                        }
+                    """)
+                    curr_len = len(str(current_text))
                 
-                if curr_len > 0 and curr_len == last_len:
-                    stable_count += 1
-                else:
-                    stable_count = 0
+                    if curr_len > 0 and curr_len == last_len:
+                        stable_count += 1
+                    else:
+                        stable_count = 0
                 
-                last_len = curr_len
+                    last_len = curr_len
                 
-                # If stable for 1.5 seconds (3 polls), it's likely finished
-                if stable_count >= 3 and curr_len > 10:
-                    break
-            except:
-                pass
+                    # If stable for 1.5 seconds (3 polls), it's likely finished
+                    if stable_count >= 3 and curr_len > 10:
+                        break
+                except:
+                    pass
+            wait_span.set(polls=polls, chars=last_len)
 
         response_text = "Init Default"
-        try:
-            # Final Scrape
-            js_code = """
-            () => {
-                const bubbles = Array.from(document.querySelectorAll('.prose, div[class*="message"], div[class*="bubble"]'));
-                if (bubbles.length > 0) {
-                    let text = bubbles[bubbles.length - 1].innerText;
-                    // Clean up any common artifacts
-                    return text.trim();
-                }
-                const ps = Array.from(document.querySelectorAll('p'));
-                if (ps.length > 0) {
-                     return ps[ps.length - 1].innerText.trim();
+        with TRACER.span("driver.scrape"):
+            try:
+                # Final Scrape
+                js_code = """
+                () => {
+                    const bubbles = Array.from(document.querySelectorAll('.prose, div[class*="message"], div[class*="bubble"]'));
+                    if (bubbles.length > 0) {
+                        let text = bubbles[bubbles.length - 1].innerText;
+                        // Clean up any common artifacts
+                        return text.trim();
+                    }
+                    const ps = Array.from(document.querySelectorAll('p'));
+                    if (ps.length > 0) {
+                         return ps[ps.length - 1].innerText.trim();
+                    }
+                    return document.body.innerText.slice(-2000).trim();
                 }
-                return document.body.innerText.slice(-2000).trim();
-            }
-            """
-            response_text = await PAGE.evaluate(js_code)
-        except Exception as e:
-            response_text = f"Scrape Error in Driver: {e}"
+                """
+                response_text = await page.evaluate(js_code)
+            except Exception as e:
+                response_text = f"Scrape Error in Driver: {e}"
+        
+        # Grok moves a new chat to /c/<id>; follow-ups return there
+        if "/c/" in page.url:
+            tab.url = page.url
         
         print(f"[Driver] Scraped response length: {len(str(response_text))}")
         print(f"[Driver] First 100 chars: {str(response_text)[:100]}")
@@ -175,5 +383,17 @@ async def ask_grok(request: Request):
         logger.error(f"Error executing browser action: {e}")
         return JSONResponse({"error": str(e)}, status_code=500)
 
+async def serve_preloaded() -> None:
+    """Run uvicorn with the browser launch already under way."""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=8001))
+    start_browser()
+    await server.serve()
+
 if __name__ == "__main__":
-    uvicorn.run("grok_driver:app", host="127.0.0.1", port=8001, reload=False)
+    if "--profile-startup" in sys.argv:
+        from core.startup import profile_startup
+        profile_startup("grok_driver", "grok_driver:app")
+    elif PRELOAD:
+        asyncio.run(serve_preloaded())
+    else:
+        uvicorn.run("grok_driver:app", host="127.0.0.1", port=8001, reload=False)
@@ -0,0 +1,5 @@
+import sys
+from os import path
+
+# Tests import `core` the way api_server.py does, from Grok-Api-main/
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
@@ -0,0 +1,64 @@
+"""Flight and PageScanner extraction on saved grok.com responses (tests/payloads/)."""
+from os import path
+
+import pytest
+
+from core.reverse.flight import Flight
+from core.reverse.page import PageScanner
+
+PAYLOADS: str = path.join(path.dirname(path.abspath(__file__)), "payloads")
+
+
+def payload(name: str) -> bytes:
+    with open(path.join(PAYLOADS, name), "rb") as f:
+        return f.read()
+
+
+def chunked(content: bytes, size: int) -> Flight:
+    flight = Flight()
+    for i in range(0, len(content), size):
+        flight.feed(content[i:i + size])
+    flight.close()
+    return flight
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 1 << 20])
+def test_anon_user_id(size):
+    flight = chunked(payload("c_request_keys.flight"), size)
+    assert flight.anon_user_id() == "6a0f1c2e-93b7-4d55-8e21-4b7f0c9d1a38"
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 1 << 20])
+def test_challenge(size):
+    content = payload("c_request_challenge.flight")
+    # What the old hex scan between ":o86," and "1:" extracted
+    hex_content = content.hex()
+    start = hex_content.find("3a6f38362c") + len("3a6f38362c")
+    legacy = bytes.fromhex(hex_content[start:hex_content.find("313a", start)])
+
+    flight = chunked(content, size)
+    assert flight.challenge() == legacy == bytes(range(134))
+    assert flight.find_key("challenge") == "$o2"
+
+
+def test_missing_values_are_none():
+    flight = Flight.parse(payload("c_request_challenge.flight"))
+    assert flight.anon_user_id() is None
+    assert Flight.parse(payload("c_request_keys.flight")).challenge() is None
+
+
+@pytest.mark.parametrize("size", [1, 13, 1 << 20])
+def test_page_scanner(size):
+    content = payload("app_page.html")
+    page = PageScanner()
+    for i in range(0, len(content), size):
+        page.feed(content[i:i + size])
+    page.close()
+    assert page.scripts == [
+        "/_next/static/chunks/webpack-3e0b1c.js",
+        "/_next/static/chunks/4bd1b696-5a7e.js",
+        "/_next/static/chunks/1684-e2c4.js",
+        "/_next/static/chunks/app/page-77aa.js",
+    ]
+    assert page.meta["baggage"].startswith("sentry-environment=production,")
+    assert page.meta["sentry-trace"].split("-")[0] == "9c1d2e3f4a5b6c7d8e9f0a1b2c3d4e5f"
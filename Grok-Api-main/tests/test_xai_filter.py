@@ -0,0 +1,52 @@
+"""XaiMetadataFilter must match whole-text `_clean_xai_metadata` for any chunking of the stream."""
+import random
+
+import pytest
+
+from core.grok import XaiMetadataFilter, _clean_xai_metadata
+
+PROSE: list = [
+    "The", " quick", " brown", " fox", " jumps", " over", " the", " lazy",
+    " dog", ".", " Next", ",", " an", " example", ":", "\n", "  ", " result",
+]
+MARKERS: list = [
+    " xai:tool_usage_card_id3f2a-91bc", " xai:tool_name", "web_search",
+    " xai:tool_args", " XAI:TOOL_NAME", "xai:tool_usage_card",
+]
+
+
+def make_text(rng: random.Random, tokens: int, marker_rate: float) -> str:
+    return "".join(rng.choice(MARKERS if rng.random() < marker_rate else PROSE) for _ in range(tokens))
+
+
+def split(text: str, rng: random.Random, max_size: int) -> list:
+    """`text` cut at random points into token-sized pieces."""
+    chunks, i = [], 0
+    while i < len(text):
+        size = rng.randint(1, max_size)
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
+
+
+def filtered(chunks: list) -> str:
+    xai_filter = XaiMetadataFilter()
+    return "".join(xai_filter.feed(c) for c in chunks) + xai_filter.flush()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_any_chunking_matches_whole_text(seed):
+    rng = random.Random(seed)
+    for _ in range(100):
+        text = make_text(rng, rng.randint(0, 200), marker_rate=0.3)
+        chunks = split(text, rng, rng.randint(1, 40))
+        assert filtered(chunks) == _clean_xai_metadata(text), chunks
+
+
+def test_marker_split_across_tokens_is_removed():
+    assert filtered(["Hello x", "ai:tool_", "name", " world"]) == "Hello world"
+    assert filtered(["a xai:tool_usage_card", "_id", "3f2a b"]) == "a b"
+
+
+def test_whitespace_tokens_survive():
+    assert filtered(["One.", "\n", "\n", "Two"]) == "One.\n\nTwo"
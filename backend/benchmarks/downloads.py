@@ -0,0 +1,148 @@
+"""
+Model downloads against a local stand-in file server.
+
+Serves a random file from a temp directory over HTTP with Range support
+(optionally throttled per connection, like a CDN), then drives
+llm.downloads.DownloadManager through three runs: one segment, parallel
+segments, and a download cut off midway and resubmitted, which must resume
+from the partial file. Every run is checked against the file's SHA-256.
+
+    python benchmarks/downloads.py [--size-mb 256] [--segments 4] [--rate-mb 50]
+
+`--serve DIR` only runs the stand-in server (on --port), for pointing
+POST /v1/models/download {"url": ..., "filename": ...} at it by hand.
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+from llm.downloads import DownloadManager
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """Static files with single-range `Range` support, a per-connection rate and an optional cut-off."""
+
+    rate = 0          # bytes/s per connection, 0 = unthrottled
+    cut_after = None  # close connections after this many body bytes, once
+
+    def log_message(self, *args):
+        pass
+
+    def send_head(self):
+        file_path = self.translate_path(self.path)
+        if not os.path.isfile(file_path):
+            return super().send_head()
+        size = os.path.getsize(file_path)
+        start, end = 0, size - 1
+        spec = self.headers.get("Range", "")
+        if spec.startswith("bytes="):
+            first, _, last = spec[len("bytes="):].partition("-")
+            start, end = int(first), int(last) if last else size - 1
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        f = open(file_path, "rb")
+        f.seek(start)
+        self.remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        sent = 0
+        began = time.perf_counter()
+        while self.remaining > 0:
+            chunk = source.read(min(256 * 1024, self.remaining))
+            if not chunk:
+                break
+            cls = type(self)
+            if cls.cut_after is not None and sent + len(chunk) > cls.cut_after:
+                cls.cut_after = None
+                self.close_connection = True
+                return
+            try:
+                outputfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                return  # client cancelled
+            sent += len(chunk)
+            self.remaining -= len(chunk)
+            if self.rate:
+                ahead = sent / self.rate - (time.perf_counter() - began)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+
+def serve(directory: str, port: int = 0) -> ThreadingHTTPServer:
+    handler = lambda *args, **kwargs: RangeHandler(*args, directory=directory, **kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def download(manager: DownloadManager, url: str, sha256: str) -> dict:
+    job = manager.submit(url, "model.gguf", sha256=sha256)
+    job.done.wait()
+    return job.snapshot()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--segments", type=int, default=4)
+    parser.add_argument("--rate-mb", type=float, default=50, help="per-connection throttle, 0 = none")
+    parser.add_argument("--serve", metavar="DIR", help="only run the stand-in file server for DIR")
+    parser.add_argument("--port", type=int, default=8010)
+    args = parser.parse_args()
+
+    RangeHandler.rate = int(args.rate_mb * 1024 * 1024)
+    if args.serve:
+        server = serve(args.serve, args.port)
+        print(f"Serving {args.serve} on http://127.0.0.1:{server.server_port}/ (Ctrl+C to stop)")
+        threading.Event().wait()
+
+    work = tempfile.mkdtemp(prefix="llm-downloads-")
+    try:
+        source, models = path.join(work, "source"), path.join(work, "local_models")
+        os.makedirs(source)
+        os.makedirs(models)
+        digest = hashlib.sha256()
+        with open(path.join(source, "model.gguf"), "wb") as f:
+            for _ in range(args.size_mb):
+                block = os.urandom(1024 * 1024)
+                digest.update(block)
+                f.write(block)
+        sha256 = digest.hexdigest()
+        server = serve(source)
+        url = f"http://127.0.0.1:{server.server_port}/model.gguf"
+
+        print(f"\n{'run':<28} {'status':>10} {'seconds':>8} {'MB/s':>8} {'resumed MB':>11}")
+
+        def row(label, result, seconds):
+            print(f"{label:<28} {result['status']:>10} {seconds:>8.2f} {args.size_mb / seconds:>8.1f} {result['resumed_bytes'] / 2 ** 20:>11.1f}")
+            assert result["status"] == "completed" and result["verified"], result
+            os.remove(path.join(models, "model.gguf"))
+
+        for label, segments in (("1 segment", 1), (f"{args.segments} segments", args.segments)):
+            start = time.perf_counter()
+            row(label, download(DownloadManager(models, segments), url, sha256), time.perf_counter() - start)
+
+        # Drop the connection halfway through, then submit again to resume
+        RangeHandler.cut_after = args.size_mb * 1024 * 1024 // 2
+        manager = DownloadManager(models, 1)
+        start = time.perf_counter()
+        first = download(manager, url, sha256)
+        print(f"{'cut off at 50%':<28} {first['status']:>10}  ({first['error']})")
+        row("resubmitted", download(manager, url, sha256), time.perf_counter() - start)
+        print()
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
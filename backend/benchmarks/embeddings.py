@@ -0,0 +1,58 @@
+"""
+/v1/embeddings throughput: a synthetic corpus embedded cold, with inputs
+sent in batches, then embedded again to show the content-hash cache.
+
+Prints texts/s for each batch size on a cold cache and for the warm re-run,
+plus the cache's hit ratio. Every batch size run uses different texts, so
+only the final re-run hits the cache.
+
+Usage: python benchmarks/embeddings.py --model local_models/embed.gguf [--docs 512] [--batches 1 16 64] [--url http://127.0.0.1:8003]
+"""
+import argparse
+import json
+import time
+from os import path
+
+from responsiveness import request, start_server
+
+WORDS = "retrieval vector index query document passage ranking context local model cache batch token".split()
+
+
+def corpus(n: int, seed: str) -> list:
+    return [f"{seed} doc {i}: " + " ".join(WORDS[(i * 7 + j) % len(WORDS)] for j in range(20 + i % 40)) for i in range(n)]
+
+
+def embed_all(url: str, texts: list, batch: int) -> tuple:
+    cached = 0
+    start = time.perf_counter()
+    for offset in range(0, len(texts), batch):
+        response = json.loads(request(f"{url}/v1/embeddings", {"input": texts[offset:offset + batch]}))
+        cached += response["usage"]["cached_inputs"]
+    return len(texts) / (time.perf_counter() - start), cached
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True, help="embedding GGUF to load")
+    parser.add_argument("--docs", type=int, default=512)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--url", help="use a running server instead of starting one")
+    args = parser.parse_args()
+
+    url, process = (args.url, None) if args.url else start_server()
+    try:
+        request(f"{url}/v1/models/load", {"path": path.abspath(args.model), "n_ctx": 2048, "embedding": True, "wait": True})
+
+        print(f"\n{'run':<12} {'batch':>6} {'texts/s':>9} {'cached':>7}")
+        for batch in args.batches:
+            rate, cached = embed_all(url, corpus(args.docs, f"b{batch}"), batch)
+            print(f"{'cold':<12} {batch:>6} {rate:>9.1f} {cached:>7}")
+        batch = max(args.batches)
+        rate, cached = embed_all(url, corpus(args.docs, f"b{batch}"), batch)
+        print(f"{'warm re-run':<12} {batch:>6} {rate:>9.1f} {cached:>7}")
+
+        print(f"\nCache: {json.loads(request(f'{url}/v1/embeddings/cache'))}\n")
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
@@ -0,0 +1,260 @@
+"""
+Load test of local_llm_server: chat completions at several concurrency
+levels, streaming and non-streaming, with /health probed throughout.
+
+By default the server runs with LOCAL_LLM_FAKE_BACKEND=1, a deterministic
+stand-in for llama.cpp with fixed per-token costs, so the numbers measure
+the server (scheduling, streaming, HTTP) and are comparable across commits
+on any CPU-only machine. Pass --model to drive a real (tiny) GGUF instead.
+
+Reports per run: time to first token, inter-token latency, request latency
+(p50/p90/p99), completion tokens/s, requests/s and /health latency. --json
+writes the results; --compare checks them against an earlier file and
+exits 1 when a metric regressed by more than --threshold.
+
+Usage: python benchmarks/load_test.py [--model local_models/tiny.gguf] [--concurrency 1 4 8] [--requests 32]
+           [--modes stream nonstream] [--workers N] [--json out.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+from os import path
+
+from responsiveness import BACKEND_DIR, request, start_server
+
+PROMPT = "Summarize the following notes for a status update. " + "The build is green and the release is on track. " * 8
+
+# Lower is better for every compared metric except throughput
+COMPARED = {
+    "ttft_ms.p50": False, "ttft_ms.p99": False, "itl_ms.p50": False, "latency_ms.p99": False,
+    "tokens_per_second": True, "health_ms.p99": False,
+}
+
+
+def summary(values: list) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 3)
+
+    return {"p50": pct(0.5), "p90": pct(0.9), "p99": pct(0.99), "mean": round(statistics.fmean(ordered), 3), "max": round(ordered[-1], 3)}
+
+
+def chat(url: str, stream: bool, max_tokens: int, index: int) -> dict:
+    """One request; returns its latency, TTFT, inter-token gaps (ms) and completion tokens."""
+    body = {
+        "messages": [{"role": "user", "content": f"[{index}] {PROMPT}"}],
+        "max_tokens": max_tokens, "temperature": 0, "stream": stream,
+    }
+    start = time.perf_counter()
+    if not stream:
+        response = json.loads(request(f"{url}/v1/chat/completions", body))
+        latency = (time.perf_counter() - start) * 1000
+        # No token arrives before the whole reply; llama.cpp's prompt-eval counter says when the first one was ready
+        timings = response.get("timings", {})
+        ttft = (timings.get("queue_wait_ms") or 0) + timings["prompt_eval_ms"] if timings.get("prompt_eval_ms") is not None else None
+        return {"latency": latency, "ttft": ttft, "gaps": [], "tokens": response["usage"]["completion_tokens"]}
+
+    req = urllib.request.Request(f"{url}/v1/chat/completions", data=json.dumps(body).encode(), headers={"Content-Type": "application/json"})
+    arrivals = []
+    with urllib.request.urlopen(req, timeout=600) as response:
+        for line in response:
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue
+            chunk = json.loads(line[5:])
+            if chunk["choices"][0]["delta"].get("content"):
+                arrivals.append(time.perf_counter())
+    latency = (time.perf_counter() - start) * 1000
+    gaps = [(b - a) * 1000 for a, b in zip(arrivals, arrivals[1:])]
+    return {"latency": latency, "ttft": (arrivals[0] - start) * 1000 if arrivals else None, "gaps": gaps, "tokens": len(arrivals)}
+
+
+def run(url: str, stream: bool, concurrency: int, requests: int, max_tokens: int) -> dict:
+    counter = iter(range(requests))
+    lock = threading.Lock()
+    results, errors = [], []
+
+    def user():
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            try:
+                results.append(chat(url, stream, max_tokens, index))
+            except Exception as e:
+                errors.append(str(e))
+
+    stop = threading.Event()
+    health = []
+
+    def probe():
+        while not stop.is_set():
+            start = time.perf_counter()
+            request(f"{url}/health", timeout=30)
+            health.append((time.perf_counter() - start) * 1000)
+            stop.wait(0.05)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    start = time.perf_counter()
+    users = [threading.Thread(target=user) for _ in range(concurrency)]
+    for thread in users:
+        thread.start()
+    for thread in users:
+        thread.join()
+    wall = time.perf_counter() - start
+    stop.set()
+    prober.join()
+
+    tokens = sum(r["tokens"] for r in results)
+    return {
+        "mode": "stream" if stream else "nonstream",
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "wall_s": round(wall, 3),
+        "ttft_ms": summary([r["ttft"] for r in results if r["ttft"] is not None]),
+        "itl_ms": summary([gap for r in results for gap in r["gaps"]]),
+        "latency_ms": summary([r["latency"] for r in results]),
+        "tokens_per_second": round(tokens / wall, 2) if wall else 0.0,
+        "requests_per_second": round(len(results) / wall, 3) if wall else 0.0,
+        "health_ms": summary(health),
+    }
+
+
+def ms(stats: dict, key: str, digits: int = 1) -> str:
+    return f"{stats[key]:.{digits}f}ms" if key in stats else "-"
+
+
+def metric(result: dict, name: str):
+    value = result
+    for part in name.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare(results: list, baseline: dict, threshold: float, min_delta_ms: float) -> list:
+    """
+    Metrics that got worse than the baseline by more than `threshold` (a
+    fraction) and, for latencies, by more than `min_delta_ms`: a few-ms
+    probe moving by 1 ms is noise, not a regression.
+    """
+    previous = {(r["mode"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'run':<16} {'metric':<18} {'baseline':>10} {'now':>10} {'change':>8}")
+    for result in results:
+        before = previous.get((result["mode"], result["concurrency"]))
+        if not before:
+            continue
+        for name, higher_is_better in COMPARED.items():
+            old, new = metric(before, name), metric(result, name)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            noise = not higher_is_better and abs(new - old) < min_delta_ms
+            flag = "  <-- regression" if worse > threshold and not noise else ""
+            label = f"{result['mode']} x{result['concurrency']}"
+            print(f"{label:<16} {name:<18} {old:>10.2f} {new:>10.2f} {change:>+7.1%}{flag}")
+            if flag:
+                regressions.append(f"{label} {name}: {old} -> {new}")
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", help="real GGUF to drive; default is the deterministic fake backend")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=32, help="requests per run")
+    parser.add_argument("--max-tokens", type=int, default=32)
+    parser.add_argument("--modes", nargs="+", choices=["stream", "nonstream"], default=["stream", "nonstream"])
+    parser.add_argument("--workers", type=int, default=0, help="LOCAL_LLM_WORKERS for the server")
+    parser.add_argument("--token-ms", type=float, default=10.0, help="fake backend: time per generated token")
+    parser.add_argument("--prompt-us", type=float, default=100.0, help="fake backend: time per prompt token")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="earlier --json output to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown before a metric counts as regressed")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="smaller latency changes never count as regressions")
+    parser.add_argument("--url", help="use a running server instead of starting one")
+    args = parser.parse_args()
+
+    env = {"LOCAL_LLM_WORKERS": str(args.workers), "LOCAL_LLM_QUEUE_DEPTH": str(max(16, max(args.concurrency) * 2))}
+    scratch = None
+    if args.model:
+        model_path = path.abspath(args.model)
+    else:
+        scratch = tempfile.TemporaryDirectory()
+        model_path = path.join(scratch.name, "fake.gguf")
+        with open(model_path, "wb") as f:
+            f.write(b"\0" * 4096)
+        env.update(LOCAL_LLM_FAKE_BACKEND="1", LOCAL_LLM_FAKE_TOKEN_MS=str(args.token_ms), LOCAL_LLM_FAKE_PROMPT_US=str(args.prompt_us))
+
+    regressions = []
+    url, process = (args.url, None) if args.url else start_server(env)
+    try:
+        request(f"{url}/v1/models/load", {"path": model_path, "n_ctx": 2048, "wait": True})
+        chat(url, False, 2, -1)  # warm-up
+
+        results = []
+        print(f"\n{'mode':<10} {'conc':>4} {'ttft p50':>9} {'ttft p99':>9} {'itl p50':>8} {'lat p99':>9} {'tok/s':>8} {'req/s':>7} {'health p99':>11} {'err':>4}")
+        for mode in args.modes:
+            for concurrency in args.concurrency:
+                r = run(url, mode == "stream", concurrency, args.requests, args.max_tokens)
+                results.append(r)
+                print(f"{r['mode']:<10} {concurrency:>4} {ms(r['ttft_ms'], 'p50'):>9} {ms(r['ttft_ms'], 'p99'):>9} "
+                      f"{ms(r['itl_ms'], 'p50'):>8} {ms(r['latency_ms'], 'p99'):>9} {r['tokens_per_second']:>8.1f} "
+                      f"{r['requests_per_second']:>7.2f} {ms(r['health_ms'], 'p99', 2):>11} {r['errors']:>4}")
+
+        output = {
+            "meta": {
+                "commit": git_commit(),
+                "backend": "gguf" if args.model else "fake",
+                "model": path.basename(model_path) if args.model else None,
+                "token_ms": None if args.model else args.token_ms,
+                "prompt_us": None if args.model else args.prompt_us,
+                "max_tokens": args.max_tokens,
+                "requests": args.requests,
+                "workers": args.workers,
+                "cpu_count": os.cpu_count(),
+                "platform": platform.platform(),
+                "python": platform.python_version(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "results": results,
+        }
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(output, f, indent=2)
+            print(f"\nResults written to {args.json}")
+
+        if args.compare:
+            with open(args.compare) as f:
+                regressions = compare(results, json.load(f), args.threshold, args.min_delta_ms)
+        print()
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+        if scratch:
+            scratch.cleanup()
+    if regressions:
+        raise SystemExit(f"{len(regressions)} regression(s) against {args.compare}")
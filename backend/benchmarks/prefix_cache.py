@@ -0,0 +1,49 @@
+"""
+Time to first token across a long multi-turn chat, with the prefix KV
+cache on or off.
+
+Two conversations are interleaved turn by turn, so llama.cpp's own context
+never already holds the next prompt and every turn depends on the cache.
+Prints prompt-eval time per turn (from the response `timings`) and the
+cache's hit ratio / prompt tokens saved. Run once with the default
+settings and once with LOCAL_LLM_KV_CACHE_MB=0 to compare.
+
+Usage: python benchmarks/prefix_cache.py --model local_models/x.gguf [--turns N] [--url http://127.0.0.1:8003]
+"""
+import argparse
+import json
+from os import path
+
+from responsiveness import request, start_server
+
+FILLER = "Here is some more background on the project we discussed, with enough detail to make the history grow. " * 6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True, help="GGUF file to load")
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--max-tokens", type=int, default=32)
+    parser.add_argument("--url", help="use a running server instead of starting one")
+    args = parser.parse_args()
+
+    url, process = (args.url, None) if args.url else start_server()
+    try:
+        request(f"{url}/v1/models/load", {"path": path.abspath(args.model), "n_ctx": 8192, "wait": True})
+        histories = {"a": [], "b": []}
+
+        print(f"\n{'turn':>4} {'prompt tokens':>14} {'prompt eval':>12} {'total':>10}")
+        for turn in range(1, args.turns + 1):
+            for name, history in histories.items():
+                history.append({"role": "user", "content": f"[{name}] turn {turn}. {FILLER}"})
+                response = json.loads(request(f"{url}/v1/chat/completions", {"messages": history, "max_tokens": args.max_tokens, "temperature": 0}))
+                history.append(response["choices"][0]["message"])
+                if name == "a":
+                    timings = response.get("timings", {})
+                    print(f"{turn:>4} {response['usage']['prompt_tokens']:>14} {timings.get('prompt_eval_ms') or 0:>10.1f}ms {timings.get('total_ms') or 0:>8.1f}ms")
+
+        print(f"\nKV cache: {json.loads(request(f'{url}/v1/kv_cache'))}\n")
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
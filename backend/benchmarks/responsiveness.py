@@ -0,0 +1,118 @@
+"""
+Control-endpoint responsiveness of local_llm_server while a long
+generation runs.
+
+Starts the server on a free port (or uses --url), loads the given GGUF,
+probes GET /health while idle, then again while a non-streaming and a
+streaming chat completion are generating. With generation on the
+inference thread, /health latency should stay in the low milliseconds
+throughout.
+
+Usage: python benchmarks/responsiveness.py --model local_models/x.gguf [--max-tokens N] [--url http://127.0.0.1:8003]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from os import path
+
+BACKEND_DIR = path.dirname(path.dirname(path.abspath(__file__)))
+
+
+def request(url: str, body: dict = None, timeout: float = 600) -> bytes:
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"} if data else {})
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return response.read()
+
+
+def start_server(env: dict = None) -> tuple:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "local_llm_server:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **(env or {})},
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            request(f"{url}/health", timeout=1)
+            return url, process
+        except Exception:
+            time.sleep(0.1)
+    process.terminate()
+    raise TimeoutError("local_llm_server did not start")
+
+
+def probe(url: str, until: threading.Event, interval: float = 0.05) -> list:
+    latencies = []
+    while not until.is_set():
+        start = time.perf_counter()
+        request(f"{url}/health", timeout=30)
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(interval)
+    return latencies
+
+
+def report(label: str, latencies: list):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"  {label:<28} n={len(ordered):>4}  p50 {statistics.median(ordered):>8.2f} ms  p99 {p99:>8.2f} ms  max {ordered[-1]:>8.2f} ms")
+
+
+def during(url: str, body: dict) -> tuple:
+    done = threading.Event()
+    elapsed = []
+
+    def generate():
+        start = time.perf_counter()
+        try:
+            request(f"{url}/v1/chat/completions", body)
+        finally:
+            elapsed.append(time.perf_counter() - start)
+            done.set()
+
+    worker = threading.Thread(target=generate)
+    worker.start()
+    latencies = probe(url, done)
+    worker.join()
+    return latencies, elapsed[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True, help="GGUF file to load")
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--url", help="use a running server instead of starting one")
+    args = parser.parse_args()
+
+    url, process = (args.url, None) if args.url else start_server()
+    try:
+        request(f"{url}/v1/models/load", {"path": path.abspath(args.model), "wait": True})
+        prompt = {"messages": [{"role": "user", "content": "Write a long story about a lighthouse keeper."}], "max_tokens": args.max_tokens}
+
+        idle_done = threading.Event()
+        threading.Timer(2.0, idle_done.set).start()
+        idle = probe(url, idle_done)
+
+        blocking, blocking_s = during(url, prompt)
+        streaming, streaming_s = during(url, dict(prompt, stream=True))
+
+        print(f"\n/health latency ({args.max_tokens} max tokens)")
+        report("idle", idle)
+        report(f"during generation ({blocking_s:.1f}s)", blocking)
+        report(f"during streaming ({streaming_s:.1f}s)", streaming)
+        print()
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
@@ -0,0 +1,78 @@
+"""
+Generation speed with speculative decoding off, with prompt lookup and
+(optionally) with a small draft model.
+
+Each mode reloads the model with its `speculative` setting and runs the
+same edit / summarize style prompts at temperature 0, so all modes produce
+the same text and only the speed differs. Prints tokens/s (from the
+response `usage`), the draft acceptance rate and the speedup over plain
+decoding.
+
+Usage: python benchmarks/speculative.py --model local_models/x.gguf [--draft local_models/small.gguf] [--url http://127.0.0.1:8003]
+"""
+import argparse
+import json
+from os import path
+
+from responsiveness import request, start_server
+
+SOURCE = (
+    "The scheduler runs model work on dedicated threads so the event loop only awaits it. "
+    "Interactive requests go ahead of background ones, and background work that has waited "
+    "too long is promoted so it cannot starve. Control operations such as loading a model "
+    "wait for running generations to finish and hold new ones back until they are done. "
+)
+PROMPTS = [
+    f"Fix the grammar of this text and return it unchanged otherwise:\n\n{SOURCE}",
+    f"Rewrite this text in British English, keeping every sentence:\n\n{SOURCE}",
+    f"Summarize this text in two sentences, reusing its wording:\n\n{SOURCE}",
+    f"Turn this text into a bullet list, one bullet per sentence:\n\n{SOURCE}",
+]
+
+
+def run(url: str, max_tokens: int) -> dict:
+    tokens = seconds = proposed = accepted = 0
+    for prompt in PROMPTS:
+        response = json.loads(request(f"{url}/v1/chat/completions", {
+            "messages": [{"role": "user", "content": prompt}], "max_tokens": max_tokens, "temperature": 0,
+        }))
+        usage = response["usage"]
+        tokens += usage["completion_tokens"]
+        seconds += usage["completion_tokens"] / usage["tokens_per_second"] if usage.get("tokens_per_second") else 0
+        proposed += usage.get("speculative", {}).get("proposed", 0)
+        accepted += usage.get("speculative", {}).get("accepted", 0)
+    return {
+        "tokens_per_second": tokens / seconds if seconds else 0.0,
+        "acceptance_rate": accepted / proposed if proposed else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True, help="GGUF file to load")
+    parser.add_argument("--draft", help="small GGUF with the same vocabulary, for the draft-model mode")
+    parser.add_argument("--draft-tokens", type=int, default=8)
+    parser.add_argument("--max-tokens", type=int, default=128)
+    parser.add_argument("--url", help="use a running server instead of starting one")
+    args = parser.parse_args()
+
+    modes = [("plain", {}), ("prompt_lookup", {"speculative": "prompt_lookup", "draft_tokens": args.draft_tokens})]
+    if args.draft:
+        modes.append(("draft", {"speculative": "draft", "draft_model": path.abspath(args.draft), "draft_tokens": args.draft_tokens}))
+
+    url, process = (args.url, None) if args.url else start_server()
+    try:
+        baseline = None
+        print(f"\n{'mode':<14} {'tok/s':>8} {'accepted':>9} {'speedup':>8}")
+        for name, options in modes:
+            request(f"{url}/v1/models/load", {"path": path.abspath(args.model), "n_ctx": 4096, "wait": True, **options})
+            result = run(url, args.max_tokens)
+            baseline = baseline or result["tokens_per_second"]
+            rate = f"{result['acceptance_rate']:.0%}" if result["acceptance_rate"] is not None else "-"
+            speedup = result["tokens_per_second"] / baseline if baseline else 0.0
+            print(f"{name:<14} {result['tokens_per_second']:>8.1f} {rate:>9} {speedup:>7.2f}x")
+        print()
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
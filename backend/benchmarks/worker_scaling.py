@@ -0,0 +1,62 @@
+"""
+Aggregate generation throughput of local_llm_server with the worker pool
+at different sizes.
+
+For each worker count a fresh server is started with LOCAL_LLM_WORKERS set,
+the GGUF is loaded, and `--users` clients each send `--requests` chat
+completions back to back. Prints completion tokens/s over the whole run;
+on a many-core CPU host it should grow close to linearly with the number
+of workers (each gets cpu_count // workers threads).
+
+Usage: python benchmarks/worker_scaling.py --model local_models/x.gguf [--workers 1 2 4] [--users 4] [--requests 2] [--max-tokens 128]
+"""
+import argparse
+import json
+import threading
+import time
+from os import path
+
+from responsiveness import request, start_server
+
+
+def run(url: str, users: int, requests: int, max_tokens: int) -> tuple:
+    tokens = []
+
+    def user(n):
+        for i in range(requests):
+            body = {"messages": [{"role": "user", "content": f"User {n}, request {i}: write a story about a lighthouse keeper."}], "max_tokens": max_tokens}
+            tokens.append(json.loads(request(f"{url}/v1/chat/completions", body))["usage"]["completion_tokens"])
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(tokens), time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", required=True, help="GGUF file to load")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=2, help="requests per user")
+    parser.add_argument("--max-tokens", type=int, default=128)
+    args = parser.parse_args()
+
+    print(f"\n{'workers':>7} {'tokens':>8} {'seconds':>9} {'tokens/s':>9} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        # 0 would be in-process mode; 1 keeps the comparison process-to-process
+        url, process = start_server({"LOCAL_LLM_WORKERS": str(workers), "LOCAL_LLM_QUEUE_DEPTH": str(args.users * 2)})
+        try:
+            request(f"{url}/v1/models/load", {"path": path.abspath(args.model), "n_gpu_layers": 0, "wait": True})
+            tokens, seconds = run(url, args.users, args.requests, args.max_tokens)
+        finally:
+            process.terminate()
+            process.wait()
+        rate = tokens / seconds
+        baseline = baseline or rate
+        print(f"{workers:>7} {tokens:>8} {seconds:>9.2f} {rate:>9.1f} {rate / baseline:>7.2f}x")
+    print()
@@ -7,9 +7,15 @@ import http.server
 import json
 import asyncio
 import io
+import os
 import sys
 
+# Span recorder shared with the Grok bridge and driver (stdlib only)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Grok-Api-main"))
+from core.tracing import Tracer
+
 PORT = 8002
+TRACER = Tracer("edge_tts")
 
 # Windows asyncio fix
 if sys.platform == 'win32':
@@ -24,7 +30,7 @@ class EdgeTTSHandler(http.server.BaseHTTPRequestHandler):
     def _cors(self):
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, traceparent')
 
     def do_OPTIONS(self):
         self.send_response(200)
@@ -66,7 +72,9 @@ class EdgeTTSHandler(http.server.BaseHTTPRequestHandler):
                 text = body.get('text', 'Hello')[:2000]  # Limit length
                 voice = body.get('voice', 'en-US-AriaNeural')
 
-                audio = asyncio.run(self._synth(text, voice))
+                with TRACER.span("tts.speak", traceparent=self.headers.get('traceparent'), voice=voice, chars=len(text)) as span:
+                    audio = asyncio.run(self._synth(text, voice))
+                    span.set(bytes=len(audio))
 
                 self.send_response(200)
                 self.send_header('Content-Type', 'audio/mp3')
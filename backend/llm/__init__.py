@@ -0,0 +1 @@
+"""Inference runtime pieces used by local_llm_server.py."""
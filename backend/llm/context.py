@@ -0,0 +1,151 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, List
+
+MESSAGE_OVERHEAD = 4   # template markers around each message, e.g. "<|im_start|>" ... "<|im_end|>\n"
+PRIMER_TOKENS = 3      # the assistant header the template appends for generation
+SUMMARY_TURN_CHARS = 200
+SUMMARY_MAX_CHARS = 1200
+
+CONTEXT_MODES = ("off", "error", "trim", "summarize")
+
+
+class ContextOverflow(ValueError):
+    """The conversation doesn't fit the budget and may not be (further) shortened."""
+
+    def __init__(self, tokens: int, budget: int):
+        super().__init__(f"Conversation needs ~{tokens} tokens, budget is {budget}")
+        self.tokens = tokens
+        self.budget = budget
+
+
+class TokenCounter:
+    """
+    Token counts per message, cached by (model, role, content) hash so a
+    growing conversation only tokenizes its new turns. A count is the role
+    and content tokens plus MESSAGE_OVERHEAD for the chat template's
+    markers: not exact for every template, but within a few tokens per
+    message, which is enough to tell whether a conversation fits before
+    llama.cpp evaluates it. Models served from worker processes have no
+    tokenizer in this process; a vocab-only copy (no weights) is opened for
+    them on first use.
+    """
+
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self.counts: OrderedDict = OrderedDict()  # hash -> token count
+        self.vocabs: dict = {}                    # path -> vocab-only Llama
+        self.lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0}
+
+    def tokenizer(self, entry):
+        """Something with `tokenize` for a registry entry."""
+        if entry.embedding:
+            return entry.model.model
+        if entry.model is not None:
+            return entry.model  # llama_tokenize only reads the vocab: safe beside a running generation
+        with self.lock:
+            if entry.path not in self.vocabs:
+                if os.environ.get("LOCAL_LLM_FAKE_BACKEND"):
+                    from llm.fake import FakeLlama as Llama
+                else:
+                    from llama_cpp import Llama
+                self.vocabs[entry.path] = Llama(model_path=entry.path, vocab_only=True, verbose=False)
+            return self.vocabs[entry.path]
+
+    def forget(self, path: str):
+        with self.lock:
+            self.vocabs.pop(path, None)
+
+    def tokenize(self, entry, text: str, add_special: bool = False) -> List[int]:
+        return self.tokenizer(entry).tokenize(text.encode("utf-8"), add_bos=add_special, special=True)
+
+    def count_message(self, entry, message: dict) -> int:
+        key = hashlib.sha256(f"{entry.path}\0{message['role']}\0{message['content']}".encode("utf-8")).hexdigest()
+        with self.lock:
+            self.stats["lookups"] += 1
+            if key in self.counts:
+                self.stats["hits"] += 1
+                self.counts.move_to_end(key)
+                return self.counts[key]
+        count = len(self.tokenize(entry, message["role"])) + len(self.tokenize(entry, message["content"])) + MESSAGE_OVERHEAD
+        with self.lock:
+            self.counts[key] = count
+            while len(self.counts) > self.max_entries:
+                self.counts.popitem(last=False)
+        return count
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            lookups = self.stats["lookups"]
+            return {
+                **self.stats,
+                "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self.counts),
+                "vocab_only_models": len(self.vocabs),
+            }
+
+
+def summarize_turns(messages: List[dict]) -> str:
+    """
+    Extractive digest of dropped turns: the first sentence of each, newest
+    kept when it runs long. Costs no generation, unlike asking the model.
+    """
+    lines = []
+    for message in messages:
+        text = " ".join(message["content"].split())
+        first = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0][:SUMMARY_TURN_CHARS]
+        if first:
+            lines.append(f"{message['role']}: {first}")
+    while lines and sum(len(line) + 1 for line in lines) > SUMMARY_MAX_CHARS:
+        lines.pop(0)
+    return "Summary of the earlier conversation:\n" + "\n".join(lines)
+
+
+def fit_messages(messages: List[dict], budget: int, count: Callable[[dict], int], mode: str) -> tuple:
+    """
+    Shorten `messages` to about `budget` prompt tokens. "trim" drops the
+    oldest turns, "summarize" also folds them into a short digest in the
+    system prompt, "error" only checks. System messages and the last
+    message are always kept. Returns (messages, report); raises
+    ContextOverflow when they can't be made to fit.
+    """
+    counts = [count(message) for message in messages]
+    total = sum(counts) + PRIMER_TOKENS
+    report = {"mode": mode, "budget": budget, "prompt_tokens_estimate": total, "dropped_messages": 0}
+    if mode == "off" or total <= budget:
+        return messages, report
+    if mode == "error":
+        raise ContextOverflow(total, budget)
+
+    droppable = [i for i, message in enumerate(messages[:-1]) if message["role"] != "system"]
+    dropped: List[int] = []
+    fitted = messages
+    while total > budget:
+        if not droppable:
+            raise ContextOverflow(total, budget)
+        dropped.append(droppable.pop(0))
+        # Whole exchanges: the kept history shouldn't open with a reply
+        while droppable and messages[droppable[0]]["role"] != "user":
+            dropped.append(droppable.pop(0))
+        kept = [message for i, message in enumerate(messages) if i not in dropped]
+        total = sum(c for i, c in enumerate(counts) if i not in dropped) + PRIMER_TOKENS
+        fitted = kept
+        if mode == "summarize":
+            digest = summarize_turns([messages[i] for i in dropped])
+            system = next((i for i, message in enumerate(kept) if message["role"] == "system"), None)
+            if system is None:
+                summary = {"role": "system", "content": digest}
+                fitted = [summary] + kept
+                total += count(summary)
+            else:
+                # Merged into the system prompt: some templates reject a second system message
+                summary = {**kept[system], "content": f"{kept[system]['content']}\n\n{digest}"}
+                fitted = kept[:system] + [summary] + kept[system + 1:]
+                total += count(summary) - count(kept[system])
+
+    report.update(prompt_tokens_estimate=total, dropped_messages=len(dropped), original_tokens_estimate=sum(counts) + PRIMER_TOKENS)
+    return fitted, report
@@ -0,0 +1,290 @@
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger("LocalLLM")
+
+CHUNK = 1024 * 1024
+SAVE_EVERY_S = 1.0                   # how often segment progress is written for resume
+MIN_SEGMENT = 32 * 1024 * 1024       # don't split files into smaller segments than this
+
+
+class DownloadCancelled(Exception):
+    """The download was cancelled through the API."""
+
+
+def hf_file(repo_id: str, filename: str) -> tuple:
+    """(url, sha256 or None, size or None) of a file in a Hugging Face repo."""
+    try:
+        from huggingface_hub import get_hf_file_metadata, hf_hub_url
+    except ImportError:
+        return f"https://huggingface.co/{repo_id}/resolve/main/{filename}", None, None
+    url = hf_hub_url(repo_id=repo_id, filename=filename)
+    meta = get_hf_file_metadata(url)
+    # For LFS files (every GGUF) the etag is the SHA-256 of the content
+    etag = (meta.etag or "").strip('"')
+    sha256 = etag if len(etag) == 64 else None
+    return meta.location or url, sha256, meta.size
+
+
+class DownloadJob:
+    """One file being fetched into the models directory."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, url: str, filename: str, sha256: Optional[str] = None, size: Optional[int] = None):
+        self.id = f"dl-{next(DownloadJob._ids)}"
+        self.url = url
+        self.filename = filename
+        self.sha256 = sha256.lower() if sha256 else None
+        self.size = size
+        self.status = "queued"   # queued -> downloading -> verifying -> completed | failed | cancelled
+        self.segments: list = []  # [start, end (exclusive), bytes done]
+        self.ranges = False       # server honours Range requests
+        self.resumed_bytes = 0
+        self.verified = False     # content hashed and matched `sha256`
+        self.path: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+    def downloaded(self) -> int:
+        return sum(segment[2] for segment in self.segments)
+
+    def snapshot(self) -> dict:
+        downloaded = self.downloaded()
+        elapsed = (self.finished or time.time()) - self.started if self.started else 0
+        fetched = downloaded - self.resumed_bytes
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "url": self.url,
+            "status": self.status,
+            "size": self.size,
+            "downloaded": downloaded,
+            "progress": round(downloaded / self.size, 4) if self.size else None,
+            "segments": len(self.segments),
+            "resumed_bytes": self.resumed_bytes,
+            "speed_mb_s": round(fetched / elapsed / (1024 * 1024), 2) if elapsed > 0 else 0.0,
+            "sha256": self.sha256,
+            "verified": self.verified,
+            "path": self.path,
+            "error": self.error,
+        }
+
+
+class DownloadManager:
+    """
+    Background, resumable model downloads.
+
+    Each job fetches into `<models_dir>/.downloads/<file>.part` next to a
+    small JSON sidecar recording per-segment progress, so a download that
+    is interrupted (or the server restarted) resumes with HTTP Range
+    requests where it stopped once it is submitted again. When the server
+    accepts ranges and the file is large, it is fetched as `segments`
+    parallel ranges. The result is checked against the expected SHA-256 and
+    only then atomically renamed into `models_dir`, so a partial or corrupt
+    file is never picked up as a model.
+    """
+
+    def __init__(self, models_dir: str, segments: int = 4):
+        self.models_dir = models_dir
+        self.partial_dir = os.path.join(models_dir, ".downloads")
+        self.segments = max(1, segments)
+        self.jobs: OrderedDict = OrderedDict()  # id -> DownloadJob, newest last
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, models_dir: str) -> "DownloadManager":
+        return cls(models_dir, int(os.environ.get("LOCAL_LLM_DOWNLOAD_SEGMENTS", "4")))
+
+    def submit(self, url: str, filename: str, sha256: Optional[str] = None, size: Optional[int] = None) -> DownloadJob:
+        """Start downloading `url` as `filename`, or return the job already fetching that file."""
+        filename = os.path.basename(filename)
+        with self.lock:
+            for job in self.jobs.values():
+                if job.filename == filename and not job.done.is_set():
+                    return job
+            job = DownloadJob(url, filename, sha256, size)
+            self.jobs[job.id] = job
+            while len(self.jobs) > 50:
+                self.jobs.popitem(last=False)
+        threading.Thread(target=self._run, args=(job,), name=f"llm-download-{job.id}", daemon=True).start()
+        return job
+
+    def cancel(self, job_id: str) -> Optional[DownloadJob]:
+        job = self.jobs.get(job_id)
+        if job:
+            job.cancelled.set()
+        return job
+
+    # --- job ---
+
+    def _run(self, job: DownloadJob):
+        os.makedirs(self.partial_dir, exist_ok=True)
+        part = os.path.join(self.partial_dir, job.filename + ".part")
+        state_path = part + ".json"
+        job.started = time.time()
+        job.status = "downloading"
+        try:
+            size, job.ranges = self._probe(job)
+            job.size = job.size or size
+            target = os.path.join(self.models_dir, job.filename)
+            if job.size and os.path.exists(target) and os.path.getsize(target) == job.size:
+                # Same size is only a hint: with a known hash, the file has to match it
+                if job.sha256:
+                    job.status = "verifying"
+                    job.verified = self._sha256(target, job) == job.sha256
+                if job.verified or not job.sha256:
+                    job.path = target
+                    job.status = "completed"
+                    return
+                logger.warning(f"{job.filename} exists but doesn't match its SHA-256, downloading it again")
+                job.status = "downloading"
+            self._plan(job, part, state_path)
+            self._fetch(job, part, state_path)
+
+            if job.sha256:
+                job.status = "verifying"
+                actual = self._sha256(part, job)
+                if actual != job.sha256:
+                    # Corrupt, not just incomplete: start over next time
+                    for path in (part, state_path):
+                        os.remove(path)
+                    raise ValueError(f"SHA-256 mismatch: expected {job.sha256}, got {actual}")
+                job.verified = True
+
+            job.path = os.path.join(self.models_dir, job.filename)
+            os.replace(part, job.path)
+            os.remove(state_path)
+            job.status = "completed"
+            logger.info(f"Downloaded {job.filename} ({job.size} bytes)")
+        except DownloadCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Download of {job.filename} failed: {e}")
+        finally:
+            job.finished = time.time()
+            job.done.set()
+
+    def _probe(self, job: DownloadJob) -> tuple:
+        """(size or None, whether the server honours Range) for the job's URL."""
+        req = urllib.request.Request(job.url, headers={"Range": "bytes=0-0"})
+        with urllib.request.urlopen(req, timeout=30) as response:
+            job.url = response.geturl()  # resolve redirects once (Hub -> CDN)
+            if response.status == 206:
+                total = response.headers.get("Content-Range", "").rpartition("/")[2]
+                return (int(total) if total.isdigit() else None), True
+            length = response.headers.get("Content-Length")
+            return (int(length) if length else None), False
+
+    def _plan(self, job: DownloadJob, part: str, state_path: str):
+        """Resume from the sidecar if it describes this download, else lay out fresh segments."""
+        if job.ranges and os.path.exists(part) and os.path.exists(state_path):
+            try:
+                with open(state_path) as f:
+                    state = json.load(f)
+                if state["size"] == job.size and state["sha256"] == job.sha256:
+                    job.segments = state["segments"]
+                    job.resumed_bytes = job.downloaded()
+                    logger.info(f"Resuming {job.filename} at {job.resumed_bytes} bytes")
+                    return
+            except (OSError, ValueError, KeyError):
+                pass
+
+        if not job.ranges or not job.size:
+            job.segments = [[0, job.size, 0]]
+        else:
+            count = max(1, min(self.segments, job.size // MIN_SEGMENT))
+            step = -(-job.size // count)
+            job.segments = [[start, min(start + step, job.size), 0] for start in range(0, job.size, step)]
+        with open(part, "wb") as f:
+            if job.size:
+                f.truncate(job.size)
+        self._save(job, state_path)
+
+    def _save(self, job: DownloadJob, state_path: str):
+        tmp = state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"url": job.url, "size": job.size, "sha256": job.sha256, "segments": job.segments}, f)
+        os.replace(tmp, state_path)
+
+    def _fetch(self, job: DownloadJob, part: str, state_path: str):
+        errors = []
+        save_lock = threading.Lock()
+
+        def run(segment):
+            try:
+                self._fetch_segment(job, segment, part, state_path, save_lock)
+            except Exception as e:
+                errors.append(e)
+                job.cancelled.set()  # stop the other segments; progress so far is kept
+
+        pending = [segment for segment in job.segments if segment[1] is None or segment[0] + segment[2] < segment[1]]
+        threads = [threading.Thread(target=run, args=(segment,)) for segment in pending]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with save_lock:
+            self._save(job, state_path)
+        if errors:
+            if all(isinstance(e, DownloadCancelled) for e in errors):
+                raise errors[0]
+            raise next(e for e in errors if not isinstance(e, DownloadCancelled))
+        if job.cancelled.is_set():
+            raise DownloadCancelled()
+
+    def _fetch_segment(self, job: DownloadJob, segment: list, part: str, state_path: str, save_lock: threading.Lock):
+        start, end, done = segment
+        headers = {}
+        if job.ranges and end is not None:
+            headers["Range"] = f"bytes={start + done}-{end - 1}"
+        last_save = time.time()
+        with urllib.request.urlopen(urllib.request.Request(job.url, headers=headers), timeout=60) as response, open(part, "r+b") as f:
+            if headers and response.status != 206:
+                raise IOError(f"Server ignored the Range request (HTTP {response.status})")
+            f.seek(start + done)
+            while True:
+                if job.cancelled.is_set():
+                    raise DownloadCancelled()
+                chunk = response.read(CHUNK if end is None else min(CHUNK, end - start - segment[2]))
+                if not chunk:
+                    break
+                f.write(chunk)
+                segment[2] += len(chunk)
+                if time.time() - last_save > SAVE_EVERY_S:
+                    f.flush()
+                    with save_lock:
+                        self._save(job, state_path)
+                    last_save = time.time()
+        if end is not None and start + segment[2] < end:
+            raise IOError(f"Connection closed {end - start - segment[2]} bytes early")
+
+    def _sha256(self, path: str, job: DownloadJob) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while True:
+                if job.cancelled.is_set():
+                    raise DownloadCancelled()
+                chunk = f.read(CHUNK * 8)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def snapshot(self) -> list:
+        with self.lock:
+            return [job.snapshot() for job in reversed(self.jobs.values())]
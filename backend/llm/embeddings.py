@@ -0,0 +1,177 @@
+import hashlib
+import inspect
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+
+from llm.tuning import model_fingerprint
+
+logger = logging.getLogger("LocalLLM")
+
+# Sequences per llama.cpp batch (llama.cpp's LLAMA_MAX_SEQ)
+MAX_SEQUENCES = 64
+
+
+def text_key(model_id: str, text: str) -> str:
+    return hashlib.sha256(f"{model_id}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Embedding vectors keyed by a hash of (model content, text). A RAM LRU of
+    `max_entries` vectors sits in front of an optional SQLite file, so text
+    embedded once is never evaluated again, across restarts too.
+    """
+
+    def __init__(self, max_entries: int, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self.ram: OrderedDict = OrderedDict()  # key -> array("f")
+        self.lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "disk_hits": 0, "stores": 0}
+        self.db: Optional[sqlite3.Connection] = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+
+    @classmethod
+    def from_env(cls) -> "EmbeddingCache":
+        """Cache per LOCAL_LLM_EMBED_CACHE_ENTRIES and LOCAL_LLM_EMBED_CACHE_PATH (unset = RAM only)."""
+        return cls(int(os.environ.get("LOCAL_LLM_EMBED_CACHE_ENTRIES", "50000")), os.environ.get("LOCAL_LLM_EMBED_CACHE_PATH") or None)
+
+    def _remember(self, key: str, vector: array):
+        self.ram[key] = vector
+        self.ram.move_to_end(key)
+        while len(self.ram) > self.max_entries:
+            self.ram.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> dict:
+        """The cached vectors among `keys`, as key -> array("f")."""
+        found = {}
+        with self.lock:
+            self.stats["lookups"] += len(keys)
+            for key in keys:
+                if key in self.ram:
+                    self.ram.move_to_end(key)
+                    found[key] = self.ram[key]
+            missing = [key for key in keys if key not in found]
+            if self.db and missing:
+                for start in range(0, len(missing), 500):  # stay under SQLite's variable limit
+                    chunk = missing[start:start + 500]
+                    rows = self.db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk,
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = array("f")
+                        vector.frombytes(blob)
+                        found[key] = vector
+                        self._remember(key, vector)
+                        self.stats["disk_hits"] += 1
+            self.stats["hits"] += len(found)
+        return found
+
+    def put_many(self, items: dict):
+        with self.lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            self.stats["stores"] += len(items)
+            if self.db and items:
+                with self.db:
+                    self.db.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                        [(key, vector.tobytes()) for key, vector in items.items()],
+                    )
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            lookups = self.stats["lookups"]
+            return {
+                **self.stats,
+                "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "ram_entries": len(self.ram),
+                "max_entries": self.max_entries,
+                "path": self.path,
+            }
+
+
+def _sequence_params(llama_class) -> dict:
+    """
+    Constructor arguments that let one llama.cpp batch carry MAX_SEQUENCES
+    inputs, as `Llama.embed` builds them; a single-sequence context rejects
+    those batches.
+    """
+    supported = inspect.signature(llama_class.__init__).parameters
+    missing = [name for name in ("n_seq_max", "kv_unified") if name not in supported]
+    if missing:
+        import llama_cpp
+
+        raise RuntimeError(
+            f"llama-cpp-python {getattr(llama_cpp, '__version__', '?')} can't create multi-sequence contexts "
+            f"(Llama() has no {', '.join(missing)}); upgrade it to serve embedding models"
+        )
+    return {"n_seq_max": MAX_SEQUENCES, "kv_unified": True}  # every sequence may use the whole context
+
+
+class Embedder:
+    """
+    An embedding GGUF plus the cache in front of it. Uncached inputs go to
+    llama.cpp together, up to `n_batch` tokens and MAX_SEQUENCES inputs per
+    pass; repeated and already-embedded texts are never evaluated.
+    """
+
+    def __init__(self, path: str, n_ctx: int = 2048, n_gpu_layers: int = 0, n_batch: int = 2048,
+                 cache: Optional[EmbeddingCache] = None):
+        from llama_cpp import Llama
+
+        # Non-causal (BERT-style) models need each input within one physical batch
+        self.model = Llama(model_path=path, n_ctx=n_ctx, n_gpu_layers=n_gpu_layers, n_batch=n_batch,
+                           n_ubatch=n_batch, embedding=True, verbose=False, **_sequence_params(Llama))
+        self.path = path
+        self.model_id = model_fingerprint(path)
+        self.cache = cache
+        self.lock = threading.Lock()  # one llama.cpp context, whichever scheduler thread calls
+        self.stats = {"requests": 0, "inputs": 0, "embedded": 0, "tokens": 0, "embed_ms": 0.0}
+
+    def embed(self, texts: List[str]) -> tuple:
+        """Unit-length vectors for `texts`; returns (vectors, evaluated tokens, cached inputs)."""
+        keys = [text_key(self.model_id, text) for text in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys))) if self.cache else {}
+        cached = sum(key in found for key in keys)
+        todo = {key: text for key, text in zip(keys, texts) if key not in found}  # also drops duplicates
+
+        tokens = 0
+        fresh = {}
+        if todo:
+            start = time.perf_counter()
+            pending = list(todo.items())
+            with self.lock:
+                for offset in range(0, len(pending), MAX_SEQUENCES):
+                    chunk = pending[offset:offset + MAX_SEQUENCES]
+                    vectors, count = self.model.embed([text for _, text in chunk], normalize=True, truncate=True, return_count=True)
+                    tokens += count
+                    for (key, _), vector in zip(chunk, vectors):
+                        fresh[key] = array("f", vector)
+            self.stats["embed_ms"] += (time.perf_counter() - start) * 1000
+            if self.cache:
+                self.cache.put_many(fresh)
+
+        self.stats["requests"] += 1
+        self.stats["inputs"] += len(texts)
+        self.stats["embedded"] += len(fresh)
+        self.stats["tokens"] += tokens
+        return [found[key] if key in found else fresh[key] for key in keys], tokens, cached
+
+    def snapshot(self) -> dict:
+        seconds = self.stats["embed_ms"] / 1000
+        return {
+            **self.stats,
+            "embed_ms": round(self.stats["embed_ms"], 1),
+            "texts_per_second": round(self.stats["embedded"] / seconds, 1) if seconds else 0.0,
+            "n_embd": self.model.n_embd(),
+        }
@@ -0,0 +1,120 @@
+import itertools
+import os
+import time
+from types import SimpleNamespace
+from typing import List
+
+
+class StoppingCriteriaList(list):
+    """`llama_cpp.StoppingCriteriaList` for the fake backend: stop when any criterion says so."""
+
+    def __call__(self, input_ids, logits) -> bool:
+        return any(criterion(input_ids, logits) for criterion in self)
+
+
+class LlamaGrammar:
+    """`llama_cpp.LlamaGrammar` for the fake backend, which accepts a grammar and ignores it."""
+
+    def __init__(self, grammar: str):
+        self.grammar = grammar
+
+    @classmethod
+    def from_string(cls, grammar: str, verbose: bool = True) -> "LlamaGrammar":
+        return cls(grammar)
+
+
+class FakeLlama:
+    """
+    Deterministic stand-in for `llama_cpp.Llama`, used instead of it when
+    LOCAL_LLM_FAKE_BACKEND=1 so the server can be load-tested on any CPU
+    without a real model. Prompt evaluation and every generated token take
+    fixed times (LOCAL_LLM_FAKE_PROMPT_US per prompt token,
+    LOCAL_LLM_FAKE_TOKEN_MS per output token) and replies are always
+    "token0 token1 ...", so numbers only move when the server around it
+    changes. Any file serves as its "model". The time spent is counted like
+    llama.cpp's perf counters (`perf_context`, read by llm/perf.py).
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, model_path: str, n_ctx: int = 512, n_batch: int = 512, draft_model=None, **kwargs):
+        self.model_path = model_path
+        self._n_ctx = n_ctx
+        self.n_batch = n_batch
+        self.draft_model = draft_model
+        self.token_s = float(os.environ.get("LOCAL_LLM_FAKE_TOKEN_MS", "10")) / 1000
+        self.prompt_s = float(os.environ.get("LOCAL_LLM_FAKE_PROMPT_US", "100")) / 1_000_000
+        self.perf_context_reset()
+
+    def perf_context_reset(self):
+        self.perf = {"t_p_eval_ms": 0.0, "t_eval_ms": 0.0, "n_p_eval": 0, "n_eval": 0}
+
+    def perf_context(self) -> SimpleNamespace:
+        """Counters since the last reset, shaped like llama.cpp's `llama_perf_context_data`."""
+        return SimpleNamespace(**self.perf)
+
+    def n_ctx(self) -> int:
+        return self._n_ctx
+
+    def n_vocab(self) -> int:
+        return 32000
+
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False) -> List[int]:
+        # About four bytes per token, like real BPE vocabularies on English text
+        tokens = [int.from_bytes(text[i:i + 4], "little") % 32000 for i in range(0, len(text), 4)]
+        return [1] + tokens if add_bos else tokens
+
+    def set_cache(self, cache):
+        pass  # nothing to reuse: every call evaluates its prompt from scratch
+
+    def create_chat_completion(self, messages: List[dict], max_tokens: int = 0, stream: bool = False,
+                               stopping_criteria=None, **kwargs):
+        prompt = "".join(f"{m['role']}\n{m['content']}\n" for m in messages)
+        prompt_tokens = len(self.tokenize(prompt.encode("utf-8")))
+        if prompt_tokens >= self._n_ctx:
+            raise ValueError(f"Requested tokens ({prompt_tokens}) exceed context window of {self._n_ctx}")
+        room = self._n_ctx - prompt_tokens
+        n = min(max_tokens, room) if max_tokens and max_tokens > 0 else min(256, room)
+        completion_id = f"chatcmpl-fake-{next(FakeLlama._ids)}"
+        created = int(time.time())
+        state = {"finish_reason": "length", "generated": 0}
+
+        def pieces():
+            start = time.perf_counter()
+            time.sleep(prompt_tokens * self.prompt_s)
+            self.perf["t_p_eval_ms"] += (time.perf_counter() - start) * 1000
+            self.perf["n_p_eval"] += prompt_tokens
+            for i in range(n):
+                if stopping_criteria and stopping_criteria([], None):
+                    state["finish_reason"] = "stop"
+                    return
+                start = time.perf_counter()
+                time.sleep(self.token_s)
+                self.perf["t_eval_ms"] += (time.perf_counter() - start) * 1000
+                self.perf["n_eval"] += 1
+                state["generated"] += 1
+                yield f"token{i} "
+
+        def chunk(delta: dict, finish_reason=None) -> dict:
+            return {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": self.model_path,
+                "choices": [{"index": 0, "delta": delta, "logprobs": None, "finish_reason": finish_reason}],
+            }
+
+        if stream:
+            def chunks():
+                yield chunk({"role": "assistant"})
+                for piece in pieces():
+                    yield chunk({"content": piece})
+                yield chunk({}, state["finish_reason"])
+            return chunks()
+
+        text = "".join(pieces())
+        return {
+            "id": completion_id, "object": "chat.completion", "created": created, "model": self.model_path,
+            "choices": [{
+                "index": 0, "message": {"role": "assistant", "content": text},
+                "logprobs": None, "finish_reason": state["finish_reason"],
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": state["generated"], "total_tokens": prompt_tokens + state["generated"]},
+        }
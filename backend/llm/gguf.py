@@ -0,0 +1,276 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from typing import Optional
+
+logger = logging.getLogger("LocalLLM")
+
+GGUF_MAGIC = b"GGUF"
+DEFAULT_ALIGNMENT = 32
+MAX_ARRAY_ITEMS = 64  # longer arrays (vocabularies, merges) are summarised by their length
+
+# Fixed-size GGUF metadata value types and their struct formats
+_SCALARS = {0: "<B", 1: "<b", 2: "<H", 3: "<h", 4: "<I", 5: "<i", 6: "<f", 7: "<?", 10: "<Q", 11: "<q", 12: "<d"}
+_STRING, _ARRAY = 8, 9
+
+# general.file_type (llama_ftype) names
+FILE_TYPES = {
+    0: "F32", 1: "F16", 2: "Q4_0", 3: "Q4_1", 7: "Q8_0", 8: "Q5_0", 9: "Q5_1", 10: "Q2_K",
+    11: "Q3_K_S", 12: "Q3_K_M", 13: "Q3_K_L", 14: "Q4_K_S", 15: "Q4_K_M", 16: "Q5_K_S",
+    17: "Q5_K_M", 18: "Q6_K", 19: "IQ2_XXS", 20: "IQ2_XS", 21: "Q2_K_S", 22: "IQ3_XS",
+    23: "IQ3_XXS", 24: "IQ1_S", 25: "IQ4_NL", 26: "IQ3_S", 27: "IQ3_M", 28: "IQ2_S",
+    29: "IQ2_M", 30: "IQ4_XS", 31: "IQ1_M", 32: "BF16", 36: "TQ1_0", 37: "TQ2_0",
+}
+# ggml_type names, for files without general.file_type
+TENSOR_TYPES = {
+    0: "F32", 1: "F16", 2: "Q4_0", 3: "Q4_1", 6: "Q5_0", 7: "Q5_1", 8: "Q8_0", 9: "Q8_1",
+    10: "Q2_K", 11: "Q3_K", 12: "Q4_K", 13: "Q5_K", 14: "Q6_K", 15: "Q8_K", 16: "IQ2_XXS",
+    17: "IQ2_XS", 18: "IQ3_XXS", 19: "IQ1_S", 20: "IQ4_NL", 21: "IQ3_S", 22: "IQ2_S",
+    23: "IQ4_XS", 24: "I8", 25: "I16", 26: "I32", 27: "I64", 28: "F64", 29: "IQ1_M", 30: "BF16",
+    34: "TQ1_0", 35: "TQ2_0",
+}
+
+
+class GGUFError(ValueError):
+    """The file is not a GGUF file this reader understands."""
+
+
+class _Reader:
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 0
+
+    def unpack(self, fmt: str):
+        value = struct.unpack_from(fmt, self.buf, self.pos)[0]
+        self.pos += struct.calcsize(fmt)
+        return value
+
+    def string(self) -> str:
+        length = self.unpack("<Q")
+        value = bytes(self.buf[self.pos:self.pos + length]).decode("utf-8", errors="replace")
+        self.pos += length
+        return value
+
+    def value(self, kind: int):
+        if kind in _SCALARS:
+            return self.unpack(_SCALARS[kind])
+        if kind == _STRING:
+            return self.string()
+        if kind == _ARRAY:
+            item_kind, count = self.unpack("<I"), self.unpack("<Q")
+            if count > MAX_ARRAY_ITEMS:
+                self.skip(item_kind, count)  # summarised by length: no need to decode the items
+                return {"array_length": count}
+            return [self.value(item_kind) for _ in range(count)]
+        raise GGUFError(f"Unknown GGUF value type {kind}")
+
+    def skip(self, kind: int, count: int = 1):
+        """Step over `count` values of `kind` without decoding them (vocabularies are ~150k strings)."""
+        if kind in _SCALARS:
+            self.pos += count * struct.calcsize(_SCALARS[kind])
+        elif kind == _STRING:
+            for _ in range(count):
+                length = self.unpack("<Q")
+                self.pos += length
+        elif kind == _ARRAY:
+            for _ in range(count):
+                item_kind, items = self.unpack("<I"), self.unpack("<Q")
+                self.skip(item_kind, items)
+        else:
+            raise GGUFError(f"Unknown GGUF value type {kind}")
+
+
+def read_header(path: str) -> dict:
+    """
+    Metadata and tensor table of a GGUF file. The file is mapped rather
+    than read, so only the pages holding the header are ever touched, not
+    the gigabytes of weights after it.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        if buf[:4] != GGUF_MAGIC:
+            raise GGUFError(f"{os.path.basename(path)} is not a GGUF file")
+        r = _Reader(buf)
+        r.pos = 4
+        version = r.unpack("<I")
+        if version < 2:
+            raise GGUFError(f"GGUF version {version} is not supported")
+        n_tensors, n_kv = r.unpack("<Q"), r.unpack("<Q")
+
+        metadata = {}
+        for _ in range(n_kv):
+            key = r.string()
+            metadata[key] = r.value(r.unpack("<I"))
+
+        tensors = []
+        for _ in range(n_tensors):
+            name = r.string()
+            dims = [r.unpack("<Q") for _ in range(r.unpack("<I"))]
+            tensors.append({"name": name, "dims": dims, "type": r.unpack("<I"), "offset": r.unpack("<Q")})
+
+        alignment = metadata.get("general.alignment", DEFAULT_ALIGNMENT)
+        data_start = -(-r.pos // alignment) * alignment
+        file_size = len(buf)
+
+    # Tensor sizes from the gaps between offsets, so no per-type block table is needed
+    ordered = sorted(tensors, key=lambda t: t["offset"])
+    for tensor, following in zip(ordered, ordered[1:] + [None]):
+        end = following["offset"] if following else file_size - data_start
+        tensor["bytes"] = end - tensor["offset"]
+    return {"version": version, "metadata": metadata, "tensors": tensors, "data_bytes": file_size - data_start}
+
+
+def summarize(header: dict) -> dict:
+    """The handful of facts the UI and the memory estimate need."""
+    meta = header["metadata"]
+    arch = meta.get("general.architecture", "unknown")
+
+    def arch_value(key, default=None):
+        value = meta.get(f"{arch}.{key}", default)
+        # Per-layer arrays (e.g. head_count_kv on some models): the largest layer bounds memory
+        return max(value) if isinstance(value, list) and value else value
+
+    tensors = header["tensors"]
+    parameters = 0
+    type_bytes: dict = {}
+    layer_bytes = 0
+    for tensor in tensors:
+        count = 1
+        for dim in tensor["dims"]:
+            count *= dim
+        parameters += count
+        name = TENSOR_TYPES.get(tensor["type"], str(tensor["type"]))
+        type_bytes[name] = type_bytes.get(name, 0) + tensor["bytes"]
+        if tensor["name"].startswith("blk."):
+            layer_bytes += tensor["bytes"]
+
+    file_type = meta.get("general.file_type")
+    quant = FILE_TYPES.get(file_type) if file_type is not None else None
+    if quant is None and type_bytes:
+        quant = max(type_bytes, key=type_bytes.get)
+
+    n_embd = arch_value("embedding_length")
+    n_head = arch_value("attention.head_count")
+    n_head_kv = arch_value("attention.head_count_kv", n_head)
+    head_dim = n_embd // n_head if n_embd and n_head else None
+    tokens = meta.get("tokenizer.ggml.tokens")
+    n_vocab = tokens.get("array_length") if isinstance(tokens, dict) else len(tokens or [])
+
+    return {
+        "architecture": arch,
+        "name": meta.get("general.name"),
+        "quantization": quant,
+        "parameters": parameters,
+        "context_length": arch_value("context_length"),
+        "n_layer": arch_value("block_count"),
+        "n_embd": n_embd,
+        "n_head": n_head,
+        "n_head_kv": n_head_kv,
+        "key_length": arch_value("attention.key_length", head_dim),
+        "value_length": arch_value("attention.value_length", head_dim),
+        "n_vocab": n_vocab or arch_value("vocab_size"),
+        "tensor_count": len(tensors),
+        "weights_bytes": header["data_bytes"],
+        "layer_bytes": layer_bytes,
+        "tensor_types": type_bytes,
+    }
+
+
+def estimate_memory(info: dict, n_ctx: int, n_gpu_layers: int = 0, n_batch: int = 512, kv_bytes_per_value: int = 2) -> dict:
+    """
+    Rough RAM / VRAM footprint of loading a model with `n_ctx`: the weights,
+    an F16 KV cache for the whole context and llama.cpp's compute buffers.
+    Offloaded layers move their share of weights and KV cache to VRAM.
+    """
+    n_layer = info.get("n_layer") or 0
+    kv_dim = (info.get("n_head_kv") or 0) * ((info.get("key_length") or 0) + (info.get("value_length") or 0))
+    kv_bytes = n_layer * n_ctx * kv_dim * kv_bytes_per_value
+    # Activations and logits for one batch
+    compute_bytes = n_batch * (info.get("n_embd") or 0) * 4 * 8 + (info.get("n_vocab") or 0) * n_batch * 4
+
+    offloaded = n_layer if n_gpu_layers < 0 else min(n_gpu_layers, n_layer)
+    share = offloaded / n_layer if n_layer else 0.0
+    weights = info["weights_bytes"]
+    gpu_weights = int(info.get("layer_bytes", 0) * share)
+    if n_gpu_layers < 0 or (n_layer and offloaded == n_layer):
+        gpu_weights = weights  # -1 also offloads the embedding/output tensors
+    gpu_kv = int(kv_bytes * share)
+
+    ram = weights - gpu_weights + kv_bytes - gpu_kv + compute_bytes
+    vram = gpu_weights + gpu_kv + (compute_bytes if offloaded else 0)
+    return {
+        "n_ctx": n_ctx,
+        "n_gpu_layers": n_gpu_layers,
+        "weights_bytes": weights,
+        "kv_cache_bytes": kv_bytes,
+        "compute_bytes": compute_bytes,
+        "ram_bytes": ram,
+        "vram_bytes": vram,
+        "ram_mb": round(ram / (1024 * 1024), 1),
+        "vram_mb": round(vram / (1024 * 1024), 1),
+    }
+
+
+class GGUFIndex:
+    """
+    Summaries of GGUF files keyed by path and invalidated by mtime/size,
+    persisted to a JSON file so a restart doesn't re-parse every header.
+    """
+
+    def __init__(self, index_path: Optional[str] = None):
+        self.index_path = index_path
+        self.entries: dict = {}  # abs path -> {"mtime_ns", "size", "info" | "error"}
+        self.lock = threading.Lock()
+        self.dirty = False
+        if index_path and os.path.exists(index_path):
+            try:
+                with open(index_path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable GGUF index {index_path}: {e}")
+
+    def info(self, path: str) -> dict:
+        """Summary of `path`, parsing its header only if the file changed. Raises GGUFError / OSError."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                if "error" in entry:
+                    raise GGUFError(entry["error"])
+                return entry["info"]
+        try:
+            entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "info": summarize(read_header(path))}
+        except (ValueError, struct.error) as e:  # GGUFError, bad UTF-8, empty file
+            entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "error": str(e)}
+        with self.lock:
+            self.entries[path] = entry
+            self.dirty = True
+        if "error" in entry:
+            raise GGUFError(entry["error"])
+        return entry["info"]
+
+    def try_info(self, path: str) -> Optional[dict]:
+        try:
+            return self.info(path)
+        except (GGUFError, OSError):
+            return None
+
+    def save(self):
+        """Write the index back if anything was parsed since the last save."""
+        if not self.index_path or not self.dirty:
+            return
+        with self.lock:
+            # Drop files that no longer exist
+            self.entries = {path: entry for path, entry in self.entries.items() if os.path.exists(path)}
+            data = json.dumps(self.entries)
+            self.dirty = False
+        try:
+            tmp = self.index_path + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(data)
+            os.replace(tmp, self.index_path)
+        except OSError as e:
+            logger.warning(f"Could not save GGUF index: {e}")
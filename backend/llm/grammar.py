@@ -0,0 +1,130 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+# llama_cpp.llama_grammar.JSON_GBNF, kept here so json_object works on the fake backend too
+JSON_GBNF = r"""
+root   ::= object
+value  ::= object | array | string | number | ("true" | "false" | "null") ws
+
+object ::=
+  "{" ws (
+            string ":" ws value
+    ("," ws string ":" ws value)*
+  )? "}" ws
+
+array  ::=
+  "[" ws (
+            value
+    ("," ws value)*
+  )? "]" ws
+
+string ::=
+  "\"" (
+    [^"\\\x7F\x00-\x1F] |
+    "\\" (["\\bfnrt] | "u" [0-9a-fA-F]{4}) # escapes
+  )* "\"" ws
+
+number ::= ("-"? ([0-9] | [1-9] [0-9]{0,15})) ("." [0-9]+)? ([eE] [-+]? [0-9] [1-9]{0,15})? ws
+
+# Optional space: by convention, applied in this grammar after literal chars when allowed
+ws ::= | " " | "\n" [ \t]{0,20}
+"""
+
+
+class GrammarCache:
+    """
+    GBNF grammars compiled from OpenAI-style `response_format` JSON
+    schemas, in an LRU keyed by a hash of the canonical schema. Agents send
+    the same few schemas over and over; only the first request of each pays
+    for the schema-to-grammar conversion. The `LlamaGrammar` objects built
+    from them are kept too (`build`), one cache per process that runs a
+    model.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.grammars: OrderedDict = OrderedDict()  # schema hash -> GBNF
+        self.built: OrderedDict = OrderedDict()     # GBNF hash -> LlamaGrammar
+        self.lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "compiles": 0, "compile_ms": 0.0}
+
+    @staticmethod
+    def schema_key(schema: dict) -> str:
+        return hashlib.sha256(json.dumps(schema, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+    def compile(self, schema: dict) -> tuple:
+        """GBNF for a JSON schema; returns (gbnf, cached, compile_ms). Raises ValueError if unsupported."""
+        from llama_cpp.llama_grammar import json_schema_to_gbnf
+
+        key = self.schema_key(schema)
+        with self.lock:
+            self.stats["lookups"] += 1
+            if key in self.grammars:
+                self.stats["hits"] += 1
+                self.grammars.move_to_end(key)
+                return self.grammars[key], True, 0.0
+        start = time.perf_counter()
+        try:
+            gbnf = json_schema_to_gbnf(json.dumps(schema))
+        except Exception as e:  # the converter raises a mix of types on schemas it can't express
+            raise ValueError(f"Unsupported JSON schema: {e}") from e
+        compile_ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.stats["compiles"] += 1
+            self.stats["compile_ms"] += compile_ms
+            self.grammars[key] = gbnf
+            while len(self.grammars) > self.max_entries:
+                self.grammars.popitem(last=False)
+        return gbnf, False, compile_ms
+
+    def for_response_format(self, response_format: Optional[dict]) -> tuple:
+        """
+        GBNF for a `response_format` ({"type": "text" | "json_object" |
+        "json_schema"}), or None for free text. Returns (gbnf, report).
+        """
+        kind = (response_format or {}).get("type", "text")
+        if kind == "text":
+            return None, None
+        if kind == "json_object" and "schema" not in response_format:
+            return JSON_GBNF, {"type": kind, "cached": True, "compile_ms": 0.0}
+        if kind == "json_object":
+            schema = response_format["schema"]  # llama-cpp-python's own extension
+        elif kind == "json_schema":
+            schema = (response_format.get("json_schema") or {}).get("schema")
+        else:
+            raise ValueError(f"Unknown response_format type '{kind}'")
+        if not isinstance(schema, dict):
+            raise ValueError("response_format needs a JSON schema object")
+        gbnf, cached, compile_ms = self.compile(schema)
+        return gbnf, {"type": kind, "cached": cached, "compile_ms": round(compile_ms, 3)}
+
+    def build(self, gbnf: str, factory: Callable):
+        """`factory(gbnf)`, e.g. a LlamaGrammar, built once per distinct grammar."""
+        key = hashlib.sha256(gbnf.encode()).hexdigest()
+        with self.lock:
+            if key in self.built:
+                self.built.move_to_end(key)
+                return self.built[key]
+        grammar = factory(gbnf)
+        with self.lock:
+            self.built[key] = grammar
+            while len(self.built) > self.max_entries:
+                self.built.popitem(last=False)
+        return grammar
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            lookups, compiles = self.stats["lookups"], self.stats["compiles"]
+            return {
+                **self.stats,
+                "compile_ms": round(self.stats["compile_ms"], 3),
+                "avg_compile_ms": round(self.stats["compile_ms"] / compiles, 3) if compiles else 0.0,
+                "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self.grammars),
+                "built_grammars": len(self.built),
+                "max_entries": self.max_entries,
+            }
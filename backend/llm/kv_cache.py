@@ -0,0 +1,194 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+import numpy as np
+
+try:
+    from llama_cpp.llama_cache import BaseLlamaCache
+except ImportError:  # the fake backend (llm/fake.py) runs without llama-cpp-python
+    class BaseLlamaCache:
+        def __init__(self, capacity_bytes: int = (2 << 30)):
+            self.capacity_bytes = capacity_bytes
+
+logger = logging.getLogger("LocalLLM")
+
+
+def prefix_hash(tokens: Sequence[int]) -> str:
+    return hashlib.sha256(np.asarray(tokens, dtype=np.int32).tobytes()).hexdigest()
+
+
+def common_prefix(a: np.ndarray, b: np.ndarray) -> int:
+    n = min(len(a), len(b))
+    if n == 0:
+        return 0
+    diff = np.flatnonzero(a[:n] != b[:n])
+    return int(diff[0]) if len(diff) else n
+
+
+class PrefixStateCache(BaseLlamaCache):
+    """
+    Prompt-prefix KV state cache for one model, plugged in with `Llama.set_cache`.
+
+    llama.cpp looks up the state whose tokens share the longest prefix with
+    a new prompt and only evaluates the remainder, so a long multi-turn chat
+    resumes from its previous turn instead of re-reading the whole history.
+    Entries are keyed by a hash of their token sequence. They are kept in a
+    RAM LRU bounded by `capacity_bytes`, and evicted entries spill to
+    `directory` (bounded by `disk_bytes`) when one is configured.
+    """
+
+    def __init__(self, capacity_bytes: int, directory: Optional[str] = None, disk_bytes: int = 0, min_prefix: int = 16):
+        super().__init__(capacity_bytes)
+        self.directory = directory
+        self.disk_bytes = disk_bytes
+        self.min_prefix = min_prefix                 # shorter matches aren't worth a state load
+        self.ram: OrderedDict = OrderedDict()        # hash -> (tokens, LlamaState)
+        self.disk: OrderedDict = OrderedDict()       # hash -> (tokens, size), oldest first
+        self.ram_size = 0
+        self.disk_size = 0
+        self.model = None
+        self.lock = threading.Lock()
+        self.stats = {"lookups": 0, "hits": 0, "disk_hits": 0, "prompt_tokens_saved": 0, "saves": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._scan_disk()
+
+    @classmethod
+    def from_env(cls, model_path: str) -> Optional["PrefixStateCache"]:
+        """Cache for `model_path` per LOCAL_LLM_KV_CACHE_* settings, or None when disabled."""
+        capacity = int(float(os.environ.get("LOCAL_LLM_KV_CACHE_MB", "2048")) * 1024 * 1024)
+        if capacity <= 0:
+            return None
+        directory = os.environ.get("LOCAL_LLM_KV_CACHE_DIR")
+        if directory:
+            # States are only valid for the exact model file they came from
+            stat = os.stat(model_path)
+            model_id = hashlib.sha256(f"{os.path.abspath(model_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+            directory = os.path.join(directory, model_id)
+        disk_bytes = int(float(os.environ.get("LOCAL_LLM_KV_CACHE_DISK_MB", "8192")) * 1024 * 1024)
+        return cls(capacity, directory, disk_bytes)
+
+    def attach(self, model) -> "PrefixStateCache":
+        self.model = model
+        model.set_cache(self)
+        return self
+
+    @property
+    def cache_size(self) -> int:
+        return self.ram_size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _scan_disk(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tokens"):
+                key = name[:-len(".tokens")]
+                if os.path.exists(self._path(key + ".state")):
+                    files.append((os.path.getmtime(self._path(key + ".state")), key))
+        for _, key in sorted(files):
+            tokens = np.fromfile(self._path(key + ".tokens"), dtype=np.int32)
+            size = os.path.getsize(self._path(key + ".state"))
+            self.disk[key] = (tokens, size)
+            self.disk_size += size
+
+    def _longest(self, tokens: np.ndarray) -> tuple:
+        best = (0, None, False)
+        for key, (stored, _) in self.ram.items():
+            n = common_prefix(stored, tokens)
+            if n > best[0]:
+                best = (n, key, False)
+        for key, (stored, _) in self.disk.items():
+            n = common_prefix(stored, tokens)
+            if n > best[0]:
+                best = (n, key, True)
+        return best
+
+    def __getitem__(self, key: Sequence[int]):
+        tokens = np.asarray(key, dtype=np.int32)
+        with self.lock:
+            self.stats["lookups"] += 1
+            matched, entry, on_disk = self._longest(tokens)
+            # The context already holding a longer prefix wins; skip the state load
+            current = common_prefix(np.asarray(self.model._input_ids, dtype=np.int32), tokens) if self.model is not None else 0
+            if entry is None or matched < self.min_prefix or matched <= current:
+                raise KeyError(key)
+
+            if on_disk:
+                with open(self._path(entry + ".state"), "rb") as f:
+                    state = pickle.load(f)
+                self.stats["disk_hits"] += 1
+                self._put_ram(entry, self.disk[entry][0], state)
+            else:
+                self.ram.move_to_end(entry)
+                state = self.ram[entry][1]
+
+            self.stats["hits"] += 1
+            self.stats["prompt_tokens_saved"] += matched - current
+            return state
+
+    def __contains__(self, key: Sequence[int]) -> bool:
+        with self.lock:
+            matched, entry, _ = self._longest(np.asarray(key, dtype=np.int32))
+            return entry is not None and matched >= self.min_prefix
+
+    def __setitem__(self, key: Sequence[int], value) -> None:
+        tokens = np.asarray(key, dtype=np.int32)
+        with self.lock:
+            self.stats["saves"] += 1
+            self._put_ram(prefix_hash(tokens), tokens, value)
+
+    def _put_ram(self, key: str, tokens: np.ndarray, state):
+        if key in self.ram:
+            self.ram_size -= self.ram.pop(key)[1].llama_state_size
+        self.ram[key] = (tokens, state)
+        self.ram_size += state.llama_state_size
+        # Keep the newest entry even if it alone is over budget
+        while self.ram_size > self.capacity_bytes and len(self.ram) > 1:
+            old_key, (old_tokens, old_state) = self.ram.popitem(last=False)
+            self.ram_size -= old_state.llama_state_size
+            self._spill(old_key, old_tokens, old_state)
+
+    def _spill(self, key: str, tokens: np.ndarray, state):
+        if not self.directory or key in self.disk:
+            return
+        try:
+            tmp = self._path(f"{key}.state.{os.getpid()}.tmp")  # worker processes may share the directory
+            with open(tmp, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key + ".state"))
+            tokens.tofile(self._path(key + ".tokens"))
+        except OSError as e:
+            logger.error(f"KV cache spill failed: {e}")
+            return
+        size = os.path.getsize(self._path(key + ".state"))
+        self.disk[key] = (tokens, size)
+        self.disk_size += size
+        while self.disk_size > self.disk_bytes and len(self.disk) > 1:
+            old_key, (_, old_size) = self.disk.popitem(last=False)
+            self.disk_size -= old_size
+            for suffix in (".state", ".tokens"):
+                try:
+                    os.remove(self._path(old_key + suffix))
+                except OSError:
+                    pass
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            lookups = self.stats["lookups"]
+            return {
+                **self.stats,
+                "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "ram_entries": len(self.ram),
+                "ram_bytes": self.ram_size,
+                "ram_capacity_bytes": self.capacity_bytes,
+                "disk_entries": len(self.disk),
+                "disk_bytes": self.disk_size,
+                "directory": self.directory,
+            }
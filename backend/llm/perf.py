@@ -0,0 +1,26 @@
+def reset_perf(model):
+    if hasattr(model, "perf_context"):  # llm.fake.FakeLlama keeps its own counters
+        return model.perf_context_reset()
+    try:
+        import llama_cpp
+        llama_cpp.llama_perf_context_reset(model._ctx.ctx)
+    except Exception:
+        pass
+
+
+def read_perf(model) -> dict:
+    """Prompt-eval / generation timings from llama.cpp's own counters, if exposed."""
+    try:
+        if hasattr(model, "perf_context"):
+            data = model.perf_context()
+        else:
+            import llama_cpp
+            data = llama_cpp.llama_perf_context(model._ctx.ctx)
+        return {
+            "prompt_eval_ms": round(data.t_p_eval_ms, 3),
+            "generation_ms": round(data.t_eval_ms, 3),
+            "prompt_tokens_evaluated": data.n_p_eval,
+            "generated_tokens": data.n_eval,
+        }
+    except Exception:
+        return {}
@@ -0,0 +1,328 @@
+import gc
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+logger = logging.getLogger("LocalLLM")
+
+# Names that mean "whichever model was used last" (the OpenAI default the UI sends)
+DEFAULT_NAMES = ("", "local-model")
+READAHEAD_CHUNK = 64 * 1024 * 1024
+
+
+class LoadJob:
+    """A queued or running model load, polled through /v1/models/load/{id}."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, path: str, n_ctx: int, n_gpu_layers: int, options: dict):
+        self.id = f"load-{next(LoadJob._ids)}"
+        self.path = path
+        self.n_ctx = n_ctx
+        self.n_gpu_layers = n_gpu_layers
+        self.options = options
+        self.status = "queued"    # queued -> loading -> loaded | failed
+        self.phase: Optional[str] = None
+        self.progress = 0.0
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+        self.done = threading.Event()
+
+    def _finish(self, status: str, error: Optional[str] = None):
+        self.status = status
+        self.error = error
+        self.finished = time.time()
+        self.done.set()
+
+    def snapshot(self) -> dict:
+        return {
+            "id": self.id,
+            "path": self.path,
+            "status": self.status,
+            "phase": self.phase,
+            "progress": round(self.progress, 3),
+            "error": self.error,
+            "elapsed_s": round((self.finished or time.time()) - self.created, 2),
+        }
+
+
+class ResidentModel:
+    """A loaded model and what it costs to keep around."""
+
+    def __init__(self, path: str, model, kv_cache, size_bytes: int, n_ctx: int, n_gpu_layers: int, options: dict):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.model = model            # None in worker-pool mode; the workers hold it
+        self.kv_cache = kv_cache
+        self.size_bytes = size_bytes
+        self.n_ctx = n_ctx
+        self.n_gpu_layers = n_gpu_layers
+        self.options = options        # extra load settings passed to open_model
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.requests = 0
+
+    def matches(self, name: str) -> bool:
+        return name in (self.path, self.name, os.path.splitext(self.name)[0]) or os.path.abspath(name) == self.path
+
+    @property
+    def embedding(self) -> bool:
+        """Loaded as an embedding model (an `Embedder`), not for chat."""
+        return bool(self.options.get("embedding"))
+
+    @property
+    def draft(self):
+        """The speculative-decoding draft counter, if this model was loaded with one."""
+        draft = getattr(self.model, "draft_model", None)
+        return draft if hasattr(draft, "request_stats") else None
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "path": self.path,
+            "size_mb": round(self.size_bytes / (1024 * 1024), 1),
+            "n_ctx": self.n_ctx,
+            "n_gpu_layers": self.n_gpu_layers,
+            "options": self.options,
+            "speculative": self.draft.snapshot() if self.draft else None,
+            "embeddings": self.model.snapshot() if self.embedding else None,
+            "requests": self.requests,
+            "idle_s": round(time.time() - self.last_used, 1),
+        }
+
+
+class ModelRegistry:
+    """
+    Keeps several models resident within a RAM budget, evicting the least
+    recently used one to make room for a new load.
+
+    Loads run as `LoadJob`s on a background loader thread, so requests to
+    models that are already resident keep being served meanwhile. The file
+    is first read ahead into the page cache with progress (llama.cpp then
+    maps it without waiting on the disk again), then `open_model(path,
+    n_ctx, n_gpu_layers, **options)` builds the model and returns
+    `(model, kv_cache)`.
+    Before a load only what the budget strictly needs is evicted, so a load
+    that fails costs no resident models. An evicted model is dropped from
+    the registry; a generation still using it keeps its reference until it
+    finishes.
+    """
+
+    def __init__(self, open_model: Callable, budget_bytes: int, max_models: int = 0, estimate: Optional[Callable] = None):
+        self.open_model = open_model
+        self.estimator = estimate  # (path, n_ctx, n_gpu_layers) -> RAM bytes or None
+        self.budget_bytes = budget_bytes
+        self.max_models = max_models  # chat models; 0 = only the budget limits residency
+        self.models: OrderedDict = OrderedDict()  # path -> ResidentModel, least recently used first
+        self.jobs: OrderedDict = OrderedDict()    # id -> LoadJob, newest last
+        self.loading: dict = {}                   # path -> LoadJob not yet finished
+        self.lock = threading.Lock()
+        self.queue: queue.Queue = queue.Queue()
+        self.thread: Optional[threading.Thread] = None
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, open_model: Callable, max_models: int = 0, estimate: Optional[Callable] = None) -> "ModelRegistry":
+        """Registry per LOCAL_LLM_MEMORY_BUDGET_MB (default: half the physical RAM) and LOCAL_LLM_MAX_MODELS."""
+        budget_mb = float(os.environ.get("LOCAL_LLM_MEMORY_BUDGET_MB", "0"))
+        if budget_mb > 0:
+            budget = int(budget_mb * 1024 * 1024)
+        else:
+            try:
+                import psutil
+                budget = psutil.virtual_memory().total // 2
+            except ImportError:
+                budget = 8 * 1024 ** 3
+        return cls(open_model, budget, max_models or int(os.environ.get("LOCAL_LLM_MAX_MODELS", "0")), estimate)
+
+    def estimate(self, path: str, n_ctx: int, n_gpu_layers: int) -> int:
+        """RAM bytes a resident copy of `path` is expected to take (the file size if unknown)."""
+        estimate = self.estimator(path, n_ctx, n_gpu_layers) if self.estimator else None
+        return estimate if estimate is not None else os.path.getsize(path)
+
+    def used_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in self.models.values())
+
+    # --- lookup ---
+
+    def get(self, name: Optional[str] = None, embedding: bool = False) -> Optional[ResidentModel]:
+        """
+        Resident model called `name` (path, file name or stem), or by default
+        the last used chat model (embedding model with `embedding`).
+        """
+        with self.lock:
+            entry = self._find(name, embedding)
+            if entry:
+                self.models.move_to_end(entry.path)
+                entry.last_used = time.time()
+                entry.requests += 1
+            return entry
+
+    def peek(self, name: Optional[str] = None, embedding: bool = False) -> Optional[ResidentModel]:
+        """Like `get`, without counting as a use."""
+        with self.lock:
+            return self._find(name, embedding)
+
+    def _find(self, name: Optional[str], embedding: bool = False) -> Optional[ResidentModel]:
+        if name is None or name in DEFAULT_NAMES:
+            return next((entry for entry in reversed(self.models.values()) if entry.embedding == embedding), None)
+        return next((entry for entry in self.models.values() if entry.matches(name)), None)
+
+    def resident(self) -> list:
+        """Resident models, most recently used first."""
+        with self.lock:
+            return list(reversed(self.models.values()))
+
+    def loading_job(self, name: Optional[str] = None) -> Optional[LoadJob]:
+        """The unfinished load of `name` (any one by default), if there is one."""
+        with self.lock:
+            for path, job in self.loading.items():
+                if name is None or name in DEFAULT_NAMES or name in (path, os.path.basename(path), os.path.splitext(os.path.basename(path))[0]):
+                    return job
+        return None
+
+    # --- loading ---
+
+    def submit(self, path: str, n_ctx: int = 4096, n_gpu_layers: int = -1, options: Optional[dict] = None) -> Optional[LoadJob]:
+        """
+        Queue a load of `path` and return its job. Returns the running job
+        if one is already loading it, or None when it is already resident
+        with the same settings.
+        """
+        path = os.path.abspath(path)
+        options = options or {}
+        with self.lock:
+            entry = self.models.get(path)
+            if entry and (entry.n_ctx, entry.n_gpu_layers, entry.options) == (n_ctx, n_gpu_layers, options):
+                self.models.move_to_end(path)
+                return None
+            if path in self.loading:
+                return self.loading[path]
+            job = LoadJob(path, n_ctx, n_gpu_layers, options)
+            self.loading[path] = job
+            self.jobs[job.id] = job
+            while len(self.jobs) > 50:
+                self.jobs.popitem(last=False)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loader, name="llm-loader", daemon=True)
+                self.thread.start()
+        self.queue.put(job)
+        return job
+
+    def _loader(self):
+        while True:
+            job = self.queue.get()
+            try:
+                self._load(job)
+                status, error = "loaded", None
+                logger.info(f"Model loaded: {job.path}")
+            except Exception as e:
+                logger.error(f"Failed to load model {job.path}: {e}")
+                status, error = "failed", str(e)
+            # No longer "loading" by the time waiters wake up
+            with self.lock:
+                self.loading.pop(job.path, None)
+            job._finish(status, error)
+
+    def _load(self, job: LoadJob):
+        job.status = "loading"
+        size = self.estimate(job.path, job.n_ctx, job.n_gpu_layers)
+        with self.lock:
+            # Only make room the memory strictly needs: if the load fails, nothing else should be lost.
+            # A resident copy of the same file keeps serving until its replacement is open.
+            self._evict_for(size, job.options.get("embedding", False), keep=job.path, memory_only=True)
+        gc.collect()
+
+        job.phase = "reading"
+        self._read(job)
+        job.phase = "initializing"
+        model, kv_cache = self.open_model(job.path, job.n_ctx, job.n_gpu_layers, **job.options)
+        with self.lock:
+            # Reloading with other settings replaces the resident copy
+            self.models.pop(job.path, None)
+            self._evict_for(size, job.options.get("embedding", False))  # another load may have finished meanwhile
+            self.models[job.path] = ResidentModel(job.path, model, kv_cache, size, job.n_ctx, job.n_gpu_layers, job.options)
+        job.progress = 1.0
+        job.phase = None
+
+    def _read(self, job: LoadJob):
+        """
+        Have the kernel read the file ahead into the page cache, a chunk at a
+        time for progress, unless it wouldn't fit. posix_fadvise copies nothing
+        into this process; where it's missing (Windows, macOS) llama.cpp's mmap
+        pages the file in on demand instead.
+        """
+        if not hasattr(os, "posix_fadvise"):
+            return
+        total = os.path.getsize(job.path)
+        try:
+            import psutil
+            if psutil.virtual_memory().available < total:
+                return
+        except ImportError:
+            pass
+        fd = os.open(job.path, os.O_RDONLY)
+        try:
+            for offset in range(0, total, READAHEAD_CHUNK):
+                length = min(READAHEAD_CHUNK, total - offset)
+                os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+                # Readahead is most of the wall time of a cold load; keep 10% for model setup
+                job.progress = 0.9 * (offset + length) / total
+        finally:
+            os.close(fd)
+
+    def _evict_for(self, size: int, embedding: bool = False, keep: Optional[str] = None, memory_only: bool = False):
+        """
+        Drop least recently used models until `size` more bytes fit, and a
+        chat model until there's room under `max_models` (unless
+        `memory_only`). Embedding models only count against the budget.
+        `keep` is about to be replaced: it isn't evicted and its bytes count
+        as free. Caller holds the lock.
+        """
+        replaced = self.models[keep].size_bytes if keep in self.models else 0
+        while True:
+            candidates = [path for path in self.models if path != keep]
+            if not candidates:
+                break
+            chat = [path for path in candidates if not self.models[path].embedding]
+            if self.used_bytes() - replaced + size > self.budget_bytes:
+                path = candidates[0]
+            elif not memory_only and self.max_models and not embedding and len(chat) >= self.max_models:
+                path = chat[0]
+            else:
+                break
+            entry = self.models.pop(path)
+            self.evictions += 1
+            logger.info(f"Evicting {entry.name} ({entry.size_bytes // (1024 * 1024)} MB) to make room")
+
+    # --- unloading ---
+
+    def unload(self, name: Optional[str] = None) -> list:
+        """Unload the model called `name`, or every model when it is None. Returns the unloaded paths."""
+        with self.lock:
+            if name is None:
+                paths = list(self.models)
+            else:
+                entry = self._find(name)
+                paths = [entry.path] if entry else []
+            for path in paths:
+                del self.models[path]
+        gc.collect()
+        return paths
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "budget_mb": round(self.budget_bytes / (1024 * 1024), 1),
+                "used_mb": round(self.used_bytes() / (1024 * 1024), 1),
+                "max_models": self.max_models,
+                "evictions": self.evictions,
+                "resident": [entry.snapshot() for entry in reversed(self.models.values())],
+                "loading": [job.snapshot() for job in self.loading.values()],
+            }
@@ -0,0 +1,266 @@
+import asyncio
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger("LocalLLM")
+
+# Priority lanes, highest first; control jobs (model load/unload) skip the depth limit
+LANES = ("control", "interactive", "background")
+_DONE = object()
+
+
+class QueueFull(Exception):
+    """The job queue is at its configured depth."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class JobCancelled(Exception):
+    """The client went away before the job finished."""
+
+
+class Job:
+    """One unit of model work, executed on one of the scheduler's worker threads."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, fn: Callable, lane: str, stream: bool, loop: asyncio.AbstractEventLoop):
+        self.id = next(Job._ids)
+        self.fn = fn
+        self.lane = lane
+        self.stream = stream
+        self.loop = loop
+        self.cancelled = threading.Event()
+        self.future: asyncio.Future = loop.create_future()
+        self.chunks: asyncio.Queue = asyncio.Queue()
+        self.perf: dict = {}      # llama.cpp counters the job function may fill in
+        self.worker: Optional[int] = None  # index of the worker thread running it
+        self.timings: dict = {}
+        self.created = time.perf_counter()
+        self.started: Optional[float] = None
+        self.first_output: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _finish(self, status: str) -> dict:
+        self.finished = time.perf_counter()
+
+        def ms(a, b):
+            return round((b - a) * 1000, 3) if a is not None and b is not None else None
+
+        self.timings = {
+            "queue_wait_ms": ms(self.created, self.started),
+            "prompt_eval_ms": ms(self.started, self.first_output),
+            "generation_ms": ms(self.first_output, self.finished),
+            "total_ms": ms(self.created, self.finished),
+        }
+        # Engine counters are more precise than wall-clock splits
+        self.timings.update(self.perf)
+        return {"id": self.id, "lane": self.lane, "worker": self.worker, "status": status, **self.timings}
+
+
+class InferenceScheduler:
+    """
+    Runs model work on `workers` dedicated threads (one per model instance,
+    normally just one), so the event loop only ever awaits it.
+
+    Jobs wait in priority lanes (control, then interactive, then background,
+    with background jobs promoted once they have waited `starvation_s`). The
+    queue is bounded; `submit` raises `QueueFull` with a Retry-After
+    estimate instead of letting requests pile up. Results come back to the
+    event loop through an asyncio future (or a chunk queue when streaming),
+    and a job whose client disconnects is dropped or stopped early.
+
+    Control jobs run exclusively: once one is queued no new job starts, and
+    it runs when every worker has gone idle. `job.worker` tells the job
+    function which worker's model it may use.
+    """
+
+    def __init__(self, max_depth: int = 16, starvation_s: float = 30.0, workers: int = 1):
+        self.max_depth = max_depth
+        self.starvation_s = starvation_s
+        self.workers = max(1, workers)
+        self.lanes = {lane: deque() for lane in LANES}
+        self.cond = threading.Condition()
+        self.running: dict = {}   # worker index -> Job
+        self.threads: list = []
+        self.counts = {"completed": 0, "failed": 0, "cancelled": 0, "rejected": 0}
+        self.recent = deque(maxlen=50)
+        self.avg_job_s = 5.0  # running estimate used for Retry-After
+
+    def start(self):
+        if self.threads:
+            return
+        for worker in range(self.workers):
+            name = "llm-inference" if self.workers == 1 else f"llm-inference-{worker}"
+            thread = threading.Thread(target=self._run, args=(worker,), name=name, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def depth(self) -> int:
+        return sum(len(q) for q in self.lanes.values())
+
+    def retry_after(self) -> int:
+        with self.cond:
+            busy = self.depth() + len(self.running)
+        return max(1, math.ceil(self.avg_job_s * busy / self.workers))
+
+    def submit(self, fn: Callable, lane: str = "interactive", stream: bool = False) -> Job:
+        """
+        Queue `fn(job)` for the worker thread. It returns the result, or an
+        iterator of chunks when `stream` is set.
+        """
+        lane = lane if lane in self.lanes else "interactive"
+        job = Job(fn, lane, stream, asyncio.get_running_loop())
+        with self.cond:
+            if lane != "control" and self.depth() >= self.max_depth:
+                self.counts["rejected"] += 1
+                raise QueueFull(self.retry_after())
+            self.lanes[lane].append(job)
+            self.cond.notify_all()
+        return job
+
+    async def result(self, job: Job, request=None, poll: float = 0.25):
+        """Await a non-streaming job, cancelling it if the client disconnects."""
+        try:
+            while True:
+                try:
+                    return await asyncio.wait_for(asyncio.shield(job.future), poll)
+                except asyncio.TimeoutError:
+                    if request is not None and await request.is_disconnected():
+                        job.cancel()
+                        raise JobCancelled()
+        except asyncio.CancelledError:
+            job.cancel()
+            raise
+
+    async def stream(self, job: Job):
+        """Async iterator over a streaming job's chunks."""
+        try:
+            while True:
+                item = await job.chunks.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            # No-op once finished; otherwise the consumer went away
+            job.cancel()
+
+    def _next(self, worker: int) -> Job:
+        with self.cond:
+            while True:
+                background = self.lanes["background"]
+                exclusive = any(job.lane == "control" for job in self.running.values())
+                if self.lanes["control"] or exclusive:
+                    # Drain the other workers first, then run it alone
+                    if exclusive or self.running:
+                        self.cond.wait()
+                        continue
+                    job = self.lanes["control"].popleft()
+                elif background and time.perf_counter() - background[0].created > self.starvation_s:
+                    job = background.popleft()
+                elif self.lanes["interactive"]:
+                    job = self.lanes["interactive"].popleft()
+                elif background:
+                    job = background.popleft()
+                else:
+                    self.cond.wait()
+                    continue
+
+                if job.cancelled.is_set():
+                    self._record(job, "cancelled")
+                    self._deliver(job, error=JobCancelled())
+                    continue
+                job.worker = worker
+                self.running[worker] = job
+                return job
+
+    def _run(self, worker: int):
+        while True:
+            job = self._next(worker)
+            job.started = time.perf_counter()
+            status, result, error = "completed", None, None
+            try:
+                result = job.fn(job)
+                if job.stream:
+                    for chunk in result:
+                        if job.first_output is None:
+                            job.first_output = time.perf_counter()
+                        if job.cancelled.is_set():
+                            result.close()
+                            raise JobCancelled()
+                        self._emit(job, chunk)
+            except JobCancelled as e:
+                status, error = "cancelled", e
+            except Exception as e:
+                status, error = "failed", e
+                logger.error(f"Inference job {job.id} failed: {e}")
+
+            with self.cond:
+                del self.running[worker]
+                self._record(job, status)
+                self.cond.notify_all()
+            self._deliver(job, result, error)
+
+    def _record(self, job: Job, status: str):
+        entry = job._finish(status)
+        self.counts[status] += 1
+        self.recent.append(entry)
+        if status == "completed" and entry["total_ms"] is not None:
+            run_s = (entry["total_ms"] - (entry["queue_wait_ms"] or 0)) / 1000
+            self.avg_job_s = 0.8 * self.avg_job_s + 0.2 * run_s
+
+    def _emit(self, job: Job, item):
+        try:
+            job.loop.call_soon_threadsafe(job.chunks.put_nowait, item)
+        except RuntimeError:
+            job.cancel()  # event loop closed
+
+    def _deliver(self, job: Job, result=None, error: Optional[BaseException] = None):
+        if job.stream:
+            self._emit(job, error if error is not None else _DONE)
+            return
+
+        def settle():
+            if job.future.done():
+                return
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+        try:
+            job.loop.call_soon_threadsafe(settle)
+        except RuntimeError:
+            pass
+
+    def snapshot(self) -> dict:
+        with self.cond:
+            return {
+                "queued": {lane: len(q) for lane, q in self.lanes.items()},
+                "max_depth": self.max_depth,
+                "workers": self.workers,
+                "running": [
+                    {
+                        "id": job.id,
+                        "lane": job.lane,
+                        "worker": worker,
+                        "elapsed_ms": round((time.perf_counter() - job.started) * 1000, 1) if job.started else 0,
+                    }
+                    for worker, job in sorted(self.running.items())
+                ],
+                **self.counts,
+                "avg_job_ms": round(self.avg_job_s * 1000, 1),
+                "recent": list(self.recent)[-10:],
+            }
@@ -0,0 +1,116 @@
+from typing import Optional
+
+import numpy as np
+
+try:
+    from llama_cpp.llama_speculative import LlamaDraftModel
+except ImportError:  # the fake backend (llm/fake.py) runs without llama-cpp-python
+    LlamaDraftModel = object
+
+from llm.kv_cache import common_prefix
+
+# Values accepted for ModelLoadRequest.speculative
+MODES = ("prompt_lookup", "draft")
+
+
+class GGUFDraft(LlamaDraftModel):
+    """
+    Drafts tokens greedily with a small GGUF model that shares the target's
+    vocabulary. Its context follows the target's tokens, so each call only
+    evaluates what changed since the last one (the accepted tokens and the
+    target's correction) before drafting.
+    """
+
+    def __init__(self, path: str, num_pred_tokens: int = 8, n_ctx: int = 4096, n_gpu_layers: int = 0):
+        from llama_cpp import Llama
+
+        self.model = Llama(model_path=path, n_ctx=n_ctx, n_gpu_layers=n_gpu_layers, verbose=False)
+        self.path = path
+        self.num_pred_tokens = num_pred_tokens
+
+    def _next_token(self) -> int:
+        m = self.model
+        logits = np.ctypeslib.as_array(m._ctx.get_logits(), shape=(m.n_vocab(),))
+        return int(np.argmax(logits))
+
+    def __call__(self, input_ids, /, **kwargs):
+        m = self.model
+        input_ids = np.asarray(input_ids, dtype=np.intc)
+        # Keep the shared prefix; always re-evaluate at least the last token for fresh logits
+        keep = min(common_prefix(m.input_ids[:m.n_tokens], input_ids), len(input_ids) - 1)
+        m.n_tokens = keep  # eval() drops the KV cache beyond n_tokens
+        m.eval(input_ids[keep:].tolist())
+
+        draft = []
+        room = m.n_ctx() - m.n_tokens
+        for i in range(min(self.num_pred_tokens, room)):
+            token = self._next_token()
+            draft.append(token)
+            if i + 1 < min(self.num_pred_tokens, room):
+                m.eval([token])
+        return np.array(draft, dtype=np.intc)
+
+
+class SpeculationCounter(LlamaDraftModel):
+    """
+    Wraps a draft model and counts how many drafted tokens the target
+    accepts. llama-cpp-python calls the draft model with the target's
+    tokens so far; after a verification step those are the previous input,
+    the accepted prefix of the previous draft and one token sampled by the
+    target, so the accepted count is the overlap of the draft with what
+    follows the previous input.
+    """
+
+    def __init__(self, inner: LlamaDraftModel, mode: str):
+        self.inner = inner
+        self.mode = mode
+        self.totals = {"proposed": 0, "accepted": 0, "requests": 0}
+        self.counts = {"proposed": 0, "accepted": 0}
+        self.last: Optional[tuple] = None
+
+    def begin(self):
+        """Start counting for a new request."""
+        self.counts = {"proposed": 0, "accepted": 0}
+        self.last = None
+        self.totals["requests"] += 1
+
+    def __call__(self, input_ids, /, **kwargs):
+        input_ids = np.asarray(input_ids, dtype=np.intc)
+        if self.last is not None:
+            start, draft = self.last
+            if len(draft) and len(input_ids) > start:
+                accepted = common_prefix(draft, input_ids[start:start + len(draft)])
+                for counts in (self.counts, self.totals):
+                    counts["proposed"] += len(draft)
+                    counts["accepted"] += accepted
+        draft = np.asarray(self.inner(input_ids, **kwargs), dtype=np.intc)
+        self.last = (len(input_ids), draft)
+        return draft
+
+    @staticmethod
+    def _rate(counts: dict) -> float:
+        return round(counts["accepted"] / counts["proposed"], 3) if counts["proposed"] else 0.0
+
+    def request_stats(self) -> dict:
+        """Counts since `begin`; the final draft of a request is never verified and isn't counted."""
+        return {"mode": self.mode, **self.counts, "acceptance_rate": self._rate(self.counts)}
+
+    def snapshot(self) -> dict:
+        return {"mode": self.mode, **self.totals, "acceptance_rate": self._rate(self.totals)}
+
+
+def make_draft(mode: Optional[str], draft_model: Optional[str] = None, draft_tokens: int = 8,
+               n_ctx: int = 4096, n_gpu_layers: int = 0) -> Optional[SpeculationCounter]:
+    """The draft model for a load's `speculative` setting, or None for plain decoding."""
+    if not mode:
+        return None
+    if mode == "prompt_lookup":
+        from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+
+        # Copies continuations of n-grams already in the prompt: free, and strong for edits/summaries
+        return SpeculationCounter(LlamaPromptLookupDecoding(num_pred_tokens=draft_tokens), mode)
+    if mode == "draft":
+        if not draft_model:
+            raise ValueError("speculative='draft' needs a draft_model GGUF path")
+        return SpeculationCounter(GGUFDraft(draft_model, draft_tokens, n_ctx, n_gpu_layers), mode)
+    raise ValueError(f"Unknown speculative mode '{mode}', expected one of {MODES}")
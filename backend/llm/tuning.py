@@ -0,0 +1,224 @@
+"""
+n_threads / n_batch auto-tuning per model file and machine.
+
+Also a CLI, run from backend/:
+
+    python -m llm.tuning local_models/x.gguf [--threads 4 8 16] [--batches 256 512] [--n-ctx 2048]
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import platform
+import threading
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger("LocalLLM")
+
+FINGERPRINT_BYTES = 1024 * 1024
+
+
+def cpu_signature() -> str:
+    """Short, stable id of this CPU model and core count."""
+    name = platform.processor() or platform.machine()
+    try:
+        with open("/proc/cpuinfo") as f:
+            name = next((line.split(":", 1)[1].strip() for line in f if line.startswith("model name")), name)
+    except OSError:
+        pass
+    description = f"{name}|{os.cpu_count()}|{platform.system()}"
+    return hashlib.sha256(description.encode()).hexdigest()[:16]
+
+
+def model_fingerprint(path: str) -> str:
+    """
+    Content id of a model file: its size plus the first and last MB. Hashing
+    the whole multi-GB file on every load would cost more than the tuning
+    saves, and these bytes (header + final tensors) differ between any two
+    real GGUF files.
+    """
+    digest = hashlib.sha256(str(os.path.getsize(path)).encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_BYTES))
+        f.seek(max(0, os.path.getsize(path) - FINGERPRINT_BYTES))
+        digest.update(f.read(FINGERPRINT_BYTES))
+    return digest.hexdigest()[:32]
+
+
+def default_grid(n_ctx: int) -> tuple:
+    cpus = os.cpu_count() or 1
+    threads = sorted({max(1, cpus // 4), max(1, cpus // 2), max(1, cpus * 3 // 4), cpus})
+    batches = [b for b in (128, 256, 512, 1024) if b <= n_ctx] or [n_ctx]
+    return threads, batches
+
+
+class TuningStore:
+    """Best settings per (model fingerprint, CPU signature), kept in a JSON file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.fingerprints: dict = {}  # (path, mtime_ns, size) -> fingerprint
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def key(self, model_path: str) -> str:
+        stat = os.stat(model_path)
+        cache_key = (os.path.abspath(model_path), stat.st_mtime_ns, stat.st_size)
+        if cache_key not in self.fingerprints:
+            self.fingerprints[cache_key] = model_fingerprint(model_path)
+        return f"{self.fingerprints[cache_key]}:{cpu_signature()}"
+
+    def get(self, model_path: str) -> Optional[dict]:
+        try:
+            key = self.key(model_path)
+        except OSError:
+            return None
+        with self.lock:
+            return self._read().get(key)
+
+    def put(self, model_path: str, best: dict):
+        key = self.key(model_path)
+        with self.lock:
+            data = self._read()
+            data[key] = best
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.path)
+
+
+class TuneJob:
+    """A tuning run, polled through /v1/models/tune/{id}."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, path: str, threads: List[int], batches: List[int]):
+        self.id = f"tune-{next(TuneJob._ids)}"
+        self.path = path
+        self.threads = threads
+        self.batches = batches
+        self.status = "queued"  # queued -> running -> completed | failed
+        self.results: list = []
+        self.best: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.finished: Optional[float] = None
+
+    def snapshot(self) -> dict:
+        return {
+            "id": self.id,
+            "path": self.path,
+            "status": self.status,
+            "progress": round(len(self.results) / (len(self.threads) * len(self.batches)), 3),
+            "results": self.results,
+            "best": self.best,
+            "error": self.error,
+            "elapsed_s": round((self.finished or time.time()) - self.created, 1),
+        }
+
+
+def measure(path: str, n_threads: int, n_batch: int, n_ctx: int, n_gpu_layers: int, prompt_tokens: int, gen_tokens: int) -> dict:
+    """Prompt-eval and generation speed of one setting, on a synthetic prompt."""
+    from llama_cpp import Llama
+
+    model = Llama(
+        model_path=path, n_ctx=n_ctx, n_gpu_layers=n_gpu_layers, n_batch=n_batch,
+        n_threads=n_threads, n_threads_batch=n_threads, verbose=False,
+    )
+    try:
+        prompt = model.tokenize(b" the quick brown fox jumps over the lazy dog" * (prompt_tokens // 8 + 1))[:prompt_tokens]
+        model.eval(prompt[:8])  # warm-up: first-touch of weights and buffers
+        model.reset()
+
+        start = time.perf_counter()
+        model.eval(prompt)
+        prompt_s = time.perf_counter() - start
+
+        # Generation speed is one-token decodes; the token itself doesn't matter
+        start = time.perf_counter()
+        for _ in range(gen_tokens):
+            model.eval([prompt[-1]])
+        gen_s = time.perf_counter() - start
+    finally:
+        del model
+    return {
+        "n_threads": n_threads,
+        "n_batch": n_batch,
+        "prompt_tps": round(len(prompt) / prompt_s, 1),
+        "gen_tps": round(gen_tokens / gen_s, 1),
+    }
+
+
+def tune(job: TuneJob, n_ctx: int = 2048, n_gpu_layers: int = 0, prompt_tokens: int = 512, gen_tokens: int = 32,
+         on_result: Optional[Callable] = None) -> dict:
+    """
+    Benchmark every (n_threads, n_batch) pair of the job's grid and return
+    the best setting. Prompt eval depends on the batch threads and batch
+    size while generation only on the decode threads, so the two are
+    chosen separately: n_threads_batch / n_batch from the fastest prompt
+    eval, n_threads from the fastest generation.
+    """
+    job.status = "running"
+    prompt_tokens = min(prompt_tokens, n_ctx - gen_tokens - 8)
+    try:
+        for n_threads, n_batch in itertools.product(job.threads, job.batches):
+            result = measure(job.path, n_threads, n_batch, n_ctx, n_gpu_layers, prompt_tokens, gen_tokens)
+            job.results.append(result)
+            if on_result:
+                on_result(result)
+        prompt_best = max(job.results, key=lambda r: r["prompt_tps"])
+        gen_best = max(job.results, key=lambda r: r["gen_tps"])
+        job.best = {
+            "n_threads": gen_best["n_threads"],
+            "n_threads_batch": prompt_best["n_threads"],
+            "n_batch": prompt_best["n_batch"],
+            "prompt_tps": prompt_best["prompt_tps"],
+            "gen_tps": gen_best["gen_tps"],
+            "model": os.path.basename(job.path),
+            "cpu": cpu_signature(),
+            "n_gpu_layers": n_gpu_layers,
+            "tuned_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        job.status = "completed"
+        return job.best
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+        raise
+    finally:
+        job.finished = time.time()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the fastest n_threads / n_batch for a GGUF model on this machine")
+    parser.add_argument("model", help="GGUF file")
+    parser.add_argument("--threads", type=int, nargs="+")
+    parser.add_argument("--batches", type=int, nargs="+")
+    parser.add_argument("--n-ctx", type=int, default=2048)
+    parser.add_argument("--n-gpu-layers", type=int, default=0)
+    parser.add_argument("--prompt-tokens", type=int, default=512)
+    parser.add_argument("--gen-tokens", type=int, default=32)
+    parser.add_argument("--store", default=os.path.join("local_models", ".tuning.json"), help="where the server reads tuned settings")
+    parser.add_argument("--dry-run", action="store_true", help="print the result without saving it")
+    args = parser.parse_args()
+
+    threads, batches = default_grid(args.n_ctx)
+    job = TuneJob(args.model, args.threads or threads, args.batches or batches)
+    print(f"\n{'threads':>7} {'batch':>6} {'prompt tok/s':>13} {'gen tok/s':>10}")
+    best = tune(job, args.n_ctx, args.n_gpu_layers, args.prompt_tokens, args.gen_tokens,
+                on_result=lambda r: print(f"{r['n_threads']:>7} {r['n_batch']:>6} {r['prompt_tps']:>13} {r['gen_tps']:>10}", flush=True))
+    print(f"\nBest: n_threads={best['n_threads']} n_threads_batch={best['n_threads_batch']} n_batch={best['n_batch']}")
+    if not args.dry_run:
+        TuningStore(args.store).put(args.model, best)
+        print(f"Saved to {args.store}")
+    print()
@@ -0,0 +1,233 @@
+import logging
+import multiprocessing
+import os
+import threading
+from typing import Optional
+
+from llm.scheduler import JobCancelled
+
+logger = logging.getLogger("LocalLLM")
+
+# Messages a worker process sends back; every request ends with a terminal one
+_TERMINAL = ("result", "done", "error")
+
+
+def _worker_main(conn, n_threads: int):
+    """Worker process loop: owns one `Llama` and serves requests from the pipe."""
+    if os.environ.get("LOCAL_LLM_FAKE_BACKEND"):
+        from llm.fake import FakeLlama as Llama, LlamaGrammar, StoppingCriteriaList
+    else:
+        from llama_cpp import Llama, StoppingCriteriaList
+        from llama_cpp.llama_grammar import LlamaGrammar
+    from llm.grammar import GrammarCache
+    from llm.kv_cache import PrefixStateCache
+    from llm.perf import reset_perf, read_perf
+    from llm.speculative import make_draft
+
+    model = None
+    kv_cache = None
+    draft = None
+    grammars = GrammarCache()  # LlamaGrammar objects built in this process
+
+    def cancelled(tokens, logits):
+        # The parent only ever writes "cancel" while a generation is running
+        return conn.poll() and conn.recv() == "cancel"
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message == "cancel":
+            continue  # arrived after the generation it was meant for had finished
+        op, args = message
+        try:
+            if op == "load":
+                model = kv_cache = draft = None
+                draft = make_draft(**args["draft"], n_ctx=args["n_ctx"], n_gpu_layers=args["n_gpu_layers"])
+                model = Llama(model_path=args["path"], n_ctx=args["n_ctx"], n_gpu_layers=args["n_gpu_layers"],
+                              n_batch=args["n_batch"], n_threads=n_threads, use_mmap=True, draft_model=draft, verbose=False)
+                kv_cache = PrefixStateCache.from_env(args["path"])
+                if kv_cache:
+                    kv_cache.attach(model)
+                conn.send(("result", os.getpid()))
+            elif op == "unload":
+                model = kv_cache = draft = None
+                conn.send(("result", None))
+            elif op == "chat":
+                if model is None:
+                    raise RuntimeError("No model loaded in worker")
+                params = dict(args, stopping_criteria=StoppingCriteriaList([cancelled]))
+                if params.get("grammar"):
+                    params["grammar"] = grammars.build(params["grammar"], lambda text: LlamaGrammar.from_string(text, verbose=False))
+                reset_perf(model)
+                if draft:
+                    draft.begin()
+
+                def perf():
+                    data = read_perf(model)
+                    if draft:
+                        data["speculative"] = draft.request_stats()
+                    return data
+
+                if params.get("stream"):
+                    for chunk in model.create_chat_completion(**params):
+                        conn.send(("chunk", chunk))
+                    conn.send(("done", perf(), kv_cache.snapshot() if kv_cache else None))
+                else:
+                    response = model.create_chat_completion(**params)
+                    conn.send(("result", response, perf(), kv_cache.snapshot() if kv_cache else None))
+            else:
+                raise ValueError(f"Unknown worker op: {op}")
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class WorkerProcess:
+    """
+    Parent-side handle for one worker process. Only the scheduler thread
+    with the same index talks to it, so the pipe needs no lock.
+    """
+
+    def __init__(self, index: int, n_threads: int, context):
+        self.index = index
+        self.n_threads = n_threads
+        self.conn, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child, n_threads), name=f"llm-worker-{index}", daemon=True)
+        self.process.start()
+        child.close()
+        self.completed = 0
+        self.kv_cache: Optional[dict] = None
+
+    def call(self, op: str, **args):
+        self.conn.send((op, args))
+        return self._reply()[1]
+
+    def _reply(self, job=None):
+        while not self.conn.poll(0.25):
+            if not self.process.is_alive():
+                raise RuntimeError(f"Worker {self.index} exited with code {self.process.exitcode}")
+            if job is not None and job.cancelled.is_set():
+                self.conn.send("cancel")
+                job = None  # sent once; wait for the worker to wind down
+        message = self.conn.recv()
+        if message[0] == "error":
+            raise RuntimeError(message[1])
+        return message
+
+    def chat(self, params: dict, job):
+        """Run a chat completion; returns the response, or a chunk iterator when streaming."""
+        self.conn.send(("chat", params))
+        if params.get("stream"):
+            return self._stream(job)
+        _, response, job.perf, self.kv_cache = self._reply(job)
+        self.completed += 1
+        if job.cancelled.is_set():
+            raise JobCancelled()
+        return response
+
+    def _stream(self, job):
+        finished = False
+        try:
+            while True:
+                message = self._reply(job)
+                if message[0] == "done":
+                    finished = True
+                    _, job.perf, self.kv_cache = message
+                    self.completed += 1
+                    return
+                yield message[1]
+        except RuntimeError:
+            finished = True  # the worker already sent its terminal message (or died)
+            raise
+        finally:
+            if not finished:
+                # Consumer stopped early: stop the worker and drain to its terminal message
+                self.conn.send("cancel")
+                while self.process.is_alive():
+                    if self.conn.poll(0.25) and self.conn.recv()[0] in _TERMINAL:
+                        break
+
+    def snapshot(self) -> dict:
+        return {
+            "index": self.index,
+            "pid": self.process.pid,
+            "alive": self.process.is_alive(),
+            "n_threads": self.n_threads,
+            "completed": self.completed,
+            "kv_cache": self.kv_cache,
+        }
+
+
+class WorkerPool:
+    """
+    N processes that each open the same GGUF. llama.cpp maps the weights
+    with mmap, so their pages live once in the OS page cache and are shared
+    by every worker; each worker gets its own context (KV cache) and
+    `n_threads` of the CPU, and generates independently of the others.
+    Worker `i` is driven by scheduler thread `i`.
+    """
+
+    def __init__(self, size: int, n_threads: Optional[int] = None):
+        # Spawn rather than fork: the parent has threads and an event loop
+        context = multiprocessing.get_context("spawn")
+        n_threads = n_threads or max(1, (os.cpu_count() or 1) // size)
+        self.workers = [WorkerProcess(i, n_threads, context) for i in range(size)]
+        self.model_path: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["WorkerPool"]:
+        """Pool per LOCAL_LLM_WORKERS / LOCAL_LLM_THREADS_PER_WORKER, or None for in-process mode."""
+        size = int(os.environ.get("LOCAL_LLM_WORKERS", "0"))
+        if size <= 0:
+            return None
+        n_threads = int(os.environ.get("LOCAL_LLM_THREADS_PER_WORKER", "0")) or None
+        return cls(size, n_threads)
+
+    def __len__(self) -> int:
+        return len(self.workers)
+
+    def __getitem__(self, index: int) -> WorkerProcess:
+        return self.workers[index]
+
+    def _broadcast(self, op: str, **args):
+        # Load in parallel: the first worker pages the weights in, the rest share them
+        errors = []
+
+        def run(worker):
+            try:
+                worker.call(op, **args)
+            except Exception as e:
+                errors.append(f"worker {worker.index}: {e}")
+
+        threads = [threading.Thread(target=run, args=(worker,)) for worker in self.workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise RuntimeError("; ".join(errors))
+
+    def load(self, path: str, n_ctx: int, n_gpu_layers: int, n_batch: int = 512, draft: Optional[dict] = None):
+        """Load `path` in every worker; `draft` holds make_draft's speculative settings."""
+        self.model_path = None
+        try:
+            self._broadcast("load", path=path, n_ctx=n_ctx, n_gpu_layers=n_gpu_layers, n_batch=n_batch, draft=draft or {"mode": None})
+        except Exception:
+            self._broadcast("unload")
+            raise
+        self.model_path = path
+
+    def unload(self):
+        self.model_path = None
+        self._broadcast("unload")
+
+    def close(self):
+        for worker in self.workers:
+            worker.conn.close()
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+    def snapshot(self) -> dict:
+        return {"model_path": self.model_path, "workers": [worker.snapshot() for worker in self.workers]}
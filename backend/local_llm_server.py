@@ -1,20 +1,45 @@
 
 import os
 import sys
+import asyncio
+import base64
 import gc
 import json
 import logging
+import time
 from typing import List, Optional, Union
 from pydantic import BaseModel, Field
 import uvicorn
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse, StreamingResponse
 from sse_starlette.sse import EventSourceResponse
-from llama_cpp import Llama
+if os.environ.get("LOCAL_LLM_FAKE_BACKEND"):
+    # Deterministic stand-in for load tests without a model or llama-cpp-python (benchmarks/load_test.py)
+    from llm.fake import FakeLlama as Llama, LlamaGrammar, StoppingCriteriaList
+else:
+    from llama_cpp import Llama, StoppingCriteriaList
+    from llama_cpp.llama_grammar import LlamaGrammar
+from llm.scheduler import InferenceScheduler, QueueFull, JobCancelled
+from llm.kv_cache import PrefixStateCache
+from llm.perf import reset_perf, read_perf
+from llm.workers import WorkerPool
+from llm.registry import ModelRegistry
+from llm.downloads import DownloadManager, hf_file
+from llm.gguf import GGUFIndex, estimate_memory
+from llm.tuning import TuneJob, TuningStore, default_grid, tune
+from llm.speculative import MODES as SPECULATIVE_MODES, make_draft
+from llm.embeddings import EmbeddingCache, Embedder
+from llm.context import CONTEXT_MODES, PRIMER_TOKENS, ContextOverflow, TokenCounter, fit_messages
+from llm.grammar import GrammarCache
+
+# Span recorder shared with the Grok bridge and driver (stdlib only)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Grok-Api-main"))
+from core.tracing import Tracer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s: %(message)s", datefmt="%H:%M:%S")
 logger = logging.getLogger("LocalLLM")
+TRACER = Tracer("local_llm")
 
 app = FastAPI(title="Local LLM Server (OpenAI Compatible)")
 
@@ -29,8 +54,16 @@ app.add_middleware(
 )
 
 # Global Model State
-MODEL: Optional[Llama] = None
-MODEL_PATH: Optional[str] = None
+# Event loop of the app, for the loader thread to reach the scheduler (set on startup)
+LOOP: Optional[asyncio.AbstractEventLoop] = None
+BACKGROUND_TASKS: set = set()
+# LOCAL_LLM_WORKERS=N serves from N processes sharing the mmapped GGUF (started on startup)
+POOL: Optional[WorkerPool] = None
+# Model work runs on one thread per model instance; overflow gets 429 + Retry-After
+SCHEDULER = InferenceScheduler(
+    max_depth=int(os.environ.get("LOCAL_LLM_QUEUE_DEPTH", "16")),
+    workers=max(1, int(os.environ.get("LOCAL_LLM_WORKERS", "0"))),
+)
 # Default Generation Params
 DEFAULT_GENERATION_PARAMS = {
     "n_ctx": 4096,         # Context window
@@ -45,6 +78,30 @@ class ModelLoadRequest(BaseModel):
     path: str
     n_ctx: int = 4096
     n_gpu_layers: int = -1  # -1 = All layers
+    wait: bool = False      # respond once loaded instead of with the job
+    force: bool = False     # load even if the memory estimate says it won't fit
+    speculative: Optional[str] = None  # "prompt_lookup" or "draft" (with draft_model); None = plain decoding
+    draft_model: Optional[str] = None  # small GGUF sharing the model's vocabulary
+    draft_tokens: int = 8              # tokens drafted per verification step
+    embedding: bool = False            # load for /v1/embeddings instead of chat
+
+class TuneRequest(BaseModel):
+    path: str
+    n_ctx: int = 2048
+    n_gpu_layers: int = 0
+    threads: Optional[List[int]] = None   # default: 1/4, 1/2, 3/4 and all of the cores
+    batches: Optional[List[int]] = None   # default: 128 to 1024
+    prompt_tokens: int = 512
+    gen_tokens: int = 32
+
+class ModelUnloadRequest(BaseModel):
+    model: Optional[str] = None  # None = every resident model
+
+class EmbeddingRequest(BaseModel):
+    input: Union[str, List[str]]
+    model: Optional[str] = None            # default: the last used embedding model
+    encoding_format: Optional[str] = "float"  # "float" or "base64" (packed float32)
+    priority: Optional[str] = "interactive"
 
 class ChatMessage(BaseModel):
     role: str
@@ -61,68 +118,343 @@ class ChatCompletionRequest(BaseModel):
     stop: Optional[Union[str, List[str]]] = None
     frequency_penalty: Optional[float] = 0.0
     presence_penalty: Optional[float] = 0.0
+    priority: Optional[str] = "interactive" # "interactive" or "background"
+    context_overflow: Optional[str] = None  # "off", "error", "trim" or "summarize"; default LOCAL_LLM_CONTEXT_MODE
+    context_budget: Optional[int] = None    # prompt tokens; default n_ctx minus max_tokens
+    response_format: Optional[dict] = None  # {"type": "json_object"} or {"type": "json_schema", "json_schema": {"schema": ...}}
+
+class TokenizeRequest(BaseModel):
+    model: Optional[str] = None
+    text: Optional[str] = None
+    messages: Optional[List[ChatMessage]] = None
+    add_special: bool = False    # add BOS like a prompt would
+    return_tokens: bool = False  # the token ids too, not just the count
+    max_tokens: Optional[int] = None  # room to leave for the reply when checking the messages fit
 
 # --- Helper Functions ---
 
-def unload_model():
-    """Forcefully unload the model from VRAM."""
-    global MODEL, MODEL_PATH
-    if MODEL:
-        logger.info("Unloading model...")
-        del MODEL
-        MODEL = None
-        MODEL_PATH = None
-        gc.collect() # Python Garbage Collector
-        try:
-            import torch
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
-        except ImportError:
-            pass # No torch installed, likely using pure llama-cpp which manages its own memory via C++ destructors
-    logger.info("Model unloaded. VRAM freed.")
+# Best n_threads / n_batch per (model file, CPU), written by /v1/models/tune or `python -m llm.tuning`
+TUNING = TuningStore(os.path.join(os.getcwd(), "local_models", ".tuning.json"))
 
-def load_model(path: str, n_ctx: int = 4096, n_gpu_layers: int = -1):
-    """Load a GGUF model."""
-    global MODEL, MODEL_PATH
-    
-    if not os.path.exists(path):
-        raise HTTPException(status_code=404, detail=f"Model file not found: {path}")
-    
-    # Unload previous first
-    if MODEL:
-        unload_model()
-        
-    logger.info(f"Loading model from: {path}")
-    try:
-        MODEL = Llama(
+def tuned_params(path: str, n_gpu_layers: int) -> dict:
+    """Llama() thread / batch settings tuned for this model on this machine, if any."""
+    best = TUNING.get(path)
+    # A tuning done with a different offload split measured a different machine
+    if not best or best.get("n_gpu_layers", 0) != effective_gpu_layers(n_gpu_layers):
+        return {}
+    return {key: best[key] for key in ("n_threads", "n_threads_batch", "n_batch") if key in best}
+
+def open_model(path: str, n_ctx: int, n_gpu_layers: int, speculative: Optional[str] = None,
+               draft_model: Optional[str] = None, draft_tokens: int = 8, embedding: bool = False) -> tuple:
+    """Build a model on the registry's loader thread; returns (model, kv_cache)."""
+    if embedding:
+        # Embedding models stay in this process, also in worker-pool mode
+        with TRACER.span("llm.load", path=os.path.basename(path), n_ctx=n_ctx, embedding=True):
+            return Embedder(path, n_ctx, n_gpu_layers, n_batch=n_ctx, cache=EMBED_CACHE), None
+    tuned = tuned_params(path, n_gpu_layers)
+    if tuned:
+        logger.info(f"Using tuned settings for {os.path.basename(path)}: {tuned}")
+    with TRACER.span("llm.load", path=os.path.basename(path), n_ctx=n_ctx, workers=len(POOL) if POOL else 0, **tuned):
+        if POOL:
+            # Worker pipes belong to the scheduler threads, so load between their jobs.
+            # Workers split the cores among themselves; only the batch size carries over.
+            n_batch = tuned.get("n_batch", DEFAULT_GENERATION_PARAMS["n_batch"])
+            draft = {"mode": speculative, "draft_model": draft_model, "draft_tokens": draft_tokens}
+            previous = POOL.model_path
+            try:
+                asyncio.run_coroutine_threadsafe(run_control(lambda: POOL.load(path, n_ctx, n_gpu_layers, n_batch, draft)), LOOP).result()
+            except Exception:
+                # The workers dropped their previous model for this one; it isn't resident anymore
+                if previous:
+                    REGISTRY.unload(previous)
+                raise
+            return None, None
+        draft = make_draft(speculative, draft_model, draft_tokens, n_ctx, n_gpu_layers)
+        model = Llama(
             model_path=path,
             n_ctx=n_ctx,
             n_gpu_layers=n_gpu_layers,
-            n_batch=512,
+            **{"n_batch": DEFAULT_GENERATION_PARAMS["n_batch"], **tuned},
+            draft_model=draft,
             verbose=True
         )
-        MODEL_PATH = path
-        logger.info(f"Model loaded successfully: {path}")
+        if speculative == "draft" and draft.inner.model.n_vocab() != model.n_vocab():
+            raise ValueError("Draft model vocabulary doesn't match the target model's")
+    # Prompt-prefix KV states of this model (LOCAL_LLM_KV_CACHE_MB=0 disables)
+    kv_cache = PrefixStateCache.from_env(path)
+    if kv_cache:
+        kv_cache.attach(model)
+    return model, kv_cache
+
+def gpu_offload_supported() -> bool:
+    try:
+        import llama_cpp
+        return bool(llama_cpp.llama_supports_gpu_offload())
+    except Exception:
+        return False
+
+def gpu_memory() -> Optional[dict]:
+    """Total / free VRAM of the first NVIDIA GPU in MB, if nvidia-smi is available."""
+    import shutil
+    import subprocess
+    if not shutil.which("nvidia-smi"):
+        return None
+    try:
+        out = subprocess.run(
+            ["nvidia-smi", "--query-gpu=name,memory.total,memory.free", "--format=csv,noheader,nounits"],
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip().splitlines()
+        name, total, free = (part.strip() for part in out[0].split(","))
+        return {"name": name, "total_mb": int(total), "free_mb": int(free)}
+    except Exception:
+        return None
+
+# Per-message token counts, and what to do with conversations over budget
+TOKENS = TokenCounter()
+CONTEXT_MODE = os.environ.get("LOCAL_LLM_CONTEXT_MODE", "off")
+CONTEXT_RESERVE = int(os.environ.get("LOCAL_LLM_CONTEXT_RESERVE", "256"))  # reply room when max_tokens is unset
+
+# Grammars compiled from response_format JSON schemas, by schema hash
+GRAMMARS = GrammarCache(int(os.environ.get("LOCAL_LLM_GRAMMAR_CACHE_ENTRIES", "256")))
+
+# Embedding vectors by content hash (LOCAL_LLM_EMBED_CACHE_PATH adds an SQLite store)
+EMBED_CACHE = EmbeddingCache.from_env()
+
+# Header summaries of local GGUF files, re-parsed only when a file changes
+GGUF_INDEX = GGUFIndex(os.path.join(os.getcwd(), "local_models", ".gguf_index.json"))
+
+def effective_gpu_layers(n_gpu_layers: int) -> int:
+    # Without a GPU build every layer stays in RAM whatever was asked for
+    return n_gpu_layers if gpu_offload_supported() else 0
+
+def estimate_load(path: str, n_ctx: int, n_gpu_layers: int) -> Optional[dict]:
+    """Expected RAM / VRAM for loading `path`, or None if its header can't be read."""
+    info = GGUF_INDEX.try_info(path)
+    if info is None:
+        return None
+    return estimate_memory(info, n_ctx, effective_gpu_layers(n_gpu_layers))
+
+def registry_estimate(path: str, n_ctx: int, n_gpu_layers: int) -> Optional[int]:
+    estimate = estimate_load(path, n_ctx, n_gpu_layers)
+    return estimate["ram_bytes"] if estimate else None
+
+# Resident models within LOCAL_LLM_MEMORY_BUDGET_MB, least recently used evicted first
+REGISTRY = ModelRegistry.from_env(open_model, estimate=registry_estimate)
+
+def fit_problems(estimate: dict) -> List[str]:
+    """Reasons a load with this estimate can't succeed, even after evicting every other model."""
+    problems = []
+    if estimate["ram_bytes"] > REGISTRY.budget_bytes:
+        problems.append(f"needs ~{estimate['ram_mb']} MB RAM, budget is {REGISTRY.budget_bytes // (1024 * 1024)} MB")
+    vram = gpu_memory() if estimate["vram_bytes"] else None
+    if vram and estimate["vram_mb"] > vram["total_mb"]:
+        problems.append(f"needs ~{estimate['vram_mb']} MB VRAM, {vram['name']} has {vram['total_mb']} MB")
+    return problems
+
+def unload_model(name: Optional[str] = None) -> list:
+    """Unload one resident model, or all of them, and free their memory."""
+    logger.info("Unloading model...")
+    paths = REGISTRY.unload(name)
+    for path in paths:
+        TOKENS.forget(path)
+    if POOL and POOL.model_path in paths:
+        POOL.unload()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except ImportError:
+        pass # No torch installed, likely using pure llama-cpp which manages its own memory via C++ destructors
+    logger.info("Model unloaded. VRAM freed.")
+    return paths
+
+def resolve_model_path(name: str) -> str:
+    """A GGUF path as given, or else the file of that name in local_models/."""
+    return name if os.path.exists(name) else os.path.join(os.getcwd(), "local_models", os.path.basename(name))
+
+def prewarm_paths() -> List[str]:
+    """LOCAL_LLM_PREWARM: comma-separated GGUF paths or local_models/ file names to load on startup."""
+    paths = []
+    for name in filter(None, (n.strip() for n in os.environ.get("LOCAL_LLM_PREWARM", "").split(","))):
+        path = resolve_model_path(name)
+        if os.path.exists(path):
+            paths.append(path)
+        else:
+            logger.warning(f"Prewarm model not found: {name}")
+    return paths
+
+async def traced_stream(job, span):
+    """Relay a streaming job as SSE data, ending `span` when the stream does."""
+    chunks = 0
+    error = None
+    try:
+        async for chunk in SCHEDULER.stream(job):
+            chunks += 1
+            yield json.dumps(chunk)
     except Exception as e:
-        logger.error(f"Failed to load model: {e}")
-        MODEL = None # Ensure clean state
-        raise HTTPException(status_code=500, detail=str(e))
+        error = str(e)
+        logger.error(f"Generation error: {e}")
+    finally:
+        span.set(chunks=chunks, **job.timings)
+        span.end(error)
+
+@app.on_event("startup")
+async def startup_event():
+    global POOL, LOOP
+    LOOP = asyncio.get_running_loop()
+    # Created here, not at import: spawned workers re-import this module
+    POOL = WorkerPool.from_env()
+    if POOL:
+        logger.info(f"Worker pool: {len(POOL)} processes, {POOL[0].n_threads} threads each")
+        REGISTRY.max_models = 1  # every worker holds the one model
+    SCHEDULER.start()
+    for path in prewarm_paths():
+        REGISTRY.submit(path)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if POOL:
+        POOL.close()
 
 # --- Endpoints ---
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok", "loaded": MODEL is not None, "model_path": MODEL_PATH}
+    resident = REGISTRY.resident()
+    return {
+        "status": "ok",
+        "loaded": bool(resident),
+        "model_path": next((entry.path for entry in resident if not entry.embedding), None),  # the default model
+        "models": [entry.name for entry in resident],
+        "loading": len(REGISTRY.loading),
+        "queued": SCHEDULER.depth(),
+    }
+
+@app.get("/v1/kv_cache")
+def kv_cache_status():
+    """Hit ratio, prompt tokens saved and size of the prefix KV cache."""
+    if POOL:
+        # Each worker has its own; these are as of its last completed request
+        return {"workers": [worker.kv_cache for worker in POOL.workers]}
+    return {
+        entry.name: entry.kv_cache.snapshot() if entry.kv_cache else {"enabled": False}
+        for entry in REGISTRY.resident()
+    }
+
+@app.get("/v1/scheduler")
+def scheduler_status():
+    """Queue depth per lane, running jobs, recent per-job timings and worker processes."""
+    return {**SCHEDULER.snapshot(), "pool": POOL.snapshot() if POOL else None}
+
+async def run_control(fn):
+    """Run `fn` on an inference thread, between generations, without blocking the loop."""
+    return await SCHEDULER.result(SCHEDULER.submit(lambda job: fn(), lane="control"))
 
 @app.post("/v1/models/load")
-def api_load_model(req: ModelLoadRequest):
-    load_model(req.path, req.n_ctx, req.n_gpu_layers)
-    return {"status": "loaded", "path": req.path}
+async def api_load_model(req: ModelLoadRequest):
+    """Start loading a model in the background; poll the returned job for progress."""
+    if not os.path.exists(req.path):
+        raise HTTPException(status_code=404, detail=f"Model file not found: {req.path}")
+    options = {}
+    if req.embedding:
+        if req.speculative:
+            raise HTTPException(status_code=400, detail="speculative decoding doesn't apply to embedding models")
+        options = {"embedding": True}
+    elif req.speculative:
+        if req.speculative not in SPECULATIVE_MODES:
+            raise HTTPException(status_code=400, detail=f"speculative must be one of {SPECULATIVE_MODES}")
+        draft_model = resolve_model_path(req.draft_model) if req.draft_model else None
+        if req.speculative == "draft" and not (draft_model and os.path.exists(draft_model)):
+            raise HTTPException(status_code=404, detail=f"Draft model file not found: {req.draft_model}")
+        options = {"speculative": req.speculative, "draft_model": draft_model, "draft_tokens": req.draft_tokens}
+    # Header parse and nvidia-smi block: keep them off the event loop serving streams
+    estimate = await asyncio.to_thread(estimate_load, req.path, req.n_ctx, req.n_gpu_layers)
+    problems = await asyncio.to_thread(fit_problems, estimate) if estimate and not req.force else []
+    if problems:
+        # Refuse up front instead of failing (or swapping) a minute into the load
+        raise HTTPException(status_code=507, detail=f"Model won't fit: {'; '.join(problems)}. Lower n_ctx / n_gpu_layers or pass force.")
+    job = REGISTRY.submit(req.path, req.n_ctx, req.n_gpu_layers, options)
+    if job is None:
+        return {"status": "loaded", "path": req.path}
+    if req.wait:
+        await asyncio.to_thread(job.done.wait)
+        if job.status == "failed":
+            raise HTTPException(status_code=500, detail=job.error)
+        return {"status": "loaded", "path": req.path, "job_id": job.id}
+    return JSONResponse(status_code=202, content={**job.snapshot(), "job_id": job.id})
+
+@app.get("/v1/models/load/{job_id}")
+def load_job_status(job_id: str):
+    job = REGISTRY.jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown load job")
+    return job.snapshot()
+
+@app.get("/v1/models/estimate")
+def estimate_model(path: str, n_ctx: int = 4096, n_gpu_layers: int = -1):
+    """GGUF header facts and the RAM / VRAM a load with `n_ctx` is expected to need."""
+    path = resolve_model_path(path)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Model file not found: {path}")
+    info = GGUF_INDEX.try_info(path)
+    if info is None:
+        raise HTTPException(status_code=422, detail=f"Not a readable GGUF file: {os.path.basename(path)}")
+    GGUF_INDEX.save()
+    estimate = estimate_load(path, n_ctx, n_gpu_layers)
+    problems = fit_problems(estimate)
+    return {"model": info, "estimate": estimate, "fits": not problems, "problems": problems}
+
+TUNE_JOBS: dict = {}
+
+@app.post("/v1/models/tune")
+async def api_tune_model(req: TuneRequest):
+    """
+    Benchmark a grid of n_threads / n_batch settings for a model and save
+    the fastest; later loads of that file on this machine use it.
+    Runs as a control job, so inference pauses while it measures.
+    """
+    path = resolve_model_path(req.path)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Model file not found: {path}")
+    threads, batches = default_grid(req.n_ctx)
+    job = TuneJob(path, req.threads or threads, req.batches or batches)
+    TUNE_JOBS[job.id] = job
+    n_gpu_layers = effective_gpu_layers(req.n_gpu_layers)
+
+    def run():
+        TUNING.put(path, tune(job, req.n_ctx, n_gpu_layers, req.prompt_tokens, req.gen_tokens))
+
+    async def run_job():
+        try:
+            await run_control(run)
+            logger.info(f"Tuned {os.path.basename(path)}: {job.best}")
+        except Exception as e:
+            job.status, job.error = "failed", str(e)
+            logger.error(f"Tuning {os.path.basename(path)} failed: {e}")
+
+    # Kept referenced until done so the task isn't garbage collected
+    task = asyncio.create_task(run_job())
+    BACKGROUND_TASKS.add(task)
+    task.add_done_callback(BACKGROUND_TASKS.discard)
+    return JSONResponse(status_code=202, content=job.snapshot())
+
+@app.get("/v1/models/tune/{job_id}")
+def tune_status(job_id: str):
+    job = TUNE_JOBS.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown tuning job")
+    return job.snapshot()
+
+@app.get("/v1/models/resident")
+def resident_models():
+    """Resident models (most recently used first), memory budget and loads in progress."""
+    return REGISTRY.snapshot()
 
 @app.post("/v1/models/unload")
-def api_unload_model():
-    unload_model()
-    return {"status": "unloaded"}
+async def api_unload_model(req: Optional[ModelUnloadRequest] = None):
+    name = req.model if req else None
+    paths = await run_control(lambda: unload_model(name))
+    return {"status": "unloaded", "paths": paths}
 
 @app.get("/v1/models")
 def list_models():
@@ -135,30 +467,154 @@ def list_models():
     # Scan directory for .gguf files
     for f in os.listdir(models_dir):
         if f.endswith(".gguf"):
+            path = os.path.join(models_dir, f)
+            info = GGUF_INDEX.try_info(path) or {}
             model_files.append({
                 "id": f, 
                 "object": "model", 
                 "owned_by": "user", 
                 "permission": [],
                 "meta": {
-                    "is_loaded": (MODEL_PATH and f in MODEL_PATH),
-                    "size_mb": round(os.path.getsize(os.path.join(models_dir, f)) / (1024 * 1024), 2)
+                    "is_loaded": REGISTRY.peek(f) is not None,
+                    "size_mb": round(os.path.getsize(path) / (1024 * 1024), 2),
+                    "architecture": info.get("architecture"),
+                    "quantization": info.get("quantization"),
+                    "parameters": info.get("parameters"),
+                    "context_length": info.get("context_length"),
                 }
             })
+    GGUF_INDEX.save()
             
     return {"object": "list", "data": model_files}
 
+def resident_or_error(name: Optional[str], embedding: bool = False):
+    """The resident model for a request, or the HTTP error saying why there isn't one."""
+    entry = REGISTRY.get(name, embedding)
+    if entry is None:
+        loading = REGISTRY.loading_job(name)
+        if loading:
+            raise HTTPException(status_code=503, detail=f"Model is loading ({loading.progress:.0%})", headers={"Retry-After": "2"})
+        if not any(entry.embedding == embedding for entry in REGISTRY.resident()):
+            if embedding:
+                raise HTTPException(status_code=503, detail="No embedding model loaded. Load one via /v1/models/load with embedding: true.")
+            raise HTTPException(status_code=503, detail="No model loaded. Please load a model first via /v1/models/load.")
+        raise HTTPException(status_code=404, detail=f"Model '{name}' is not loaded. Load it via /v1/models/load.")
+    return entry
+
+@app.post("/v1/embeddings")
+async def create_embeddings(req: EmbeddingRequest):
+    """
+    OpenAI-compatible embeddings from a model loaded with `embedding: true`.
+    All uncached inputs of a request are embedded in shared llama.cpp passes;
+    texts embedded before (by content hash) come from the cache.
+    """
+    entry = resident_or_error(req.model, embedding=True)
+    if not entry.embedding:
+        raise HTTPException(status_code=400, detail=f"'{entry.name}' is a chat model; load an embedding GGUF with embedding: true.")
+    texts = [req.input] if isinstance(req.input, str) else req.input
+    if not texts:
+        raise HTTPException(status_code=400, detail="input must not be empty")
+    if req.encoding_format not in ("float", "base64"):
+        raise HTTPException(status_code=400, detail="encoding_format must be 'float' or 'base64'")
+
+    span = TRACER.span("llm.embeddings", model=entry.name, inputs=len(texts), lane=req.priority)
+    try:
+        job = SCHEDULER.submit(lambda job: entry.model.embed(texts), lane=req.priority)
+        vectors, tokens, cached = await SCHEDULER.result(job)
+    except QueueFull as e:
+        span.end(str(e))
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        span.end(str(e))
+        logger.error(f"Embedding error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    data = [
+        {
+            "object": "embedding",
+            "index": i,
+            "embedding": base64.b64encode(vector.tobytes()).decode() if req.encoding_format == "base64" else vector.tolist(),
+        }
+        for i, vector in enumerate(vectors)
+    ]
+    usage = {"prompt_tokens": tokens, "total_tokens": tokens, "cached_inputs": cached}
+    span.set(**usage, **job.timings)
+    span.end()
+    return {"object": "list", "data": data, "model": entry.name, "usage": usage, "timings": job.timings}
+
+@app.get("/v1/embeddings/cache")
+def embedding_cache_status():
+    """Hit ratio and size of the embedding cache."""
+    return EMBED_CACHE.snapshot()
+
+@app.post("/v1/tokenize")
+async def tokenize(req: TokenizeRequest):
+    """
+    Token count of `text` and/or of chat `messages` with a loaded model's
+    tokenizer. Message counts are cached and estimate the chat template's
+    markers, so they match what /v1/chat/completions checks budgets with.
+    """
+    if req.text is None and req.messages is None:
+        raise HTTPException(status_code=400, detail="Pass text or messages")
+    entry = resident_or_error(req.model)
+    result = {"model": entry.name, "n_ctx": entry.n_ctx}
+
+    def count():
+        if req.text is not None:
+            tokens = TOKENS.tokenize(entry, req.text, req.add_special)
+            result["count"] = len(tokens)
+            if req.return_tokens:
+                result["tokens"] = tokens
+        if req.messages is not None:
+            counts = [TOKENS.count_message(entry, {"role": m.role, "content": m.content}) for m in req.messages]
+            result["messages"] = counts
+            result["total"] = sum(counts) + PRIMER_TOKENS
+            result["fits"] = result["total"] <= entry.n_ctx - (req.max_tokens or 0)
+
+    await asyncio.to_thread(count)
+    return result
+
+@app.get("/v1/tokenize/cache")
+def token_cache_status():
+    """Hit ratio of the per-message token-count cache."""
+    return TOKENS.snapshot()
+
+@app.get("/v1/grammar/cache")
+def grammar_cache_status():
+    """Hit ratio and compile time of the response_format grammar cache."""
+    return GRAMMARS.snapshot()
+
 @app.post("/v1/chat/completions")
-async def chat_completions(req: ChatCompletionRequest):
-    global MODEL
-    
-    if not MODEL:
-        raise HTTPException(status_code=503, detail="No model loaded. Please load a model first via /v1/models/load.")
+async def chat_completions(req: ChatCompletionRequest, request: Request):
+    entry = resident_or_error(req.model)
+    if entry.embedding:
+        raise HTTPException(status_code=400, detail=f"'{entry.name}' is loaded as an embedding model; use /v1/embeddings.")
     
     # Prepare messages format (llama-cpp-python handles chat templates internally usually, 
     # but we pass the raw list of dicts which it supports)
     messages_dicts = [{"role": m.role, "content": m.content} for m in req.messages]
+
+    # Fail fast or shorten the history before llama.cpp spends a prompt pass on it
+    mode = req.context_overflow or CONTEXT_MODE
+    if mode not in CONTEXT_MODES:
+        raise HTTPException(status_code=400, detail=f"context_overflow must be one of {CONTEXT_MODES}")
+    context = None
+    if mode != "off":
+        budget = req.context_budget or entry.n_ctx - (req.max_tokens or CONTEXT_RESERVE)
+        try:
+            messages_dicts, context = await asyncio.to_thread(
+                fit_messages, messages_dicts, budget, lambda message: TOKENS.count_message(entry, message), mode,
+            )
+        except ContextOverflow as e:
+            hint = "Shorten the conversation or pass context_overflow: \"trim\"." if mode == "error" else "The system prompt and last message alone are over budget."
+            raise HTTPException(status_code=400, detail=f"{e}. {hint}")
     
+    # Constrained decoding: the reply can only be JSON (matching the schema, if given)
+    try:
+        grammar, grammar_report = GRAMMARS.for_response_format(req.response_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     stop_tokens = req.stop if req.stop else []
     if isinstance(stop_tokens, str):
         stop_tokens = [stop_tokens]
@@ -172,35 +628,85 @@ async def chat_completions(req: ChatCompletionRequest):
         "stop": stop_tokens,
         "stream": req.stream,
         "frequency_penalty": req.frequency_penalty,
-        "presence_penalty": req.presence_penalty
+        "presence_penalty": req.presence_penalty,
+        "grammar": grammar,  # GBNF text; turned into a LlamaGrammar where the model runs
     }
 
-    try:
+    def generate(job):
+        if POOL:
+            # Scheduler thread i is the only one talking to worker i
+            if POOL.model_path != entry.path:
+                raise HTTPException(status_code=503, detail="Model was unloaded before the request ran.")
+            return POOL[job.worker].chat(gen_params, job)
+        # Runs on the scheduler thread, the only one generating with this model.
+        # Holding `entry` keeps the model alive even if it is evicted meanwhile.
+        model = entry.model
+        draft = entry.draft
+        # Stops llama.cpp between tokens once the client has gone away
+        params = dict(gen_params, stopping_criteria=StoppingCriteriaList([lambda tokens, logits: job.cancelled.is_set()]))
+        if grammar:
+            params["grammar"] = GRAMMARS.build(grammar, lambda text: LlamaGrammar.from_string(text, verbose=False))
+        reset_perf(model)
+        if draft:
+            draft.begin()
+
+        def finish():
+            job.perf = read_perf(model)
+            if draft:
+                job.perf["speculative"] = draft.request_stats()
+
         if req.stream:
-            # Streaming Response
-            def stream_generator():
-                stream = MODEL.create_chat_completion(**gen_params)
-                for chunk in stream:
-                    yield json.dumps(chunk) # Llama-cpp returns dicts, need JSON string for SSE? 
-                    # Wait, sse-starlette usually takes dict or string. 
-                    # But OpenAI SSE format is "data: {...}\n\n". 
-                    # Llama-cpp stream yields dicts that mimic OpenAI chunks.
-                    # Startlette EventSourceResponse handles the wrapping if we yield dicts?
-                    # Let's verify. Usually create_chat_completion with stream=True returns a generator of dicts.
-                
-            # Using EventSourceResponse for correct SSE formatting
-            return EventSourceResponse(MODEL.create_chat_completion(**gen_params))
-        else:
-            # Non-streaming
-            response = MODEL.create_chat_completion(**gen_params)
-            return JSONResponse(content=response)
-            
+            def relay(chunks):
+                yield from chunks
+                finish()
+            return relay(model.create_chat_completion(**params))
+        response = model.create_chat_completion(**params)
+        finish()
+        return response
+
+    span = TRACER.span("llm.chat", traceparent=request.headers.get("traceparent"), model=entry.name, messages=len(messages_dicts), stream=bool(req.stream), lane=req.priority, grammar=bool(grammar))
+    try:
+        job = SCHEDULER.submit(generate, lane=req.priority, stream=bool(req.stream))
+    except QueueFull as e:
+        span.end(str(e))
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    if req.stream:
+        # Chunks are relayed as JSON strings; EventSourceResponse adds the SSE framing
+        return EventSourceResponse(traced_stream(job, span))
+
+    try:
+        response = await SCHEDULER.result(job, request)
+    except JobCancelled:
+        span.end("client disconnected")
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    except HTTPException as e:
+        span.end(e.detail)
+        raise
     except Exception as e:
+        span.end(str(e))
         logger.error(f"Generation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    usage = response.setdefault("usage", {})
+    speculative = job.timings.pop("speculative", None)
+    if speculative:
+        usage["speculative"] = speculative
+    run_ms = (job.timings["total_ms"] or 0) - (job.timings["queue_wait_ms"] or 0)
+    if run_ms > 0:
+        # End to end, prompt eval included: what speculative decoding is meant to improve
+        usage["tokens_per_second"] = round(usage.get("completion_tokens", 0) / (run_ms / 1000), 2)
+    if context:
+        usage["context"] = context
+    if grammar_report:
+        usage["grammar"] = grammar_report
+    response["timings"] = job.timings
+    span.set(**response.get("usage", {}), **job.timings)
+    span.end()
+    return JSONResponse(content=response)
+
 @app.delete("/v1/models/{filename}")
-def delete_model_file(filename: str):
+async def delete_model_file(filename: str):
     """Delete a local GGUF model file."""
     # Security: Ensure filename is just a filename, not a path traversal
     filename = os.path.basename(filename) 
@@ -210,8 +716,8 @@ def delete_model_file(filename: str):
     if os.path.exists(path):
         try:
             # If current model, unload it first
-            if MODEL_PATH and os.path.abspath(MODEL_PATH) == os.path.abspath(path):
-                unload_model()
+            if REGISTRY.peek(filename):
+                await run_control(lambda: unload_model(filename))
             os.remove(path)
             return {"status": "deleted", "filename": filename}
         except Exception as e:
@@ -231,14 +737,11 @@ def system_info():
         "params_defaults": DEFAULT_GENERATION_PARAMS
     }
     
-    # Try to get VRAM via simple methods if possible (often needs external libs or nvml)
-    # We will simulate/estimate on frontend mostly, but if we can get it here:
-    try:
-        from llama_cpp import Llama
-        # llama-cpp doesn't expose an easy static gpu check without loading.
-        pass
-    except:
-        pass
+    # GPU offload needs a CUDA/Metal/Vulkan build of llama.cpp; VRAM comes from nvidia-smi when present
+    info["gpu_offload"] = gpu_offload_supported()
+    info["gpu"] = gpu_memory()
+    info["ram_available_gb"] = round(psutil.virtual_memory().available / (1024**3), 2)
+    info["memory_budget_gb"] = round(REGISTRY.budget_bytes / (1024**3), 2)
         
     return info
 
@@ -274,37 +777,50 @@ def search_hf_models(query: str = "GGUF", limit: int = 15):
         return {"data": [], "error": str(e)}
 
 class DownloadRequest(BaseModel):
-    repo_id: str
+    repo_id: Optional[str] = None
     filename: str
+    url: Optional[str] = None     # direct URL instead of a Hugging Face repo file
+    sha256: Optional[str] = None  # expected digest; looked up from the Hub when omitted
+
+# Background downloads into local_models/, resumable and verified
+DOWNLOADS = DownloadManager.from_env(os.path.join(os.getcwd(), "local_models"))
 
 @app.post("/v1/models/download")
-async def download_model(req: DownloadRequest):
-    """Trigger a download (stub/simple synchronous for now)."""
-    # This is a blocking operation in this simple server. 
-    # For production, utilize background tasks.
-    try:
-        from huggingface_hub import hf_hub_download
-        
-        logger.info(f"Downloading {req.filename} from {req.repo_id}...")
-        
-        # Download to local_models
-        models_dir = os.path.join(os.getcwd(), "local_models")
-        
-        # hf_hub_download usually downloads to cache -> we want it in our folder
-        # We can symlink or move, OR verify where it specifically goes.
-        # Actually hf_hub_download(..., local_dir=...) is supported.
-        
-        path = hf_hub_download(
-            repo_id=req.repo_id,
-            filename=req.filename,
-            local_dir=models_dir,
-            local_dir_use_symlinks=False
-        )
-        
-        return {"status": "success", "path": path}
-    except Exception as e:
-        logger.error(f"Download failed: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+def download_model(req: DownloadRequest):
+    """Start a background download; poll /v1/models/downloads/{id} for progress."""
+    # Plain def: the Hub metadata lookup is a blocking HTTP call
+    url, sha256, size = req.url, req.sha256, None
+    if not url:
+        if not req.repo_id:
+            raise HTTPException(status_code=400, detail="Either repo_id or url is required")
+        try:
+            url, hub_sha256, size = hf_file(req.repo_id, req.filename)
+        except Exception as e:
+            logger.error(f"Download lookup failed: {e}")
+            raise HTTPException(status_code=502, detail=str(e))
+        sha256 = sha256 or hub_sha256
+    job = DOWNLOADS.submit(url, req.filename, sha256=sha256, size=size)
+    logger.info(f"Downloading {job.filename} from {req.repo_id or url}...")
+    return JSONResponse(status_code=202, content=job.snapshot())
+
+@app.get("/v1/models/downloads")
+def list_downloads():
+    return {"data": DOWNLOADS.snapshot()}
+
+@app.get("/v1/models/downloads/{job_id}")
+def download_status(job_id: str):
+    job = DOWNLOADS.jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown download")
+    return job.snapshot()
+
+@app.delete("/v1/models/downloads/{job_id}")
+def cancel_download(job_id: str):
+    """Stop a download; its partial file is kept so submitting it again resumes."""
+    job = DOWNLOADS.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown download")
+    return job.snapshot()
 
 if __name__ == "__main__":
     # Run on port 8002
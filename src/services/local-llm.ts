@@ -129,7 +129,17 @@ export async function loadLocalModel(filename: string): Promise<boolean> {
             const err = await response.json();
             throw new Error(err.detail || 'Load failed');
         }
-        
+
+        // 202 = loading in the background; poll the job until it settles
+        let job = await response.json();
+        while (job.status === 'queued' || job.status === 'loading') {
+            await new Promise(resolve => setTimeout(resolve, 500));
+            const poll = await fetch(`${LOCAL_LLM_URL}/v1/models/load/${job.job_id || job.id}`);
+            if (!poll.ok) throw new Error('Lost track of the load job');
+            job = await poll.json();
+        }
+        if (job.status === 'failed') throw new Error(job.error || 'Load failed');
+
         showToast('Local Model Loaded!', 'success');
         return true;
     } catch (error: any) {
@@ -193,6 +203,16 @@ export async function downloadModel(repoId: string, filename: string): Promise<b
             body: JSON.stringify({ repo_id: repoId, filename: filename })
         });
         if (!response.ok) throw new Error('Download request failed');
+
+        // The download runs in the background; poll it until it settles
+        let job = await response.json();
+        while (['queued', 'downloading', 'verifying'].includes(job.status)) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const poll = await fetch(`${LOCAL_LLM_URL}/v1/models/downloads/${job.id}`);
+            if (!poll.ok) throw new Error('Lost track of the download');
+            job = await poll.json();
+        }
+        if (job.status !== 'completed') throw new Error(job.error || `Download ${job.status}`);
         showToast('Download completed/cached!', 'success');
         return true;
     } catch (error: any) {